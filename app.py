@@ -7,13 +7,18 @@ import os
 # External Imports
 from flask import Flask
 from flask_migrate import Migrate, upgrade, init as init_migrations, revision, stamp
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
 from sqlalchemy.exc import OperationalError
 from alembic.util import CommandError
 from sqlalchemy import inspect, text
 import sqlalchemy.exc
 
 # Local Imports
-from utils.database import init_db
+from utils.allocation import init_lease_reaper
+from utils.assets import init_assets
+from utils.discovery import init_local_discovery
+from utils.database import init_db, check_summaries
 from utils.routes import routes_bp
 
 # Setup logging
@@ -24,7 +29,8 @@ def create_app():
     Create and configure the Flask application.
 
     This function initializes the Flask app, sets up the database connection,
-    initializes Flask-Migrate, and registers the routes blueprint.
+    initializes Flask-Migrate, registers the routes blueprint, builds the
+    fingerprinted static assets and schedules the background jobs.
 
     Returns:
         tuple: The configured Flask application instance and SQLAlchemy database instance.
@@ -41,11 +47,19 @@ def create_app():
     db = init_db(app)
 
     # Initialize Flask-Migrate
-    Migrate(app, db)
+    Migrate(app, db, render_as_batch=True)
 
     # Register the routes blueprint
     app.register_blueprint(routes_bp)
 
+    # Build the versioned static assets
+    init_assets(app)
+
+    # Expire port leases and reconcile the ports listening on this host in the background,
+    # in one worker process only
+    init_lease_reaper(app)
+    init_local_discovery(app)
+
     return app, db
 
 def check_db_compatibility(db):
@@ -112,13 +126,13 @@ def create_temp_tables(db):
     temp_tables = {}
     inspector = inspect(db.engine)
 
+    quote = db.engine.dialect.identifier_preparer.quote
+
     with db.engine.connect() as conn:
         for table_name in inspector.get_table_names():
-            columns = inspector.get_columns(table_name)
-            column_definitions = ", ".join([f"{col['name']} {col['type']}" for col in columns])
             temp_table_name = f"temp_{table_name}"
 
-            sql = f"CREATE TABLE {temp_table_name} AS SELECT * FROM {table_name}"
+            sql = f"CREATE TABLE {quote(temp_table_name)} AS SELECT * FROM {quote(table_name)}"
             conn.execute(text(sql))
             temp_tables[table_name] = temp_table_name
 
@@ -136,9 +150,11 @@ def copy_data_to_temp_tables(db, temp_tables):
         db (SQLAlchemy): The SQLAlchemy database instance.
         temp_tables (dict): A dictionary mapping original table names to their temporary counterparts.
     """
+    quote = db.engine.dialect.identifier_preparer.quote
+
     with db.engine.connect() as conn:
         for original_table, temp_table in temp_tables.items():
-            sql = f"INSERT INTO {temp_table} SELECT * FROM {original_table}"
+            sql = f"INSERT INTO {quote(temp_table)} SELECT * FROM {quote(original_table)}"
             conn.execute(text(sql))
             logging.info(f"Copied data from {original_table} to {temp_table}")
 
@@ -153,11 +169,13 @@ def restore_from_temp_tables(db, temp_tables):
         db (SQLAlchemy): The SQLAlchemy database instance.
         temp_tables (dict): A dictionary mapping original table names to their temporary counterparts.
     """
+    quote = db.engine.dialect.identifier_preparer.quote
+
     with db.engine.connect() as conn:
         for original_table, temp_table in temp_tables.items():
             try:
-                conn.execute(text(f"DROP TABLE {original_table}"))
-                conn.execute(text(f"ALTER TABLE {temp_table} RENAME TO {original_table}"))
+                conn.execute(text(f"DROP TABLE {quote(original_table)}"))
+                conn.execute(text(f"ALTER TABLE {quote(temp_table)} RENAME TO {quote(original_table)}"))
                 logging.info(f"Restored {original_table} from {temp_table}")
             except sqlalchemy.exc.OperationalError:
                 logging.warning(f"Could not restore {original_table}. It may not exist in the new schema.")
@@ -174,18 +192,25 @@ def migrate_data_from_temp_tables(db, temp_tables):
         temp_tables (dict): A dictionary mapping original table names to their temporary counterparts.
     """
     inspector = inspect(db.engine)
+    quote = db.engine.dialect.identifier_preparer.quote
 
     with db.engine.connect() as conn:
         for original_table, temp_table in temp_tables.items():
             if original_table in inspector.get_table_names():
+                if conn.execute(text(f"SELECT 1 FROM {quote(original_table)} LIMIT 1")).first() is not None:
+                    # The revisions migrated the rows in place
+                    logging.info(f"{original_table} kept its data. Data migration skipped.")
+                    continue
+
                 new_columns = set(column['name'] for column in inspector.get_columns(original_table))
                 temp_columns = set(column['name'] for column in inspector.get_columns(temp_table))
 
                 common_columns = list(new_columns.intersection(temp_columns))
-                columns_str = ", ".join(common_columns)
+                # Quote the names, some columns are reserved words, e.g. port.order
+                columns_str = ", ".join(quote(column) for column in common_columns)
 
                 try:
-                    sql = f"INSERT INTO {original_table} ({columns_str}) SELECT {columns_str} FROM {temp_table}"
+                    sql = f"INSERT INTO {quote(original_table)} ({columns_str}) SELECT {columns_str} FROM {quote(temp_table)}"
                     conn.execute(text(sql))
                     logging.info(f"Migrated data from {temp_table} to {original_table}")
                 except sqlalchemy.exc.IntegrityError as e:
@@ -194,6 +219,37 @@ def migrate_data_from_temp_tables(db, temp_tables):
             else:
                 logging.warning(f"Table {original_table} no longer exists in the new schema. Data migration skipped.")
 
+def stamp_legacy_database(db, migrations_folder):
+    """
+    Stamp databases that predate the shipped migrations with the baseline revision.
+
+    Databases created before the migrations folder was shipped have no revision, or one
+    from a migrations folder generated on the spot that no longer exists. This function
+    stamps them with the baseline revision, which describes the original schema, so
+    that upgrading applies every later revision. Those revisions only make the changes
+    that are still missing, whatever state the schema was left in.
+
+    Args:
+        db (SQLAlchemy): The SQLAlchemy database instance.
+        migrations_folder (str): The path to the migrations folder.
+    """
+    script = ScriptDirectory(migrations_folder)
+    known_revisions = {script_revision.revision for script_revision in script.walk_revisions()}
+
+    with db.engine.connect() as conn:
+        existing_tables = set(inspect(conn).get_table_names()) - {'alembic_version'}
+        current_revisions = MigrationContext.configure(conn).get_current_heads()
+
+    if not existing_tables:
+        # An empty database is built by running every revision
+        return
+    if current_revisions and all(current in known_revisions for current in current_revisions):
+        return
+
+    baseline = script.get_base()
+    logging.info(f"Stamping database at revision {current_revisions or 'none'} with baseline {baseline}")
+    stamp(directory=migrations_folder, revision=baseline, purge=True)
+
 def cleanup_temp_tables(db, temp_tables):
     """
     Remove temporary tables after successful migration.
@@ -204,9 +260,11 @@ def cleanup_temp_tables(db, temp_tables):
         db (SQLAlchemy): The SQLAlchemy database instance.
         temp_tables (dict): A dictionary mapping original table names to their temporary counterparts.
     """
+    quote = db.engine.dialect.identifier_preparer.quote
+
     with db.engine.connect() as conn:
         for temp_table in temp_tables.values():
-            conn.execute(text(f"DROP TABLE IF EXISTS {temp_table}"))
+            conn.execute(text(f"DROP TABLE IF EXISTS {quote(temp_table)}"))
             logging.info(f"Dropped temporary table: {temp_table}")
 
 def safe_upgrade(app, db):
@@ -232,6 +290,7 @@ def safe_upgrade(app, db):
         # Step 3: Apply new schema
         try:
             logging.info("Applying database migrations...")
+            stamp_legacy_database(db, migrations_folder)
             upgrade(directory=migrations_folder)
             logging.info("Migrations applied successfully.")
         except Exception as e:
@@ -292,6 +351,10 @@ if __name__ == '__main__':
     # Initialize or migrate the database before starting the app
     init_or_migrate_db(app, db)
 
+    # Rebuild host summaries that are missing or out of date, e.g. after a migration
+    with app.app_context():
+        check_summaries(repair=True)
+
     port = int(os.environ.get('PORT', 8080))
     debug_mode = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
 
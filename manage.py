@@ -2,13 +2,16 @@
 
 # Standard Imports
 import os
+import tempfile
 
 # External Imports
+import click
 from flask.cli import FlaskGroup
 
 # Local Imports
 from app import app, db
 from flask_migrate import Migrate
+from utils.services import build_index, download_registry, read_registry, IANA_REGISTRY_URL, INDEX_PATH
 
 # Initialize Flask-Migrate
 migrate = Migrate(app, db)
@@ -23,5 +26,18 @@ def run():
     debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
     app.run(debug=debug, host='0.0.0.0', port=port)
 
+@cli.command("build-service-index")
+@click.argument("source", default=IANA_REGISTRY_URL)
+def build_service_index(source):
+    """Rebuild the bundled service index from the IANA CSV export (downloaded by default) or a services(5) file."""
+    with tempfile.TemporaryDirectory() as download_dir:
+        if '://' in source:
+            click.echo(f"Downloading {source}")
+            path = os.path.join(download_dir, 'service-names-port-numbers.csv')
+            download_registry(source, path)
+            source = path
+        count = build_index(read_registry(source), INDEX_PATH)
+    click.echo(f"Wrote {count} registered ports to {INDEX_PATH}")
+
 if __name__ == '__main__':
     cli()
\ No newline at end of file
@@ -0,0 +1,36 @@
+"""Add host summaries
+
+Revision ID: 338e8a8b865a
+Revises: 9406f86b22b0
+Create Date: 2026-10-17 06:31:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '338e8a8b865a'
+down_revision = '9406f86b22b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The summaries are filled in by check_summaries(repair=True) when the app starts
+    if 'host_summary' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('host_summary',
+            sa.Column('host_id', sa.Integer(), nullable=False),
+            sa.Column('port_count', sa.Integer(), nullable=False),
+            sa.Column('tcp_count', sa.Integer(), nullable=False),
+            sa.Column('udp_count', sa.Integer(), nullable=False),
+            sa.Column('max_order', sa.Integer(), nullable=True),
+            sa.Column('in_range_count', sa.Integer(), nullable=False),
+            sa.Column('range_key', sa.String(length=40), nullable=True),
+            sa.ForeignKeyConstraint(['host_id'], ['host.id'], ),
+            sa.PrimaryKeyConstraint('host_id')
+        )
+
+
+def downgrade():
+    op.drop_table('host_summary')
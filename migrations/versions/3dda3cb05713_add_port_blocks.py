@@ -0,0 +1,34 @@
+"""Add port blocks
+
+Revision ID: 3dda3cb05713
+Revises: 9c28111d59f5
+Create Date: 2026-10-17 06:18:50.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3dda3cb05713'
+down_revision = '9c28111d59f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('port')}
+    indexes = {index['name'] for index in inspector.get_indexes('port')}
+
+    with op.batch_alter_table('port') as batch_op:
+        if 'block_id' not in columns:
+            batch_op.add_column(sa.Column('block_id', sa.String(length=32), nullable=True))
+        if 'ix_port_block_id' not in indexes:
+            batch_op.create_index('ix_port_block_id', ['block_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('port') as batch_op:
+        batch_op.drop_index('ix_port_block_id')
+        batch_op.drop_column('block_id')
@@ -0,0 +1,29 @@
+"""Widen host IP addresses
+
+Revision ID: 5b7e0c2d8f14
+Revises: 338e8a8b865a
+Create Date: 2026-10-17 09:02:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e0c2d8f14'
+down_revision = '338e8a8b865a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 45 characters fit any IPv6 address, including IPv4-mapped ones
+    with op.batch_alter_table('host') as batch_op:
+        batch_op.alter_column('ip_address', existing_type=sa.String(length=15),
+                              type_=sa.String(length=45), existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('host') as batch_op:
+        batch_op.alter_column('ip_address', existing_type=sa.String(length=45),
+                              type_=sa.String(length=15), existing_nullable=False)
@@ -0,0 +1,127 @@
+"""Move IP addresses and nicknames to hosts
+
+Revision ID: 9406f86b22b0
+Revises: e81f5c2a9d30
+Create Date: 2026-10-17 06:24:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9406f86b22b0'
+down_revision = 'e81f5c2a9d30'
+branch_labels = None
+depends_on = None
+
+# Distance between neighbouring panel order keys, as in utils/ordering.py
+ORDER_GAP = 1024
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # Step 1: Give hosts their nickname and settings, and ports a host
+    host_columns = {column['name'] for column in inspector.get_columns('host')}
+    with op.batch_alter_table('host') as batch_op:
+        if 'nickname' not in host_columns:
+            batch_op.add_column(sa.Column('nickname', sa.String(length=50), nullable=True))
+        if 'settings' not in host_columns:
+            batch_op.add_column(sa.Column('settings', sa.Text(), nullable=True))
+
+    port_columns = {column['name'] for column in inspector.get_columns('port')}
+    if 'host_id' not in port_columns:
+        with op.batch_alter_table('port') as batch_op:
+            batch_op.add_column(sa.Column('host_id', sa.Integer(), nullable=True))
+
+    # Step 2: Create a host for every IP address and point its ports at it
+    if 'ip_address' in port_columns:
+        _create_hosts(bind, 'nickname' in port_columns)
+        bind.execute(sa.text(
+            'UPDATE port SET host_id = (SELECT host.id FROM host WHERE host.ip_address = port.ip_address) '
+            'WHERE host_id IS NULL'
+        ))
+
+    # Step 3: Drop the old columns and key ports by host instead of IP address, now that every port has one
+    constraints = {constraint['name'] for constraint in inspector.get_unique_constraints('port')}
+    indexes = {index['name'] for index in inspector.get_indexes('port')}
+    foreign_keys = inspector.get_foreign_keys('port')
+
+    with op.batch_alter_table('port') as batch_op:
+        if '_ip_port_protocol_uc' in constraints:
+            batch_op.drop_constraint('_ip_port_protocol_uc', type_='unique')
+        if 'nickname' in port_columns:
+            batch_op.drop_column('nickname')
+        if 'ip_address' in port_columns:
+            batch_op.drop_column('ip_address')
+        batch_op.alter_column('host_id', existing_type=sa.Integer(), nullable=False)
+        if '_host_port_protocol_uc' not in constraints:
+            batch_op.create_unique_constraint('_host_port_protocol_uc', ['host_id', 'port_number', 'port_protocol'])
+        if 'ix_port_host_id' not in indexes:
+            batch_op.create_index('ix_port_host_id', ['host_id'], unique=False)
+        if not any(foreign_key['referred_table'] == 'host' for foreign_key in foreign_keys):
+            batch_op.create_foreign_key('fk_port_host_id_host', 'host', ['host_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('port') as batch_op:
+        batch_op.add_column(sa.Column('ip_address', sa.String(length=15), nullable=True))
+        batch_op.add_column(sa.Column('nickname', sa.String(length=50), nullable=True))
+
+    op.get_bind().execute(sa.text(
+        'UPDATE port SET '
+        'ip_address = (SELECT host.ip_address FROM host WHERE host.id = port.host_id), '
+        'nickname = (SELECT host.nickname FROM host WHERE host.id = port.host_id)'
+    ))
+
+    with op.batch_alter_table('port') as batch_op:
+        batch_op.drop_constraint('fk_port_host_id_host', type_='foreignkey')
+        batch_op.drop_constraint('_host_port_protocol_uc', type_='unique')
+        batch_op.drop_index('ix_port_host_id')
+        batch_op.drop_column('host_id')
+        batch_op.alter_column('ip_address', existing_type=sa.String(length=15), nullable=False)
+        batch_op.create_unique_constraint('_ip_port_protocol_uc', ['ip_address', 'port_number', 'port_protocol'])
+
+    with op.batch_alter_table('host') as batch_op:
+        batch_op.drop_column('settings')
+        batch_op.drop_column('nickname')
+
+
+def _create_hosts(bind, has_nickname):
+    """
+    Create a host for every IP address of the port table that doesn't have one yet.
+
+    Panels that were never dragged are shown after the others, where their first
+    port comes in the port order, so the new hosts get panel order keys in the order
+    of the lowest port order of each IP, after the existing hosts. Hosts created by
+    dragging a panel pick up the nickname of their ports.
+    """
+    known_ips = set(bind.execute(sa.text('SELECT ip_address FROM host')).scalars())
+    panel_order = bind.execute(sa.text('SELECT MAX(panel_order) FROM host')).scalar() or 0
+
+    nickname = 'MAX(nickname)' if has_nickname else 'NULL'
+    rows = bind.execute(sa.text(
+        f'SELECT ip_address, {nickname} FROM port '
+        f'GROUP BY ip_address ORDER BY MIN("order"), MIN(id)'
+    ))
+    new_hosts = []
+    for ip_address, host_nickname in rows:
+        if ip_address in known_ips:
+            continue
+        panel_order += ORDER_GAP
+        new_hosts.append({'ip_address': ip_address, 'nickname': host_nickname, 'panel_order': panel_order})
+
+    if new_hosts:
+        bind.execute(sa.text(
+            "INSERT INTO host (ip_address, nickname, panel_order, settings) "
+            "VALUES (:ip_address, :nickname, :panel_order, '{}')"
+        ), new_hosts)
+
+    if has_nickname:
+        bind.execute(sa.text(
+            'UPDATE host SET nickname = (SELECT MAX(nickname) FROM port WHERE port.ip_address = host.ip_address) '
+            'WHERE nickname IS NULL'
+        ))
+    bind.execute(sa.text("UPDATE host SET settings = '{}' WHERE settings IS NULL"))
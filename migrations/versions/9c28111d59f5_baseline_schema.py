@@ -0,0 +1,60 @@
+"""Baseline schema
+
+Revision ID: 9c28111d59f5
+Revises:
+Create Date: 2026-10-17 06:18:40.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c28111d59f5'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created before migrations were shipped are stamped with this
+    # revision, so only create the tables that are missing
+    existing_tables = sa.inspect(op.get_bind()).get_table_names()
+
+    if 'setting' not in existing_tables:
+        op.create_table('setting',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('key', sa.String(length=50), nullable=False),
+            sa.Column('value', sa.String(length=100), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('key')
+        )
+
+    if 'sockets' not in existing_tables:
+        op.create_table('sockets',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('ip_address', sa.String(length=15), nullable=False),
+            sa.Column('docker_url', sa.String(length=50), nullable=False),
+            sa.Column('docker_interval', sa.String(length=10), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'port' not in existing_tables:
+        op.create_table('port',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('ip_address', sa.String(length=15), nullable=False),
+            sa.Column('nickname', sa.String(length=50), nullable=True),
+            sa.Column('port_number', sa.Integer(), nullable=False),
+            sa.Column('port_protocol', sa.String(length=3), nullable=False),
+            sa.Column('description', sa.String(length=100), nullable=False),
+            sa.Column('order', sa.Integer(), nullable=True),
+            sa.Column('docker_id', sa.String(length=20), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('ip_address', 'port_number', 'port_protocol', name='_ip_port_protocol_uc')
+        )
+
+
+def downgrade():
+    op.drop_table('port')
+    op.drop_table('sockets')
+    op.drop_table('setting')
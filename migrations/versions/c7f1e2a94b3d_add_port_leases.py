@@ -0,0 +1,34 @@
+"""Add port leases
+
+Revision ID: c7f1e2a94b3d
+Revises: 3dda3cb05713
+Create Date: 2026-10-17 06:19:40.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7f1e2a94b3d'
+down_revision = '3dda3cb05713'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('port')}
+    indexes = {index['name'] for index in inspector.get_indexes('port')}
+
+    with op.batch_alter_table('port') as batch_op:
+        if 'expires_at' not in columns:
+            batch_op.add_column(sa.Column('expires_at', sa.DateTime(), nullable=True))
+        if 'ix_port_expires_at' not in indexes:
+            batch_op.create_index('ix_port_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('port') as batch_op:
+        batch_op.drop_index('ix_port_expires_at')
+        batch_op.drop_column('expires_at')
@@ -0,0 +1,32 @@
+"""Add host panel orders
+
+Revision ID: e81f5c2a9d30
+Revises: c7f1e2a94b3d
+Create Date: 2026-10-17 06:22:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e81f5c2a9d30'
+down_revision = 'c7f1e2a94b3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Panels without a host row keep following their first port, so nothing is backfilled
+    if 'host' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('host',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('ip_address', sa.String(length=15), nullable=False),
+            sa.Column('panel_order', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('ip_address')
+        )
+
+
+def downgrade():
+    op.drop_table('host')
@@ -317,15 +317,18 @@ export function changePortNumber(ip, oldPortNumber, newPortNumber, callback) {
 }
 
 /**
- * Export all entries as a JSON file.
+ * Export all entries as a JSON, NDJSON or CSV file.
  *
- * This function sends a GET request to fetch the export data and triggers a download of the resulting JSON file.
+ * This function sends a GET request to fetch the export data and triggers a download of the resulting file.
  * It handles the server communication, file naming, and initiating the download process.
  *
+ * @param {string} format - The export format: 'json', 'ndjson' or 'csv'
+ * @param {boolean} gzip - Whether to gzip the file
  * @throws {Error} Throws an error if the fetch request fails or if there's an issue with the file download
  */
-export function exportEntries() {
-    fetch('/export_entries', {
+export function exportEntries(format = 'json', gzip = false) {
+    const params = new URLSearchParams({ format: format, gzip: gzip });
+    fetch('/export_entries?' + params.toString(), {
         method: 'GET',
     })
         .then(response => {
@@ -429,6 +432,7 @@ export function purgeEntries(confirmModalElement) {
     $.ajax({
         url: '/purge_entries',
         method: 'POST',
+        data: { vacuum: 'true' },
         success: function (response) {
             console.log('Entries purged successfully:', response);
             showNotification(response.message);
@@ -55,7 +55,9 @@ export function loadPortSettings(updatePortLengthStatus) {
                 $(`input[name="port_length"][value="${data.port_length}"]`).prop('checked', true);
             }
 
-            // Always set a value for copy_format
+            // Always set a value for port_policy and copy_format
+            $('#port-policy').val(data.port_policy || 'random');
+
             const copyFormat = data.copy_format || 'port_only';
             $(`input[name="copy_format"][value="${copyFormat}"]`).prop('checked', true);
 
@@ -3,7 +3,7 @@
 /**
  * Application: Configuration Import Tool
  * Description: Provides a user interface for importing various types of configuration files.
- * It supports Caddyfile, JSON, and Docker-Compose file formats.
+ * It supports Caddyfile, JSON, NDJSON, Docker-Compose, nginx, Traefik and nmap XML file formats.
  *
  * Uses jQuery for DOM manipulation and AJAX requests.
  */
@@ -40,6 +40,8 @@ jellyfin.domain.tld {
         "order": 0
     }
 ]`,
+        'NDJSON': `{"ip_address": "192.168.1.100", "nickname": "Server1", "port_number": 8080, "description": "example.domain.com", "port_protocol": "TCP"}
+{"ip_address": "192.168.1.101", "nickname": "Server2", "port_number": 9090, "description": "app.domain.com", "port_protocol": "TCP"}`,
         'Docker-Compose': `version: '3'
 services:
     webapp:
@@ -50,7 +52,41 @@ services:
         image: postgres:12
         ports:
             - "5432:5432"
-`
+`,
+        'nginx': `upstream app {
+    server 192.168.0.123:8080;
+}
+server {
+    listen 443 ssl;
+    server_name app.domain.tld;
+    location / {
+        proxy_pass http://app;
+    }
+}`,
+        'Traefik': `http:
+  routers:
+    jellyfin:
+      rule: "Host(\`jellyfin.domain.tld\`)"
+      service: jellyfin
+  services:
+    jellyfin:
+      loadBalancer:
+        servers:
+          - url: "http://192.168.0.110:8096"`,
+        'nmap': `<?xml version="1.0" encoding="UTF-8"?>
+<nmaprun scanner="nmap" args="nmap -sV -oX scan.xml 192.168.0.0/24">
+<host>
+    <status state="up"/>
+    <address addr="192.168.0.110" addrtype="ipv4"/>
+    <hostnames><hostname name="media.lan" type="PTR"/></hostnames>
+    <ports>
+        <port protocol="tcp" portid="8096">
+            <state state="open"/>
+            <service name="http" product="Jellyfin"/>
+        </port>
+    </ports>
+</host>
+</nmaprun>`
     };
 
     /**
@@ -94,20 +130,37 @@ services:
     $('#import-form').submit(function (e) {
         e.preventDefault(); // Prevent the default form submission
 
+        const file = $('#import-file')[0].files[0] || $('#import-directory')[0].files[0];
+        if (!file && !$('#file-content').val().trim()) {
+            showNotification('Paste the file content or choose a file to upload.', 'error');
+            return;
+        }
+
+        // Uploaded files are sent as multipart form data, pasted content as a form field
+        const request = file ? {
+            data: new FormData(this),
+            processData: false,
+            contentType: false
+        } : {
+            data: $(this).serialize()
+        };
+
         // Send an AJAX POST request to the server
-        $.ajax({
+        $.ajax(Object.assign({
             url: '/import',
             method: 'POST',
-            data: $(this).serialize(),
             success: function (response) {
                 console.log('Import successful:', response);
                 showNotification(response.message);
                 $('#file-content').val(''); // Clear the textarea after successful import
+                $('#import-file').val(''); // Clear the selected file
+                $('#import-directory').val(''); // Clear the selected directory
             },
             error: function (xhr, status, error) {
                 console.error('Error importing data:', status, error);
-                showNotification('Error importing data.', 'error');
+                const message = xhr.responseJSON && xhr.responseJSON.message;
+                showNotification(message ? 'Error importing data: ' + message : 'Error importing data.', 'error');
             }
-        });
+        }, request));
     });
 });
\ No newline at end of file
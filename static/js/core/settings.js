@@ -146,9 +146,6 @@ function loadInitialSettings() {
     // Load port settings on page load
     loadPortSettings(updatePortLengthStatus);
 
-    // Apply custom CSS on page load
-    applyCustomCSS($('#custom-css').val());
-
     // Call updateEnabledPlugins on page load
     updateEnabledPlugins();
 }
@@ -249,7 +246,7 @@ function setupEventListeners() {
 
     // Handle export button click
     $('#export-entries-button').on('click', function () {
-        exportEntries();
+        exportEntries($('#export-format').val(), $('#export-gzip').is(':checked'));
     });
 
     // Handle confirmation of purge action
@@ -307,6 +304,9 @@ function setupEventListeners() {
         // Clear all input fields
         $('#port-start, #port-end, #port-exclude').val('');
 
+        // Reset the allocation policy
+        $('#port-policy').val('random');
+
         // Uncheck all radio buttons
         $('input[name="port_length"]').prop('checked', false);
 
@@ -0,0 +1,37 @@
+# tests/conftest.py
+
+# Standard Imports
+import os                                       # For pointing the app at a test database
+import tempfile                                 # For the test database file
+
+# External Imports
+import pytest                                   # For fixtures
+
+# The app reads DATABASE_URL when it is imported, and schedules no background jobs here
+_database_dir = tempfile.mkdtemp(prefix='portall-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_database_dir, 'portall.db')}"
+os.environ['LEASE_REAP_INTERVAL'] = '0'
+
+# Local Imports
+from app import app as portall_app, db          # For the application under test
+from utils.allocation import leases, port_index # For resetting the free-port index and lease times
+from utils.database import host_summary, setting # For resetting the in-process caches
+
+@pytest.fixture
+def app():
+    """An application context on an empty database."""
+    with portall_app.app_context():
+        db.drop_all()
+        db.create_all()
+        port_index.invalidate()
+        port_index.range = None
+        leases._expiry_cache = None
+        host_summary.use_range(None)
+        setting._values = None
+        setting._revision = None
+        yield portall_app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,420 @@
+# tests/test_allocation.py
+
+# Standard Imports
+from datetime import timedelta                  # For checking lease expiry times
+
+# External Imports
+import pytest                                   # For assertions on exceptions
+
+# Local Imports
+from utils.allocation import ExclusionSpec, PortRange, compile_exclusions, port_index
+from utils.allocation import lease_expiry, reap_expired_leases, reap_if_due
+from utils.allocation import leases
+from utils.allocation.leases import MAX_LEASE_SECONDS
+from utils.database import check_summaries, db, Host, Port, Setting
+from utils.routes.ports import MAX_GENERATE_BATCH
+
+def make_range(start=9000, end=9009, exclude='', length=0):
+    return PortRange.from_settings(start, end, compile_exclusions(exclude), length)
+
+def make_index(port_range):
+    # The shared index is the one kept current by the session hooks
+    port_index.configure(port_range)
+    return port_index
+
+def add_ports(ip_address, *port_numbers, protocol='TCP', expires_at=None):
+    host = Host.get_or_create(ip_address)
+    for port_number in port_numbers:
+        db.session.add(Port(host=host, port_number=port_number, port_protocol=protocol, description='test',
+                            expires_at=expires_at))
+    db.session.commit()
+
+## Exclusions ##
+
+def test_exclusions_parse_ports_ranges_and_presets():
+    spec = ExclusionSpec.parse('9100 - 9105, 8080, udp:5353, 53/tcp, x11')
+
+    assert spec.intervals() == [(6000, 6063), (8080, 8080), (9100, 9105)]
+    assert spec.intervals('UDP') == [(5353, 5353), (6000, 6063), (8080, 8080), (9100, 9105)]
+    assert spec.intervals('TCP') == [(53, 53), (6000, 6063), (8080, 8080), (9100, 9105)]
+
+def test_exclusions_merge_overlapping_intervals():
+    spec = ExclusionSpec.parse('10-20, 15-30, 31, 40')
+
+    assert spec.intervals() == [(10, 31), (40, 40)]
+    assert spec.normalized() == '10-31, 40'
+
+@pytest.mark.parametrize('text', ['abc', '70000', '20-10', 'tcp:80/udp', 'sctp:80'])
+def test_exclusions_reject_invalid_items(text):
+    with pytest.raises(ValueError):
+        ExclusionSpec.parse(text)
+
+def test_compile_exclusions_skips_invalid_stored_items():
+    assert compile_exclusions('9001, bogus, 9003').intervals() == [(9001, 9001), (9003, 9003)]
+
+## Port Ranges ##
+
+def test_port_range_applies_exclusions_and_length():
+    port_range = make_range(90, 1100, exclude='100-999', length=3)
+
+    assert list(port_range.ports) == []
+    port_range = make_range(90, 1100, exclude='100-989', length=3)
+    assert list(port_range.ports) == list(range(990, 1000))
+    assert 995 in port_range and 1000 not in port_range and 99 not in port_range
+
+def test_port_range_keeps_protocol_exclusions_separate():
+    port_range = make_range(9000, 9003, exclude='udp:9001')
+
+    assert port_range.total == 4
+    assert port_range.mask_for('TCP') == port_range.mask
+    assert port_range.mask_for('UDP') == port_range.mask & ~(1 << 9001)
+
+## Allocation Policies ##
+
+def test_lowest_policy_fills_from_the_start(app):
+    index = make_index(make_range(exclude='9001'))
+    add_ports('10.0.0.1', 9000, 9003)
+
+    assert [index.allocate('10.0.0.1', 'lowest') for _ in range(3)] == [9002, 9004, 9005]
+
+def test_next_fit_policy_continues_after_the_last_pick(app):
+    index = make_index(make_range())
+
+    assert index.allocate('10.0.0.1', 'next_fit') == 9000
+    index.release('10.0.0.1', 9000)
+    assert index.allocate('10.0.0.1', 'next_fit') == 9001
+
+def test_random_policy_only_picks_free_candidates(app):
+    index = make_index(make_range(exclude='9005-9009'))
+    add_ports('10.0.0.1', 9000, 9002)
+
+    picked = {index.allocate('10.0.0.1', 'random') for _ in range(3)}
+    assert picked == {9001, 9003, 9004}
+    assert index.allocate('10.0.0.1', 'random') is None
+
+def test_protocol_exclusions_only_apply_to_their_protocol(app):
+    index = make_index(make_range(9000, 9001, exclude='udp:9000'))
+
+    assert index.allocate('10.0.0.1', 'lowest', 'UDP') == 9001
+    assert index.allocate('10.0.0.2', 'lowest', 'TCP') == 9000
+
+def test_a_number_used_by_any_protocol_is_not_picked(app):
+    index = make_index(make_range(9000, 9001))
+    add_ports('10.0.0.1', 9000, protocol='UDP')
+
+    assert index.allocate('10.0.0.1', 'lowest') == 9001
+
+def test_unknown_policy_is_rejected(app):
+    index = make_index(make_range())
+
+    with pytest.raises(ValueError):
+        index.allocate('10.0.0.1', 'best_fit')
+
+def test_allocate_many_is_all_or_nothing(app):
+    index = make_index(make_range(9000, 9004))
+    add_ports('10.0.0.1', 9001)
+
+    assert index.allocate_many('10.0.0.1', 5, 'lowest') is None
+    assert index.allocate_many('10.0.0.1', 4, 'lowest') == [9000, 9002, 9003, 9004]
+
+def test_allocate_many_policies_pick_distinct_free_ports(app):
+    index = make_index(make_range(9000, 9099))
+    add_ports('10.0.0.1', *range(9000, 9050, 2))
+
+    picked = index.allocate_many('10.0.0.1', 30, 'random') + index.allocate_many('10.0.0.1', 40, 'next_fit')
+    assert len(set(picked)) == 70
+    assert not set(picked) & set(range(9000, 9050, 2))
+    assert index.allocate_many('10.0.0.1', 6, 'lowest') is None
+
+def test_allocate_block_finds_consecutive_ports(app):
+    index = make_index(make_range())
+    add_ports('10.0.0.1', 9002, 9006)
+
+    assert index.allocate_block('10.0.0.1', 3, 'lowest') == [9003, 9004, 9005]
+    assert index.allocate_block('10.0.0.1', 4, 'lowest') is None
+    assert index.allocate_block('10.0.0.1', 2, 'next_fit') == [9007, 9008]
+
+def test_allocate_block_is_split_by_exclusions(app):
+    index = make_index(make_range(exclude='9003'))
+
+    assert index.allocate_block('10.0.0.1', 4, 'lowest') == [9004, 9005, 9006, 9007]
+    assert index.allocate_block('10.0.0.1', 3, 'random') == [9000, 9001, 9002]
+    assert index.allocate_block('10.0.0.1', 3, 'random') is None
+
+def test_allocate_shared_picks_a_port_free_on_every_ip(app):
+    index = make_index(make_range(9000, 9003))
+    add_ports('10.0.0.1', 9000, 9001)
+    add_ports('10.0.0.2', 9002)
+
+    assert index.allocate_shared(['10.0.0.1', '10.0.0.2'], 'lowest') == 9003
+    assert index.allocate_shared(['10.0.0.1', '10.0.0.2'], 'lowest') is None
+    assert index.allocate_shared(['10.0.0.2', '10.0.0.3'], 'random') in (9000, 9001)
+
+def test_committed_ports_are_tracked_without_reloading(app):
+    index = make_index(make_range(9000, 9001))
+    port_number = index.allocate('10.0.0.1', 'lowest')
+    add_ports('10.0.0.1', port_number)
+
+    assert index.stats('10.0.0.1') == (1, 2)
+    assert index.allocate('10.0.0.1', 'lowest') == 9001
+
+def test_deleted_ports_become_free_again(app):
+    index = make_index(make_range(9000, 9001))
+    add_ports('10.0.0.1', 9000)
+    add_ports('10.0.0.1', 9000, protocol='UDP')
+    assert index.stats('10.0.0.1') == (1, 2)
+
+    # The number stays used while another protocol still has it
+    db.session.delete(Port.query.filter_by(port_protocol='TCP').one())
+    db.session.commit()
+    assert index.stats('10.0.0.1') == (1, 2)
+
+    db.session.delete(Port.query.one())
+    db.session.commit()
+    assert index.allocate('10.0.0.1', 'lowest') == 9000
+
+def test_changed_settings_rebuild_the_range(app):
+    index = make_index(make_range(9000, 9009))
+    add_ports('10.0.0.1', 9005)
+
+    index.configure(make_range(9005, 9006))
+    assert index.stats('10.0.0.1') == (1, 2)
+    assert index.allocate('10.0.0.1', 'lowest') == 9006
+
+def test_sync_reloads_ips_changed_by_another_worker(app):
+    index = make_index(make_range(9000, 9002))
+    assert index.stats('10.0.0.1') == (0, 3)
+
+    # Rows written by another worker don't reach this index through the session hooks
+    host = Host.get_or_create('10.0.0.1')
+    db.session.execute(Port.__table__.insert(), [
+        {'host_id': host.id, 'port_number': 9000, 'port_protocol': 'UDP', 'description': 'other'}
+    ])
+    db.session.commit()
+
+    index.sync({'10.0.0.1': 0})
+    assert index.allocate('10.0.0.1', 'lowest') == 9000
+    index.release('10.0.0.1', 9000)
+    index.sync({'10.0.0.1': 1})
+    assert index.allocate('10.0.0.1', 'lowest') == 9001
+
+## Routes ##
+
+def generate(client, **fields):
+    data = {'ip_address': '10.0.0.1', 'nickname': '', 'description': 'test', 'protocol': 'TCP'}
+    data.update(fields)
+    return client.post('/generate_port', data=data)
+
+def test_generate_port_uses_the_requested_policy(client):
+    client.post('/port_settings', data={'port_start': '9000', 'port_end': '9002', 'port_exclude': '',
+                                        'port_length': '', 'copy_format': 'port_only', 'port_policy': 'random'})
+
+    ports = [generate(client, policy='lowest').get_json()['port'] for _ in range(3)]
+
+    assert ports == [9000, 9001, 9002]
+    assert generate(client, policy='lowest').status_code == 400
+
+def test_generate_port_retries_after_another_worker_took_the_port(client):
+    client.post('/port_settings', data={'port_start': '9000', 'port_end': '9002', 'port_exclude': '', 'port_length': ''})
+    first = client.post('/generate_port', data={'ip_address': '10.0.0.1', 'nickname': '', 'description': 'a',
+                                                'protocol': 'TCP', 'policy': 'lowest'}).get_json()
+
+    # Another worker saves the next port without this worker's index seeing it
+    db.session.execute(Port.__table__.insert(), [
+        {'host_id': Host.query.one().id, 'port_number': first['port'] + 1, 'port_protocol': 'TCP', 'description': 'b'}
+    ])
+    db.session.commit()
+
+    response = client.post('/generate_port', data={'ip_address': '10.0.0.1', 'nickname': '', 'description': 'c',
+                                                   'protocol': 'TCP', 'policy': 'lowest'})
+    assert response.status_code == 200
+    assert response.get_json()['port'] == first['port'] + 2
+
+def set_port_range(client, start, end):
+    client.post('/port_settings', data={'port_start': str(start), 'port_end': str(end), 'port_exclude': '',
+                                        'port_length': '', 'copy_format': 'port_only', 'port_policy': 'lowest'})
+
+def test_port_settings_store_normalized_exclusions(client):
+    response = client.post('/port_settings', data={'port_start': '9000', 'port_end': '9009',
+                                                   'port_exclude': '9005, 9003-9004, udp:53', 'port_length': '',
+                                                   'copy_format': 'port_only', 'port_policy': 'lowest'})
+    assert response.status_code == 200
+    assert Setting.get('port_exclude') == '9003-9005, udp:53'
+
+    response = client.post('/port_settings', data={'port_start': '9000', 'port_end': '9009', 'port_exclude': '90000',
+                                                   'port_length': '', 'copy_format': 'port_only', 'port_policy': 'lowest'})
+    assert response.status_code == 400
+    assert Setting.get('port_exclude') == '9003-9005, udp:53'
+
+def test_generate_ports_saves_a_count_of_ports(client):
+    set_port_range(client, 9000, 9009)
+
+    response = client.post('/generate_ports', json={'ip_address': '10.0.0.1', 'description': 'worker', 'count': 3})
+
+    assert response.status_code == 200
+    assert [item['port'] for item in response.get_json()['ports']] == [9000, 9001, 9002]
+    assert sorted((port.port_number, port.order) for port in Port.query) == [(9000, 1024), (9001, 2048), (9002, 3072)]
+
+def test_generate_ports_accepts_requests_across_ips(client):
+    set_port_range(client, 9000, 9009)
+    add_ports('10.0.0.2', 9000)
+
+    response = client.post('/generate_ports', json={'requests': [
+        {'ip_address': '10.0.0.1', 'description': 'a'},
+        {'ip_address': '10.0.0.2', 'description': 'b', 'protocol': 'udp'},
+        {'ip_address': '10.0.0.1', 'description': 'c'},
+    ]})
+
+    assert [(item['ip_address'], item['port'], item['protocol']) for item in response.get_json()['ports']] == [
+        ('10.0.0.1', 9000, 'TCP'), ('10.0.0.2', 9001, 'UDP'), ('10.0.0.1', 9001, 'TCP'),
+    ]
+
+def test_generate_ports_is_all_or_nothing(client):
+    set_port_range(client, 9000, 9001)
+
+    response = client.post('/generate_ports', json={'requests': [
+        {'ip_address': '10.0.0.1', 'description': 'a'},
+        {'ip_address': '10.0.0.2', 'description': 'b'},
+        {'ip_address': '10.0.0.2', 'description': 'c'},
+        {'ip_address': '10.0.0.2', 'description': 'd'},
+    ]})
+
+    assert response.status_code == 400
+    assert Port.query.count() == 0
+    assert port_index.allocate('10.0.0.1', 'lowest') == 9000
+
+def test_generate_ports_rejects_incomplete_requests(client):
+    assert client.post('/generate_ports', json={'ip_address': '10.0.0.1', 'count': 2}).status_code == 400
+    assert client.post('/generate_ports', json={'ip_address': '10.0.0.1', 'description': 'a'}).status_code == 400
+    assert client.post('/generate_ports', json={'description': 'a', 'count': 'two'}).status_code == 400
+    response = client.post('/generate_ports', json={'ip_address': '10.0.0.1', 'description': 'a', 'count': 1,
+                                                    'policy': 'best_fit'})
+    assert response.status_code == 400
+
+def test_generate_ports_rejects_malformed_payloads(client):
+    for payload in (['10.0.0.1'], {'requests': 'a'}, {'requests': ['10.0.0.1']},
+                    {'requests': [{'ip_address': ['10.0.0.1'], 'description': 'a'}]},
+                    {'requests': [{'ip_address': '10.0.0.1', 'description': 'a', 'protocol': 6}]}):
+        assert client.post('/generate_ports', json=payload).status_code == 400
+    assert Port.query.count() == 0
+
+def test_generate_ports_caps_the_batch_size(client):
+    too_many = MAX_GENERATE_BATCH + 1
+    item = {'ip_address': '10.0.0.1', 'description': 'a'}
+
+    assert client.post('/generate_ports', json={**item, 'count': too_many}).status_code == 400
+    assert client.post('/generate_ports', json={'requests': [item] * too_many}).status_code == 400
+    assert Port.query.count() == 0
+
+def test_port_blocks_are_saved_and_deleted_together(client):
+    set_port_range(client, 9000, 9009)
+    add_ports('10.0.0.1', 9001)
+
+    block = client.post('/generate_port_block', data={'ip_address': '10.0.0.1', 'nickname': '', 'description': 'rtp',
+                                                      'protocol': 'UDP', 'block_size': '4'}).get_json()
+
+    assert (block['port_start'], block['port_end']) == (9002, 9005)
+    assert Port.query.filter_by(block_id=block['block_id']).count() == 4
+
+    response = client.post('/delete_port_block', data={'block_id': block['block_id']})
+    assert response.get_json()['deleted'] == 4
+    assert [port.port_number for port in Port.query] == [9001]
+    assert client.post('/delete_port_block', data={'block_id': block['block_id']}).status_code == 404
+
+    # The bulk delete leaves the summaries and the free ports current
+    assert check_summaries() == []
+    assert port_index.allocate('10.0.0.1', 'lowest') == 9000
+    assert port_index.allocate('10.0.0.1', 'lowest') == 9002
+
+@pytest.mark.parametrize('block_size', ['0', 'four', '11'])
+def test_invalid_port_blocks_are_rejected(client, block_size):
+    set_port_range(client, 9000, 9009)
+
+    response = client.post('/generate_port_block', data={'ip_address': '10.0.0.1', 'description': 'rtp',
+                                                         'protocol': 'UDP', 'block_size': block_size})
+    assert response.status_code == 400
+
+def test_cluster_ports_are_saved_on_every_ip(client):
+    set_port_range(client, 9000, 9009)
+    add_ports('10.0.0.2', 9000)
+
+    response = client.post('/generate_cluster_port', json={'ip_addresses': ['10.0.0.1', '10.0.0.2', '10.0.0.1'],
+                                                            'description': 'gossip', 'protocol': 'udp'})
+
+    assert response.get_json()['port'] == 9001
+    assert sorted((port.ip_address, port.port_number, port.port_protocol) for port in Port.query) == [
+        ('10.0.0.1', 9001, 'UDP'), ('10.0.0.2', 9000, 'TCP'), ('10.0.0.2', 9001, 'UDP'),
+    ]
+    assert client.post('/generate_cluster_port', json={'ip_addresses': [], 'description': 'a'}).status_code == 400
+
+def test_unknown_policies_are_rejected(client):
+    assert generate(client, policy='best_fit').status_code == 400
+    response = client.post('/port_settings', data={'port_start': '9000', 'port_end': '9002', 'port_policy': 'best_fit'})
+    assert response.status_code == 400
+
+## Leases ##
+
+def test_lease_expiry(app):
+    assert lease_expiry(None) is None
+    assert lease_expiry('') is None
+    expires_at = lease_expiry('60')
+    assert timedelta(seconds=55) < expires_at - leases.utcnow() <= timedelta(seconds=60)
+
+@pytest.mark.parametrize('lease_seconds', ['0', '-5', 'soon', '1.5', 1.5, 60.0, True, MAX_LEASE_SECONDS + 1,
+                                           10 ** 30, float('inf')])
+def test_lease_expiry_rejects_invalid_durations(app, lease_seconds):
+    with pytest.raises(ValueError):
+        lease_expiry(lease_seconds)
+
+def test_expired_leases_are_reaped_and_freed(app):
+    index = make_index(make_range(9000, 9001))
+    add_ports('10.0.0.1', 9000, expires_at=leases.utcnow() - timedelta(seconds=1))
+    add_ports('10.0.0.1', 9001, expires_at=leases.utcnow() + timedelta(hours=1))
+    assert index.allocate('10.0.0.1', 'lowest') is None
+
+    assert reap_expired_leases() == 1
+    assert [port.port_number for port in Port.query] == [9001]
+    assert index.allocate('10.0.0.1', 'lowest') == 9000
+
+def test_reap_if_due_waits_for_the_earliest_lease(app):
+    expires_at = lease_expiry('3600')
+    add_ports('10.0.0.1', 9000, expires_at=expires_at)
+    assert reap_if_due() == 0
+
+    # Once the lease is due the next allocation reaps it
+    Port.query.update({'expires_at': leases.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+    leases._expiry_cache = None
+    assert reap_if_due() == 1
+    assert Port.query.count() == 0
+
+def test_leases_of_other_workers_are_seen_once_the_cache_expires(app, monkeypatch):
+    assert reap_if_due() == 0
+
+    # Another worker saves a lease that has already expired
+    host = Host.get_or_create('10.0.0.1')
+    db.session.commit()
+    db.session.execute(Port.__table__.insert(), [
+        {'host_id': host.id, 'port_number': 9000, 'port_protocol': 'TCP', 'description': 'other',
+         'expires_at': leases.utcnow() - timedelta(seconds=1)}
+    ])
+    db.session.commit()
+    assert reap_if_due() == 0
+
+    monkeypatch.setattr(leases, 'EXPIRY_CACHE_SECONDS', 0)
+    assert reap_if_due() == 1
+    assert leases.next_expiry() is None
+
+def test_generated_ports_can_be_leases(client):
+    set_port_range(client, 9000, 9009)
+
+    single = generate(client, lease_seconds='60').get_json()
+    batch = client.post('/generate_ports', json={'ip_address': '10.0.0.1', 'description': 'a', 'count': 2,
+                                                 'lease_seconds': 60}).get_json()
+
+    assert single['expires_at'] and batch['expires_at']
+    assert Port.query.filter(Port.expires_at.isnot(None)).count() == 3
+    assert generate(client, lease_seconds='-1').status_code == 400
+    response = client.post('/add_port', data={'ip': '10.0.0.1', 'ip_nickname': '', 'port_number': '80',
+                                              'description': 'web', 'protocol': 'TCP', 'lease_seconds': 'soon'})
+    assert response.status_code == 400
@@ -0,0 +1,78 @@
+# tests/test_assets.py
+
+# Local Imports
+from app import app as portall_app
+from utils import assets as assets_module
+from utils.assets import IMMUTABLE_CACHE_CONTROL, AssetManifest
+
+def write_static(folder, files):
+    for path, content in files.items():
+        target = folder / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(content)
+
+## Manifest ##
+
+def test_stylesheets_are_bundled_with_their_imports(tmp_path):
+    write_static(tmp_path, {
+        'css/global/base.css': '/* base */\nbody {\n    margin: 0;\n}\n',
+        'css/themes/light.css': "@import '../global/base.css';\n\na::after { content: '/* kept */'; }\n",
+    })
+
+    asset = AssetManifest(str(tmp_path)).assets['css/themes/light.css']
+
+    assert asset.body == b"body {\nmargin: 0;\n}\na::after { content: '/* kept */'; }"
+    assert asset.versioned_path.startswith('css/themes/light.') and asset.versioned_path.endswith('.css')
+
+def test_module_hashes_cover_their_import_graph(tmp_path):
+    files = {
+        'js/main.js': "import { helper } from './utils/helper.js';\nhelper();\n",
+        'js/utils/helper.js': "export function helper() { return 1; }\n",
+        'js/other.js': "console.log('unrelated');\n",
+    }
+    write_static(tmp_path, files)
+    before = AssetManifest(str(tmp_path)).assets
+
+    helper = before['js/utils/helper.js']
+    assert before['js/main.js'].dependencies == ('js/utils/helper.js',)
+    assert f"from './utils/{helper.versioned_path.split('/')[-1]}'".encode() in before['js/main.js'].body
+
+    write_static(tmp_path, {'js/utils/helper.js': "export function helper() { return 2; }\n"})
+    after = AssetManifest(str(tmp_path)).assets
+
+    assert after['js/main.js'].digest != before['js/main.js'].digest
+    assert after['js/other.js'].digest == before['js/other.js'].digest
+
+## Serving ##
+
+def test_versioned_assets_are_cached_immutably(client, app):
+    with app.test_request_context():
+        url = app.jinja_env.globals['asset_url']('js/main.js')
+    assert url.startswith('/assets/js/main.')
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+
+    response = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+def test_unknown_assets_are_not_found(client):
+    assert client.get('/assets/js/main.0000000000.js').status_code == 404
+
+def test_debug_mode_checks_the_static_folder_once_per_request(monkeypatch):
+    # Outside the app fixture, so that every request gets its own app context as when serving
+    app = portall_app
+    stamps = []
+    tree_stamp = assets_module._tree_stamp
+    monkeypatch.setattr(assets_module, '_tree_stamp', lambda folder: stamps.append(folder) or tree_stamp(folder))
+    monkeypatch.setattr(app, 'debug', True)
+    asset_url = app.jinja_env.globals['asset_url']
+
+    with app.test_request_context():
+        urls = [asset_url('js/main.js') for _ in range(5)]
+    with app.test_request_context():
+        asset_url('js/main.js')
+
+    assert len(set(urls)) == 1
+    assert len(stamps) == 2
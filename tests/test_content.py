@@ -0,0 +1,82 @@
+# tests/test_content.py
+
+# Local Imports
+from utils.content import cached_from_files, content_etag
+
+## Cached File Content ##
+
+def test_cached_value_follows_its_files(tmp_path):
+    source = tmp_path / 'notes.md'
+    source.write_text('one')
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return source.read_text()
+
+    assert cached_from_files('test_notes', [str(source)], compute) == 'one'
+    assert cached_from_files('test_notes', [str(source)], compute) == 'one'
+    assert len(calls) == 1
+
+    source.write_text('two, longer')
+    assert cached_from_files('test_notes', [str(source)], compute) == 'two, longer'
+    assert len(calls) == 2
+
+def test_missing_files_are_cached_too(tmp_path):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 'empty'
+
+    for _ in range(2):
+        assert cached_from_files('test_missing', [str(tmp_path / 'missing.md')], compute) == 'empty'
+    assert len(calls) == 1
+
+def test_content_etag_depends_on_every_part():
+    assert content_etag('a', 'bc') == content_etag('a', b'bc')
+    assert content_etag('a', 'bc') != content_etag('ab', 'c')
+
+## About Content ##
+
+def test_about_content_is_revalidated_by_etag(client):
+    response = client.get('/get_about_content')
+
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert set(response.get_json()) == {'planned_features', 'changelog'}
+    etag = response.headers['ETag']
+
+    response = client.get('/get_about_content', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    response = client.get('/get_about_content', headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+
+## Custom CSS ##
+
+def test_custom_css_is_served_from_a_fingerprinted_url(client):
+    assert client.get('/custom_css/0123456789abcdef.css').status_code == 404
+
+    client.post('/settings', data={'custom_css': 'body { color: red; }'})
+    url = f"/custom_css/{content_etag('body { color: red; }')[:16]}.css"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/css'
+    assert response.data == b'body { color: red; }'
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+    response = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+def test_outdated_custom_css_urls_redirect(client):
+    client.post('/settings', data={'custom_css': 'a { color: blue; }'})
+    old_url = f"/custom_css/{content_etag('a { color: blue; }')[:16]}.css"
+    client.post('/settings', data={'custom_css': 'a { color: green; }'})
+
+    response = client.get(old_url)
+
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith(f"/custom_css/{content_etag('a { color: green; }')[:16]}.css")
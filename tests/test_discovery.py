@@ -0,0 +1,203 @@
+# tests/test_discovery.py
+
+# Standard Imports
+import os                                       # For building the fixture /proc tree
+import socket                                   # For encoding addresses
+import sys                                      # For the byte order of /proc addresses
+
+# External Imports
+import pytest                                   # For fixtures
+
+# Local Imports
+from utils import discovery
+from utils.database import db, Host, Port, Setting
+from utils.discovery import (_decode_addresses, _listening_rows, discover_local_ports, init_local_discovery,
+                             local_host_ip, read_listening_sockets, reconcile_local_ports)
+from utils.services import service_name
+
+HEADER = '  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n'
+
+def hex_address(ip_address):
+    """Encode an address the way /proc/net prints it, as 32-bit words in host byte order."""
+    packed = socket.inet_pton(socket.AF_INET6 if ':' in ip_address else socket.AF_INET, ip_address)
+    return ''.join(f"{int.from_bytes(packed[i:i + 4], sys.byteorder):08X}" for i in range(0, len(packed), 4))
+
+def socket_line(number, local, remote, state, inode):
+    (local_ip, local_port), (remote_ip, remote_port) = local, remote
+    return (f"{number:4}: {hex_address(local_ip)}:{local_port:04X} {hex_address(remote_ip)}:{remote_port:04X} "
+            f"{state} 00000000:00000000 00:00000000 00000000     0        0 {inode} 1 0000000000000000\n")
+
+def write_table(proc_root, name, sockets):
+    with open(os.path.join(proc_root, 'net', name), 'w') as table:
+        table.write(HEADER + ''.join(socket_line(number, *fields) for number, fields in enumerate(sockets)))
+
+@pytest.fixture
+def proc_root(tmp_path):
+    """A /proc tree with a few listening, connected and ephemeral sockets, and two processes."""
+    root = str(tmp_path)
+    os.makedirs(os.path.join(root, 'net'))
+    os.makedirs(os.path.join(root, 'sys', 'net', 'ipv4'))
+    with open(os.path.join(root, 'sys', 'net', 'ipv4', 'ip_local_port_range'), 'w') as setting:
+        setting.write('32768\t60999\n')
+
+    write_table(root, 'tcp', [
+        (('0.0.0.0', 22), ('0.0.0.0', 0), '0A', '1001'),
+        (('127.0.0.1', 5432), ('0.0.0.0', 0), '0A', '1002'),
+        (('10.0.0.5', 8080), ('0.0.0.0', 0), '0A', '1003'),
+        (('10.0.0.5', 22), ('10.0.0.9', 51000), '01', '1004'),
+    ])
+    write_table(root, 'tcp6', [
+        (('::', 22), ('::', 0), '0A', '1005'),
+        (('::ffff:10.0.0.6', 9000), ('::', 0), '0A', '1006'),
+    ])
+    write_table(root, 'udp', [
+        (('0.0.0.0', 53), ('0.0.0.0', 0), '07', '1007'),
+        (('0.0.0.0', 40000), ('0.0.0.0', 0), '07', '1008'),
+        (('10.0.0.5', 5353), ('10.0.0.1', 53), '07', '1009'),
+    ])
+    # No udp6 table, as on hosts without IPv6
+
+    for pid, name, inodes in (('100', 'sshd', ['1001', '1005']), ('200', 'dnsmasq', ['1007'])):
+        os.makedirs(os.path.join(root, pid, 'fd'))
+        with open(os.path.join(root, pid, 'comm'), 'w') as comm:
+            comm.write(f"{name}\n")
+        for descriptor, inode in enumerate(inodes, start=3):
+            os.symlink(f"socket:[{inode}]", os.path.join(root, pid, 'fd', str(descriptor)))
+    return root
+
+## /proc Parsing ##
+
+def test_listening_rows_keep_only_listening_sockets(proc_root):
+    tcp = _listening_rows(os.path.join(proc_root, 'net', 'tcp'), '0A')
+    udp = _listening_rows(os.path.join(proc_root, 'net', 'udp'), '07')
+
+    assert [(port, inode) for _, port, inode in tcp] == [(22, '1001'), (5432, '1002'), (8080, '1003')]
+    assert [(port, inode) for _, port, inode in udp] == [(53, '1007'), (40000, '1008')]
+    assert _listening_rows(os.path.join(proc_root, 'net', 'udp6'), '07') == []
+
+def test_addresses_are_decoded_in_bulk():
+    addresses = ['127.0.0.1', '10.0.0.5', '0.0.0.0']
+    assert _decode_addresses([hex_address(ip) for ip in addresses], socket.AF_INET) == {
+        hex_address(ip): ip for ip in addresses}
+
+    addresses = ['::', 'fd00::1', '::ffff:10.0.0.6']
+    decoded = _decode_addresses([hex_address(ip) for ip in addresses], socket.AF_INET6)
+    assert [decoded[hex_address(ip)] for ip in addresses] == ['::', 'fd00::1', '10.0.0.6']
+    assert _decode_addresses([], socket.AF_INET) == {}
+
+def test_listening_sockets_with_their_processes(proc_root):
+    sockets = read_listening_sockets(proc_root, processes=True)
+
+    assert [(found['ip'], found['port'], found['protocol'], found['process']) for found in sockets] == [
+        ('0.0.0.0', 22, 'TCP', 'sshd'),
+        ('::', 22, 'TCP', 'sshd'),
+        ('127.0.0.1', 5432, 'TCP', None),
+        ('10.0.0.5', 8080, 'TCP', None),
+        ('10.0.0.6', 9000, 'TCP', None),
+        ('0.0.0.0', 53, 'UDP', 'dnsmasq'),
+    ]
+    assert sockets[0]['pid'] == 100
+
+## Discovery ##
+
+def test_discovered_ports_are_shaped_like_docker_ports(proc_root):
+    discovered = discover_local_ports('10.0.0.5', proc_root, processes=True)
+
+    assert [(found['host_ip'], found['host_port'], found['container_port'], found['container_name'])
+            for found in discovered] == [
+        ('10.0.0.5', '22', '22/tcp', 'sshd'),
+        ('10.0.0.5', '8080', '8080/tcp', None),
+        ('10.0.0.6', '9000', '9000/tcp', None),
+        ('10.0.0.5', '53', '53/udp', 'dnsmasq'),
+    ]
+    assert discovered[0]['container_id'] == '100'
+    assert discovered[0]['service'] == 'ssh'
+
+def test_loopback_listeners_are_optional(proc_root):
+    discovered = discover_local_ports('10.0.0.5', proc_root, loopback=True)
+
+    assert ('127.0.0.1', '5432') in [(found['host_ip'], found['host_port']) for found in discovered]
+
+def test_reconcile_adds_listening_ports_and_reports_stale_ones(app, proc_root):
+    host = Host.get_or_create('10.0.0.5')
+    db.session.add_all([Port(host=host, port_number=22, port_protocol='TCP', description='ssh', order=1024),
+                        Port(host=host, port_number=3000, port_protocol='TCP', description='old', order=2048)])
+    db.session.commit()
+
+    result = reconcile_local_ports('10.0.0.5', proc_root, processes=True)
+
+    assert result == {'added': 3, 'existing': 1, 'stale': [(3000, 'TCP')]}
+    assert sorted((port.host.ip_address, port.port_number, port.port_protocol, port.description)
+                  for port in Port.query) == [
+        ('10.0.0.5', 22, 'TCP', 'ssh'),
+        ('10.0.0.5', 53, 'UDP', 'dnsmasq'),
+        ('10.0.0.5', 3000, 'TCP', 'old'),
+        ('10.0.0.5', 8080, 'TCP', service_name(8080, 'TCP') or ''),
+        ('10.0.0.6', 9000, 'TCP', service_name(9000, 'TCP') or ''),
+    ]
+
+## Host IP ##
+
+def test_wildcard_listeners_are_not_filed_under_loopback(app, monkeypatch):
+    monkeypatch.delenv('LOCAL_DISCOVERY_HOST_IP', raising=False)
+    monkeypatch.setattr(discovery, 'primary_address', lambda: '10.0.0.5')
+    assert local_host_ip() == '10.0.0.5'
+
+    monkeypatch.setenv('LOCAL_DISCOVERY_HOST_IP', '10.0.0.7')
+    assert local_host_ip() == '10.0.0.7'
+    Setting.set_many({'local_host_ip': '10.0.0.8'})
+    assert local_host_ip() == '10.0.0.8'
+    assert local_host_ip('10.0.0.9') == '10.0.0.9'
+
+def test_primary_address_is_never_loopback():
+    assert discovery.primary_address() not in ('127.0.0.1', '::1', '0.0.0.0', '::')
+
+## Routes ##
+
+def test_local_routes_need_the_plugin_enabled(client, proc_root, monkeypatch):
+    monkeypatch.setattr(discovery, 'PROC_ROOT', proc_root)
+
+    assert client.post('/discover_local_ports', json={}).status_code == 403
+    assert client.post('/reconcile_local_ports', json={}).status_code == 403
+
+    client.post('/save_local_config', json={'hostIP': '10.0.0.5', 'enabled': True})
+    assert client.get('/get_local_config').get_json()['config'] == {'hostIP': '10.0.0.5', 'enabled': True}
+    response = client.post('/reconcile_local_ports', json={})
+
+    assert response.status_code == 200
+    assert ('10.0.0.5', 53) in [(port.host.ip_address, port.port_number) for port in Port.query]
+
+def test_local_routes_need_a_host_ip(client, monkeypatch):
+    monkeypatch.delenv('LOCAL_DISCOVERY_HOST_IP', raising=False)
+    monkeypatch.setattr(discovery, 'primary_address', lambda: None)
+    client.post('/save_local_config', json={'enabled': True})
+
+    assert client.post('/discover_local_ports', json={}).status_code == 400
+
+## Scheduling ##
+
+def test_bad_discovery_interval_leaves_discovery_off(app, monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(discovery, 'schedule_job', lambda *args: scheduled.append(args))
+    monkeypatch.setenv('LOCAL_DISCOVERY_INTERVAL', 'hourly')
+
+    init_local_discovery(app)
+
+    assert scheduled == []
+
+def test_scheduled_discovery_follows_the_setting(app, proc_root, monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(discovery, 'schedule_job', lambda *args: scheduled.append(args))
+    monkeypatch.setattr(discovery, 'PROC_ROOT', proc_root)
+    monkeypatch.setenv('LOCAL_DISCOVERY_INTERVAL', '60')
+    monkeypatch.setenv('LOCAL_DISCOVERY_HOST_IP', '10.0.0.5')
+    init_local_discovery(app)
+    run_discovery = scheduled[0][2]
+
+    run_discovery()
+    assert Port.query.count() == 0
+
+    Setting.set_many({'local_enabled': 'True'})
+    db.session.commit()
+    run_discovery()
+    assert Port.query.count() == 4
@@ -0,0 +1,84 @@
+# tests/test_export.py
+
+# Standard Imports
+import csv                                      # For reading CSV exports
+import gzip                                     # For reading compressed exports
+import io                                       # For reading exports as files
+import json                                     # For reading JSON exports
+
+# External Imports
+import pytest                                   # For parametrized tests
+
+# Local Imports
+from utils.database import db, Host, Port
+from utils.export import EXPORT_FIELDS, encode_export, iter_port_batches, stream_export
+
+PORTS = [
+    {'ip_address': '10.0.0.1', 'nickname': 'nas', 'port_number': 80, 'description': 'Web "UI"',
+     'port_protocol': 'TCP', 'order': 1024},
+    {'ip_address': '10.0.0.1', 'nickname': 'nas', 'port_number': 53, 'description': 'DNS, local',
+     'port_protocol': 'UDP', 'order': 2048},
+    {'ip_address': '10.0.0.2', 'nickname': None, 'port_number': 22, 'description': 'SSH',
+     'port_protocol': 'TCP', 'order': 1024},
+]
+
+@pytest.fixture
+def ports(app):
+    for item in PORTS:
+        host = Host.get_or_create(item['ip_address'], item['nickname'])
+        db.session.add(Port(host=host, port_number=item['port_number'], description=item['description'],
+                            port_protocol=item['port_protocol'], order=item['order']))
+    db.session.commit()
+    return PORTS
+
+def read(export_format, compress=False, batch_size=None):
+    data = b''.join(stream_export(export_format, compress, batch_size))
+    return (gzip.decompress(data) if compress else data).decode('utf-8')
+
+def test_batches_cover_every_port_once(ports):
+    batches = list(iter_port_batches(batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert [item for batch in batches for item in batch] == ports
+
+@pytest.mark.parametrize('batch_size', [1, 2, 1000])
+def test_json_export_matches_a_single_dump(ports, batch_size):
+    assert read('json', batch_size=batch_size) == json.dumps(ports, indent=2)
+
+def test_empty_json_export_is_an_empty_array(app):
+    assert read('json') == '[]'
+    assert json.loads(''.join(encode_export([[], []], 'json'))) == []
+
+def test_ndjson_export_has_one_port_per_line(ports):
+    assert [json.loads(line) for line in read('ndjson', batch_size=2).splitlines()] == ports
+
+def test_csv_export_has_a_header_and_quoted_values(ports):
+    rows = list(csv.DictReader(io.StringIO(read('csv', batch_size=2))))
+
+    assert list(rows[0]) == list(EXPORT_FIELDS)
+    assert [row['description'] for row in rows] == [item['description'] for item in ports]
+
+def test_gzip_export_decompresses_to_the_same_file(ports):
+    assert read('ndjson', compress=True, batch_size=1) == read('ndjson')
+
+def test_unknown_format_is_rejected(app):
+    with pytest.raises(ValueError):
+        list(encode_export([], 'xml'))
+
+def test_export_route_streams_a_download(client, ports):
+    response = client.get('/export_entries?format=json&gzip=true')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/gzip'
+    assert 'portall_export_' in response.headers['Content-Disposition']
+    assert json.loads(gzip.decompress(response.data)) == ports
+    assert client.get('/export_entries?format=xml').status_code == 400
+
+def test_exported_json_imports_again(client, ports):
+    exported = client.get('/export_entries').get_data(as_text=True)
+    client.post('/purge_entries')
+
+    response = client.post('/import', data={'import_type': 'JSON', 'file_content': exported})
+
+    assert response.get_json()['success']
+    assert read('json') == json.dumps(ports, indent=2)
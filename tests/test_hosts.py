@@ -0,0 +1,83 @@
+# tests/test_hosts.py
+
+# Local Imports
+from utils.database import db, Host, Port
+
+def add_port(client, ip_address, port_number, nickname='', protocol='TCP'):
+    return client.post('/add_port', data={'ip': ip_address, 'ip_nickname': nickname, 'port_number': str(port_number),
+                                          'description': 'd', 'protocol': protocol})
+
+def edit_ip(client, old_ip, new_ip, nickname='', **fields):
+    return client.post('/edit_ip', data={'old_ip': old_ip, 'new_ip': new_ip, 'new_nickname': nickname, **fields})
+
+def test_ports_of_an_ip_share_one_host(client):
+    add_port(client, '10.0.0.1', 80, nickname='nas')
+    add_port(client, '10.0.0.1', 443)
+    add_port(client, '10.0.0.2', 22)
+
+    hosts = {host.ip_address: host for host in Host.query}
+    assert sorted(hosts) == ['10.0.0.1', '10.0.0.2']
+    assert hosts['10.0.0.1'].panel_order < hosts['10.0.0.2'].panel_order
+    assert [(port.ip_address, port.nickname) for port in Port.for_ip('10.0.0.1')] == [('10.0.0.1', 'nas')] * 2
+
+def test_edit_ip_updates_only_the_host(client):
+    add_port(client, '10.0.0.1', 80, nickname='nas')
+    add_port(client, '10.0.0.1', 443)
+    host_ids = {port.id: port.host_id for port in Port.query}
+
+    response = edit_ip(client, '10.0.0.1', '10.0.0.9', 'storage')
+
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert [(host.ip_address, host.nickname) for host in Host.query] == [('10.0.0.9', 'storage')]
+    assert {port.id: port.host_id for port in Port.query} == host_ids
+    assert edit_ip(client, '10.0.0.1', '10.0.0.2').status_code == 404
+
+def test_edit_ip_merges_into_an_existing_host(client):
+    add_port(client, '10.0.0.1', 80)
+    add_port(client, '10.0.0.2', 22, nickname='router')
+
+    edit_ip(client, '10.0.0.1', '10.0.0.2', 'router')
+
+    db.session.expire_all()
+    assert [host.ip_address for host in Host.query] == ['10.0.0.2']
+    assert sorted(port.port_number for port in Port.for_ip('10.0.0.2')) == [22, 80]
+
+def test_edit_ip_refuses_to_merge_clashing_ports(client):
+    add_port(client, '10.0.0.1', 80)
+    add_port(client, '10.0.0.1', 53, protocol='UDP')
+    add_port(client, '10.0.0.1', 443)
+    add_port(client, '10.0.0.2', 80)
+    add_port(client, '10.0.0.2', 53, protocol='UDP')
+    add_port(client, '10.0.0.2', 443, protocol='UDP')
+
+    response = edit_ip(client, '10.0.0.1', '10.0.0.2')
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == '10.0.0.2 already has ports 53/UDP, 80/TCP, move or delete them first'
+    db.session.expire_all()
+    assert Port.for_ip('10.0.0.1').count() == 3
+    assert Port.for_ip('10.0.0.2').count() == 3
+
+def test_hosts_can_override_the_allocation_policy(client):
+    client.post('/port_settings', data={'port_start': '9000', 'port_end': '9009', 'port_exclude': '',
+                                        'port_length': '', 'copy_format': 'port_only', 'port_policy': 'random'})
+    add_port(client, '10.0.0.1', 80)
+
+    assert edit_ip(client, '10.0.0.1', '10.0.0.1', port_policy='best_fit').status_code == 400
+    edit_ip(client, '10.0.0.1', '10.0.0.1', port_policy='lowest')
+    ports = [client.post('/generate_port', data={'ip_address': '10.0.0.1', 'nickname': '', 'description': 'd',
+                                                 'protocol': 'TCP'}).get_json()['port'] for _ in range(3)]
+
+    assert ports == [9000, 9001, 9002]
+
+def test_delete_ip_removes_the_host_and_its_ports(client):
+    add_port(client, '10.0.0.1', 80)
+    add_port(client, '10.0.0.1', 443)
+    add_port(client, '10.0.0.2', 22)
+
+    response = client.post('/delete_ip', data={'ip': '10.0.0.1'})
+
+    assert response.get_json()['success']
+    assert [host.ip_address for host in Host.query] == ['10.0.0.2']
+    assert [port.port_number for port in Port.query] == [22]
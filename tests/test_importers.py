@@ -0,0 +1,402 @@
+# tests/test_importers.py
+
+# Standard Imports
+import io                                       # For streamed content
+import json                                     # For building JSON imports
+
+# External Imports
+import pytest                                   # For assertions on exceptions
+
+# Local Imports
+from utils import importer
+from utils.database import check_summaries, Host, Port
+from utils.importer import import_entries, iter_json_array, iter_ndjson, parse_files
+from utils.importers import (ComposeError, iter_caddy_entries, iter_compose_entries, iter_nginx_entries,
+                             iter_nmap_entries, iter_traefik_entries)
+from utils.importers.quoting import open_quote
+from utils.importers.traefik import tomllib
+
+def ports(entries):
+    return [(entry['ip'], entry['port'], entry['port_protocol'], entry['description']) for entry in entries]
+
+## Quoting ##
+
+def test_open_quotes_continue_on_the_next_line():
+    assert open_quote('add_header X "a\n', '"\'', delimiters=';{}')
+    assert not open_quote('add_header X "a";\n', '"\'', delimiters=';{}')
+    assert open_quote('return 200 ;"a\n', '"\'', delimiters=';{}')
+    assert not open_quote('# "comment\n', '"\'')
+    assert not open_quote('key a"b\n', '"\'')
+
+    # Backslashes only escape inside the quotes that allow it
+    assert open_quote('respond "a\\"\n', '"`', escapable='"')
+    assert not open_quote('respond `a\\`\n', '"`', escapable='"')
+
+## Caddy ##
+
+CADDYFILE = '''{
+    email admin@example.com
+}
+
+(proxy) {
+    reverse_proxy {args[0]}:{args[1]}
+}
+
+app.example.com, www.example.com {
+    reverse_proxy 10.0.0.5:8080 10.0.0.6:8081
+}
+
+api.example.com {
+    handle /v1/* {
+        reverse_proxy {
+            to https://10.0.0.7 h2c://10.0.0.8:9000-9001
+        }
+    }
+}
+
+media.example.com {
+    import proxy 10.0.0.9 32400
+}
+
+{$HOST:files.example.com} {
+    reverse_proxy unix//run/app.sock 10.0.0.10:{$PORT:7000}
+}
+'''
+
+def test_caddy_upstreams_of_every_site():
+    assert ports(iter_caddy_entries(CADDYFILE, {'PORT': '7001'})) == [
+        ('10.0.0.5', 8080, 'TCP', 'app.example.com'),
+        ('10.0.0.6', 8081, 'TCP', 'app.example.com'),
+        ('10.0.0.7', 443, 'TCP', 'api.example.com'),
+        ('10.0.0.8', 9000, 'TCP', 'api.example.com'),
+        ('10.0.0.8', 9001, 'TCP', 'api.example.com'),
+        ('10.0.0.9', 32400, 'TCP', 'media.example.com'),
+        ('10.0.0.10', 7001, 'TCP', 'files.example.com'),
+    ]
+
+def test_caddy_reads_streams_and_placeholder_defaults():
+    entries = ports(iter_caddy_entries(io.StringIO(CADDYFILE)))
+
+    assert entries[-1] == ('10.0.0.10', 7000, 'TCP', 'files.example.com')
+
+def test_caddy_site_without_braces():
+    assert ports(iter_caddy_entries('localhost:2015\nreverse_proxy 127.0.0.1:3000\n')) == [
+        ('127.0.0.1', 3000, 'TCP', 'localhost:2015'),
+    ]
+
+## Docker Compose ##
+
+COMPOSE = '''
+services:
+  web:
+    image: nginx:1.25
+    ports:
+      - 22:22
+      - "127.0.0.1:8080:80"
+      - "${WEB_PORT:-8443}:443/tcp"
+      - "9000-9001:9000-9001/udp"
+      - "3000"
+      - "[::1]:7000:7000"
+  db:
+    image: registry.example.com/library/postgres:16
+    ports:
+      - target: 5432
+        published: 5433
+        protocol: tcp
+'''
+
+COMPOSE_OVERRIDE = '''
+services:
+  web:
+    ports: ["127.0.0.1:8080:80", "8081:81"]
+  cache:
+    ports: ["6379:6379"]
+'''
+
+def test_compose_published_ports_of_merged_files():
+    assert ports(iter_compose_entries([COMPOSE, COMPOSE_OVERRIDE], {'WEB_PORT': '9443'})) == [
+        ('127.0.0.1', 22, 'TCP', 'nginx'),
+        ('127.0.0.1', 8080, 'TCP', 'nginx'),
+        ('127.0.0.1', 9443, 'TCP', 'nginx'),
+        ('127.0.0.1', 9000, 'UDP', 'nginx'),
+        ('127.0.0.1', 9001, 'UDP', 'nginx'),
+        ('::1', 7000, 'TCP', 'nginx'),
+        ('127.0.0.1', 8081, 'TCP', 'nginx'),
+        ('127.0.0.1', 5433, 'TCP', 'postgres'),
+        ('127.0.0.1', 6379, 'TCP', 'cache'),
+    ]
+
+def test_compose_variable_defaults():
+    assert ('127.0.0.1', 8443, 'TCP', 'nginx') in ports(iter_compose_entries([COMPOSE]))
+
+@pytest.mark.parametrize('content, message', [
+    ('services: [web, db]', "'services' must be a mapping"),
+    ('services: 5', "'services' must be a mapping"),
+    ('services:\n  web: nginx', "service 'web' must be a mapping"),
+    ('services:\n  web:\n    ports: "80:80"', "'ports' of service 'web' must be a list"),
+    ('- web', 'a Compose file must be a mapping'),
+    ('services: {web: [}', 'invalid YAML'),
+])
+def test_compose_rejects_malformed_files(content, message):
+    with pytest.raises(ComposeError, match=message) as error:
+        list(iter_compose_entries([content], names=['compose.yml']))
+    assert str(error.value).startswith('compose.yml: ')
+
+def test_compose_import_route_reports_malformed_files(client):
+    response = client.post('/import', data={
+        'import_type': 'Docker-Compose',
+        'file': (io.BytesIO(b'services:\n  web:\n    ports: 80'), 'docker-compose.yml'),
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == "docker-compose.yml: 'ports' of service 'web' must be a list"
+
+## nginx ##
+
+NGINX = '''
+http {
+    upstream backend {
+        server 10.0.0.20:8080;
+        server 10.0.0.21;
+    }
+    server {
+        listen 80;
+        listen [::]:443 ssl;
+        server_name app.example.com www.example.com;
+        location / { proxy_pass http://backend; }
+        location /api { proxy_pass http://10.0.0.22:9000/api; }
+        location /php { fastcgi_pass 127.0.0.1:9001; }
+    }
+    server {
+        server_name "quoted.example.com";  # a comment
+        listen 8080-8081;
+        location / { grpc_pass grpcs://10.0.0.23; }
+    }
+}
+stream {
+    server {
+        listen 53 udp;
+        proxy_pass 10.0.0.24:5353;
+    }
+}
+'''
+
+def test_nginx_listen_ports_and_pass_targets():
+    assert ports(iter_nginx_entries(NGINX, 'site.conf')) == [
+        ('127.0.0.1', 80, 'TCP', 'app.example.com'),
+        ('127.0.0.1', 443, 'TCP', 'app.example.com'),
+        ('10.0.0.22', 9000, 'TCP', 'app.example.com'),
+        ('127.0.0.1', 9001, 'TCP', 'app.example.com'),
+        ('127.0.0.1', 8080, 'TCP', 'quoted.example.com'),
+        ('127.0.0.1', 8081, 'TCP', 'quoted.example.com'),
+        ('10.0.0.23', 443, 'TCP', 'quoted.example.com'),
+        ('127.0.0.1', 53, 'UDP', 'domain'),
+        ('10.0.0.24', 5353, 'UDP', 'mdns'),
+        ('10.0.0.20', 8080, 'TCP', 'app.example.com'),
+        ('10.0.0.21', 80, 'TCP', 'app.example.com'),
+    ]
+
+@pytest.mark.parametrize('content, message', [
+    ('server { listen 80;', "site.conf, line 1: unexpected end of file, expecting '}'"),
+    ('listen 80; }', "site.conf, line 1: unexpected '}'"),
+])
+def test_nginx_rejects_unbalanced_braces(content, message):
+    with pytest.raises(ValueError) as error:
+        list(iter_nginx_entries(content, 'site.conf'))
+    assert str(error.value) == message
+
+## Traefik ##
+
+TRAEFIK_YAML = '''
+entryPoints:
+  web: {address: ":80"}
+  dns: {address: "10.0.0.1:53/udp"}
+http:
+  routers:
+    app: {rule: "Host(`app.example.com`) || Host(`www.example.com`)", service: app@file}
+  services:
+    app:
+      loadBalancer:
+        servers: [{url: "http://10.0.0.5:8080/"}, {url: "https://10.0.0.6"}]
+tcp:
+  services:
+    db: {loadBalancer: {servers: [{address: "10.0.0.7:5432"}]}}
+udp:
+  services:
+    syslog: {loadBalancer: {servers: [{address: "[fd00::1]:514"}]}}
+'''
+
+TRAEFIK_TOML = '''
+[http.routers.app]
+  rule = "Host(`app.example.com`)"
+  service = "app"
+
+[[http.services.app.loadBalancer.servers]]
+  url = "http://10.0.0.5:8080"
+'''
+
+def test_traefik_yaml_servers_and_entry_points():
+    assert ports(iter_traefik_entries(TRAEFIK_YAML, 'dynamic.yml')) == [
+        ('127.0.0.1', 80, 'TCP', 'web'),
+        ('10.0.0.1', 53, 'UDP', 'dns'),
+        ('10.0.0.5', 8080, 'TCP', 'app.example.com'),
+        ('10.0.0.6', 443, 'TCP', 'app.example.com'),
+        ('10.0.0.7', 5432, 'TCP', 'db'),
+        ('fd00::1', 514, 'UDP', 'syslog'),
+    ]
+
+@pytest.mark.skipif(tomllib is None, reason='requires tomllib or tomli')
+def test_traefik_toml_is_recognized_without_a_file_name():
+    assert ports(iter_traefik_entries(TRAEFIK_TOML)) == [('10.0.0.5', 8080, 'TCP', 'app.example.com')]
+
+def test_traefik_skips_invalid_addresses():
+    content = '''
+entryPoints:
+  big: {address: ":70000"}
+  zero: {address: ":0"}
+  bare6: {address: "fd00::1:80"}
+  unclosed: {address: "[fd00::1:80"}
+  v6: {address: "[::]:8443"}
+tcp:
+  services:
+    db: {loadBalancer: {servers: [{address: "fd00::2:5432"}, {address: "[fd00::2]x5432"}]}}
+http:
+  services:
+    app: {loadBalancer: {servers: [{url: "http://fd00::3/"}, {url: "http://10.0.0.5:99999"}]}}
+'''
+    assert ports(iter_traefik_entries(content, 'dynamic.yml')) == [('127.0.0.1', 8443, 'TCP', 'v6')]
+
+def test_traefik_rejects_invalid_files():
+    with pytest.raises(ValueError, match='dynamic.yml: invalid YAML'):
+        list(iter_traefik_entries('http: [', 'dynamic.yml'))
+    with pytest.raises(ValueError, match='must be a mapping'):
+        list(iter_traefik_entries('- http', 'dynamic.yml'))
+
+def test_configuration_directories_are_parsed_in_file_order():
+    files = [(f'site{number}.conf', f'server {{ listen {8000 + number}; server_name s{number}.example; }}')
+             for number in range(40)]
+
+    entries = list(parse_files(iter_nginx_entries, files, workers=2))
+
+    assert [entry['port'] for entry in entries] == list(range(8000, 8040))
+
+def test_parse_errors_name_the_file():
+    files = [('good.conf', 'server { listen 80; }'), ('bad.conf', 'server {')]
+
+    with pytest.raises(ValueError, match='bad.conf'):
+        list(parse_files(iter_nginx_entries, files))
+
+def test_small_imports_are_parsed_without_the_pool(monkeypatch):
+    def no_pool():
+        raise AssertionError('the parser pool was started')
+    monkeypatch.setattr(importer, '_get_executor', no_pool)
+    files = [(f'site{number}.conf', f'server {{ listen {8000 + number}; }}') for number in range(3)]
+
+    assert [entry['port'] for entry in parse_files(iter_nginx_entries, files, workers=4)] == [8000, 8001, 8002]
+
+## nmap ##
+
+NMAP_XML = '''<?xml version="1.0"?>
+<nmaprun>
+<host>
+  <status state="up"/>
+  <address addr="10.0.0.5" addrtype="ipv4"/>
+  <address addr="AA:BB:CC:DD:EE:FF" addrtype="mac"/>
+  <hostnames><hostname name="nas.lan" type="PTR"/><hostname name="nas" type="user"/></hostnames>
+  <ports>
+    <port protocol="tcp" portid="22"><state state="open"/><service name="ssh" product="OpenSSH" version="9.6"/></port>
+    <port protocol="tcp" portid="443"><state state="open"/><service name="http" tunnel="ssl" product="nginx"/></port>
+    <port protocol="tcp" portid="8080"><state state="closed"/></port>
+    <port protocol="udp" portid="53"><state state="open"/></port>
+  </ports>
+</host>
+<host>
+  <address addr="fd00::2" addrtype="ipv6"/>
+  <ports><port protocol="tcp" portid="80"><state state="open"/><service name="unknown"/></port></ports>
+</host>
+</nmaprun>'''
+
+def test_nmap_open_ports_of_every_host():
+    entries = list(iter_nmap_entries(NMAP_XML))
+
+    assert ports(entries) == [
+        ('10.0.0.5', 22, 'TCP', 'ssh (OpenSSH 9.6)'),
+        ('10.0.0.5', 443, 'TCP', 'ssl/http (nginx)'),
+        ('10.0.0.5', 53, 'UDP', 'domain'),
+        ('fd00::2', 80, 'TCP', 'http'),
+    ]
+    assert [entry['nickname'] for entry in entries] == ['nas', 'nas', 'nas', None]
+
+def test_nmap_reads_byte_streams():
+    assert len(list(iter_nmap_entries(io.BytesIO(NMAP_XML.encode())))) == 4
+
+def test_nmap_rejects_invalid_xml():
+    with pytest.raises(ValueError, match='Invalid nmap XML'):
+        list(iter_nmap_entries('<nmaprun><host>'))
+
+## Bulk Import ##
+
+def entry(ip_address, port_number, protocol='TCP', nickname=None):
+    return {'ip': ip_address, 'nickname': nickname, 'port': port_number, 'description': 'test',
+            'port_protocol': protocol}
+
+def test_import_skips_existing_and_repeated_entries(app):
+    assert import_entries([entry('10.0.0.1', 80, nickname='nas')]) == (1, 0)
+
+    entries = [entry('10.0.0.1', 80), entry('10.0.0.1', 80, 'UDP'), entry('10.0.0.2', 22),
+               entry('10.0.0.2', 22), entry('10.0.0.1', 443)]
+    assert import_entries(entries, batch_size=2) == (3, 2)
+
+    ports = Port.query.join(Host).order_by(Host.ip_address, Port.order)
+    assert [(port.host.ip_address, port.port_number, port.port_protocol, port.order) for port in ports] == [
+        ('10.0.0.1', 80, 'TCP', 1024), ('10.0.0.1', 80, 'UDP', 2048), ('10.0.0.1', 443, 'TCP', 3072),
+        ('10.0.0.2', 22, 'TCP', 1024)]
+    assert Host.query.filter_by(ip_address='10.0.0.1').one().nickname == 'nas'
+    assert check_summaries() == []
+
+## JSON ##
+
+ENTRIES = [
+    {'ip_address': '10.0.0.1', 'nickname': 'nas', 'port_number': 80, 'description': 'Web [UI], "main"',
+     'port_protocol': 'TCP', 'order': 0},
+    {'ip_address': '10.0.0.2', 'nickname': None, 'port_number': 22, 'description': 'SSH',
+     'port_protocol': 'TCP', 'order': 1},
+]
+
+@pytest.mark.parametrize('read_size', [1, 7, 64 * 1024])
+def test_json_array_is_parsed_across_reads(monkeypatch, read_size):
+    monkeypatch.setattr(importer, '_JSON_READ_SIZE', read_size)
+
+    assert list(iter_json_array(io.StringIO(json.dumps(ENTRIES, indent=2)))) == ENTRIES
+    assert list(iter_json_array(io.StringIO('[12345, 6]'))) == [12345, 6]
+
+def test_json_values_outside_an_array_are_read_in_sequence():
+    assert list(iter_json_array('{"a": 1}\n{"b": 2}\n')) == [{'a': 1}, {'b': 2}]
+    assert list(iter_json_array('  ')) == []
+
+@pytest.mark.parametrize('content', ['[{"a": 1}', '[1 2]', '[{"a": }]'])
+def test_invalid_json_is_rejected(content):
+    with pytest.raises(ValueError, match='Invalid JSON format'):
+        list(iter_json_array(content))
+
+def test_ndjson_reports_the_invalid_line():
+    assert list(iter_ndjson('{"a": 1}\n\n{"b": 2}\n')) == [{'a': 1}, {'b': 2}]
+    with pytest.raises(ValueError, match='line 2'):
+        list(iter_ndjson('{"a": 1}\n{"b": \n'))
+
+def test_json_import_route_skips_existing_entries(client):
+    content = json.dumps(ENTRIES)
+
+    first = client.post('/import', data={'import_type': 'JSON', 'file_content': content}).get_json()
+    second = client.post('/import', data={'import_type': 'JSON', 'file_content': content}).get_json()
+
+    assert first == {'success': True, 'message': 'Imported 2 entries, skipped 0 existing entries'}
+    assert second == {'success': True, 'message': 'Imported 0 entries, skipped 2 existing entries'}
+    assert {(host.ip_address, host.nickname) for host in Host.query} == {('10.0.0.1', 'nas'), ('10.0.0.2', None)}
+    assert Port.query.count() == 2
+
+def test_json_import_route_rejects_invalid_json(client):
+    response = client.post('/import', data={'import_type': 'JSON', 'file_content': '[{"ip_address": '})
+
+    assert response.status_code == 400
+    assert not response.get_json()['success']
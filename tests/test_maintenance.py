@@ -0,0 +1,42 @@
+# tests/test_maintenance.py
+
+# Local Imports
+from utils.database import db, delete_in_chunks, Host, Port
+
+def add_ports(ip_address, *port_numbers):
+    host = Host.get_or_create(ip_address)
+    db.session.add_all([Port(host=host, port_number=port_number, port_protocol='TCP', description='d')
+                        for port_number in port_numbers])
+    db.session.commit()
+    return host
+
+def test_delete_in_chunks_deletes_every_matching_row(app, monkeypatch):
+    host = add_ports('10.0.0.1', *range(1, 8))
+    add_ports('10.0.0.2', 1, 2)
+    commits = []
+    monkeypatch.setattr(db.session, 'commit', lambda: commits.append(1))
+
+    assert delete_in_chunks(Port, Port.host_id == host.id, chunk_size=3) == 7
+
+    # Three chunks of at most three rows, each committed on its own
+    assert len(commits) == 3
+    assert sorted(port.ip_address for port in Port.query) == ['10.0.0.2', '10.0.0.2']
+
+def test_delete_ip_reports_the_deleted_ports(client):
+    add_ports('10.0.0.1', *range(1, 6))
+    add_ports('10.0.0.2', 22)
+
+    response = client.post('/delete_ip', data={'ip': '10.0.0.1'}).get_json()
+
+    assert response['success'] and response['deleted'] == 5
+    assert [host.ip_address for host in Host.query] == ['10.0.0.2']
+    assert Port.query.count() == 1
+
+def test_purge_entries_removes_every_host(client):
+    add_ports('10.0.0.1', 80, 443)
+    add_ports('10.0.0.2', 22)
+
+    response = client.post('/purge_entries', data={'vacuum': 'true'}).get_json()
+
+    assert response['deleted'] == 3 and response['vacuum'] == 'full'
+    assert Port.query.count() == 0 and Host.query.count() == 0
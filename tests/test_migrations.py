@@ -0,0 +1,97 @@
+# tests/test_migrations.py
+
+# External Imports
+import pytest                                   # For fixtures
+from alembic.autogenerate import compare_metadata # For comparing the upgraded schema with the models
+from alembic.migration import MigrationContext  # For reading the database revision
+from alembic.script import ScriptDirectory      # For reading the shipped revisions
+from flask_migrate import upgrade               # For upgrading to a given revision
+from sqlalchemy import text                     # For building legacy databases
+
+# Local Imports
+from app import create_app, init_or_migrate_db
+from utils.database import db
+
+MIGRATIONS_FOLDER = 'migrations'
+
+# The schema of databases created before migrations were shipped
+LEGACY_SCHEMA = [
+    'CREATE TABLE setting (id INTEGER NOT NULL PRIMARY KEY, "key" VARCHAR(50) NOT NULL, '
+    'value VARCHAR(100) NOT NULL, UNIQUE ("key"))',
+    'CREATE TABLE sockets (id INTEGER NOT NULL PRIMARY KEY, ip_address VARCHAR(15) NOT NULL, '
+    'docker_url VARCHAR(50) NOT NULL, docker_interval VARCHAR(10) NOT NULL)',
+    'CREATE TABLE port (id INTEGER NOT NULL PRIMARY KEY, ip_address VARCHAR(15) NOT NULL, nickname VARCHAR(50), '
+    'port_number INTEGER NOT NULL, port_protocol VARCHAR(3) NOT NULL, description VARCHAR(100) NOT NULL, '
+    '"order" INTEGER, docker_id VARCHAR(20), '
+    'CONSTRAINT _ip_port_protocol_uc UNIQUE (ip_address, port_number, port_protocol))',
+    # Revision of a migrations folder that was generated on the spot and is gone
+    'CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)',
+    "INSERT INTO alembic_version VALUES ('1a2b3c4d5e6f')",
+]
+
+LEGACY_PORTS = [
+    ('10.0.0.2', None, 22, 'TCP', 'ssh', 0),
+    ('10.0.0.1', 'nas', 80, 'TCP', 'web', 1000),
+    ('10.0.0.1', 'nas', 53, 'UDP', 'dns', 1001),
+]
+
+@pytest.fixture
+def migration_app(tmp_path, monkeypatch):
+    """An application on its own, empty database file."""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'portall.db'}")
+    migration_app, _ = create_app()
+    return migration_app
+
+def assert_upgraded(migration_app):
+    with migration_app.app_context(), db.engine.connect() as conn:
+        context = MigrationContext.configure(conn)
+        assert list(context.get_current_heads()) == ScriptDirectory(MIGRATIONS_FOLDER).get_heads()
+        assert compare_metadata(context, db.metadata) == []
+
+def test_new_database_is_built_from_the_revisions(migration_app):
+    init_or_migrate_db(migration_app, db)
+
+    assert_upgraded(migration_app)
+
+def test_legacy_database_is_upgraded_in_place(migration_app):
+    with migration_app.app_context(), db.engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text(
+            'INSERT INTO port (ip_address, nickname, port_number, port_protocol, description, "order") '
+            'VALUES (:ip_address, :nickname, :port_number, :port_protocol, :description, :order)'
+        ), [dict(zip(('ip_address', 'nickname', 'port_number', 'port_protocol', 'description', 'order'), row))
+            for row in LEGACY_PORTS])
+
+    init_or_migrate_db(migration_app, db)
+
+    assert_upgraded(migration_app)
+    with migration_app.app_context(), db.engine.connect() as conn:
+        rows = conn.execute(text(
+            'SELECT host.ip_address, port_number, description, "order" FROM port '
+            'JOIN host ON host.id = port.host_id ORDER BY port.id'
+        ))
+        assert [tuple(row) for row in rows] == [
+            ('10.0.0.2', 22, 'ssh', 0), ('10.0.0.1', 80, 'web', 1000), ('10.0.0.1', 53, 'dns', 1001),
+        ]
+        # Panels keep the order of their first port
+        hosts = conn.execute(text('SELECT ip_address, nickname, panel_order FROM host ORDER BY panel_order'))
+        assert [tuple(row) for row in hosts] == [('10.0.0.2', None, 1024), ('10.0.0.1', 'nas', 2048)]
+
+def test_moved_panels_keep_their_place(migration_app):
+    with migration_app.app_context():
+        # A database from before ports referenced their hosts, where only moved panels had a host
+        upgrade(directory=MIGRATIONS_FOLDER, revision='e81f5c2a9d30')
+        with db.engine.begin() as conn:
+            conn.execute(text("INSERT INTO host (ip_address, panel_order) VALUES ('10.0.0.1', 1024)"))
+            conn.execute(text(
+                'INSERT INTO port (ip_address, nickname, port_number, port_protocol, description, "order") '
+                'VALUES (:ip_address, :nickname, :port_number, :port_protocol, :description, :order)'
+            ), [dict(zip(('ip_address', 'nickname', 'port_number', 'port_protocol', 'description', 'order'), row))
+                for row in LEGACY_PORTS])
+        upgrade(directory=MIGRATIONS_FOLDER)
+
+    assert_upgraded(migration_app)
+    with migration_app.app_context(), db.engine.connect() as conn:
+        hosts = conn.execute(text('SELECT ip_address, nickname, panel_order FROM host ORDER BY panel_order'))
+        assert [tuple(row) for row in hosts] == [('10.0.0.1', 'nas', 1024), ('10.0.0.2', None, 2048)]
@@ -0,0 +1,144 @@
+# tests/test_ordering.py
+
+# Local Imports
+from utils.database import db, Host, Port
+from utils.ordering import ORDER_GAP, next_order, reorder
+
+def apply(current, changes):
+    keys = dict(current)
+    keys.update(changes)
+    return keys
+
+def assert_in_order(keys, desired):
+    ordered = [keys[item] for item in desired]
+    assert ordered == sorted(ordered) and len(set(ordered)) == len(ordered)
+
+def add_port(client, ip_address, port_number, protocol='TCP'):
+    client.post('/add_port', data={'ip': ip_address, 'ip_nickname': '', 'port_number': str(port_number),
+                                   'description': 'd', 'protocol': protocol})
+
+def port_orders(ip_address):
+    db.session.expire_all()
+    ports = Port.for_ip(ip_address).order_by(Port.order)
+    return [(port.port_number, port.port_protocol) for port in ports]
+
+## Order Keys ##
+
+def test_next_order():
+    assert next_order(None) == ORDER_GAP
+    assert next_order(ORDER_GAP) == 2 * ORDER_GAP
+
+def test_moving_one_item_changes_one_key():
+    current = {item: ORDER_GAP * (position + 1) for position, item in enumerate('abcdef')}
+    desired = list('abecdf')
+
+    changes = reorder(current, desired)
+
+    assert list(changes) == ['e']
+    assert_in_order(apply(current, changes), desired)
+
+def test_moving_to_either_end_changes_one_key():
+    current = {'a': 1024, 'b': 2048, 'c': 3072}
+
+    assert reorder(current, ['c', 'a', 'b']) == {'c': 0}
+    assert reorder(current, ['b', 'c', 'a']) == {'a': 4096}
+
+def test_unchanged_order_changes_nothing():
+    current = {'a': 5, 'b': 7, 'c': 100}
+
+    assert reorder(current, ['a', 'b', 'c']) == {}
+
+def test_longest_increasing_run_keeps_its_keys():
+    current = {'a': 10, 'b': 20, 'c': 30, 'd': 40, 'e': 50}
+    desired = ['e', 'a', 'b', 'd', 'c']
+
+    changes = reorder(current, desired)
+
+    # a, b and c or a, b and d stay where they are
+    assert len(changes) == 2 and 'e' in changes
+    assert_in_order(apply(current, changes), desired)
+
+def test_items_without_keys_get_keys():
+    changes = reorder({'a': 1024}, ['new', 'a', 'other'])
+
+    assert set(changes) == {'new', 'other'}
+    assert_in_order(apply({'a': 1024}, changes), ['new', 'a', 'other'])
+
+def test_full_gap_renumbers_everything():
+    current = {'a': 1, 'b': 2, 'c': 3}
+    desired = ['a', 'c', 'b']
+
+    changes = reorder(current, desired)
+
+    assert apply(current, changes) == {'a': ORDER_GAP, 'c': 2 * ORDER_GAP, 'b': 3 * ORDER_GAP}
+
+## Reordering ##
+
+def test_update_port_order_route_moves_ports(client):
+    for port_number, protocol in ((1, 'TCP'), (2, 'TCP'), (2, 'UDP'), (3, 'TCP')):
+        add_port(client, '10.0.0.1', port_number, protocol)
+
+    response = client.post('/update_port_order', json={'ip': '10.0.0.1', 'port_order': [3, 2, 1, 2]})
+
+    assert response.status_code == 200
+    # A number registered for both protocols moves both rows, one per listed position
+    assert port_orders('10.0.0.1') == [(3, 'TCP'), (2, 'TCP'), (1, 'TCP'), (2, 'UDP')]
+
+def test_update_port_order_route_only_writes_moved_ports(client):
+    for number in (1, 2, 3):
+        add_port(client, '10.0.0.1', number)
+    before = {port.port_number: port.order for port in Port.query}
+
+    response = client.post('/update_port_order', json={'ip': '10.0.0.1', 'port_order': [3, 1, 2]})
+    db.session.expire_all()
+    after = {port.port_number: port.order for port in Port.query}
+
+    assert response.status_code == 200
+    assert [number for number in before if before[number] != after[number]] == [3]
+    assert sorted(after, key=after.get) == [3, 1, 2]
+
+def test_update_port_order_route_needs_ports(client):
+    assert client.post('/update_port_order', json={'ip': '10.0.0.1'}).status_code == 400
+    assert client.post('/update_port_order', json={'ip': '10.0.0.1', 'port_order': [1]}).status_code == 404
+
+def test_update_port_order_route_rejects_bad_port_numbers(client):
+    add_port(client, '10.0.0.1', 1)
+
+    for port_order in (['one'], [None], '1,2', [[1]]):
+        response = client.post('/update_port_order', json={'ip': '10.0.0.1', 'port_order': port_order})
+        assert response.status_code == 400
+    assert client.post('/update_port_order', json=['10.0.0.1']).status_code == 400
+
+def test_update_port_order_route_keeps_unsubmitted_ports_in_place(client):
+    for number in (1, 2, 3, 4, 5):
+        add_port(client, '10.0.0.1', number)
+
+    response = client.post('/update_port_order', json={'ip': '10.0.0.1', 'port_order': [4, 2]})
+
+    assert response.status_code == 200
+    assert [number for number, _ in port_orders('10.0.0.1')] == [1, 4, 3, 2, 5]
+    assert len({port.order for port in Port.query}) == 5
+
+def test_update_ip_order_route_moves_panels(client):
+    for ip_address in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+        add_port(client, ip_address, 80)
+        add_port(client, ip_address, 443)
+    port_keys = {port.id: port.order for port in Port.query}
+
+    client.post('/update_ip_order', json={'ip_order': ['10.0.0.1', '10.0.0.2', '10.0.0.3']})
+    response = client.post('/update_ip_order', json={'ip_order': ['10.0.0.3', '10.0.0.1', '10.0.0.2']})
+
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert [host.ip_address for host in Host.query.order_by(Host.panel_order)] == ['10.0.0.3', '10.0.0.1', '10.0.0.2']
+    assert {port.id: port.order for port in Port.query} == port_keys
+
+def test_update_ip_order_route_skips_unknown_ips(client):
+    add_port(client, '10.0.0.1', 80)
+    add_port(client, '10.0.0.2', 80)
+
+    response = client.post('/update_ip_order', json={'ip_order': ['10.0.0.2', '10.0.0.9', '10.0.0.1', '10.0.0.2']})
+
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert [host.ip_address for host in Host.query.order_by(Host.panel_order)] == ['10.0.0.2', '10.0.0.1']
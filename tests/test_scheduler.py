@@ -0,0 +1,40 @@
+# tests/test_scheduler.py
+
+# Standard Imports
+import fcntl                                    # For holding the runner lock like another worker
+
+# External Imports
+import pytest                                   # For fixtures
+
+# Local Imports
+from utils import scheduler
+
+@pytest.fixture
+def lock_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'scheduler.lock')
+    monkeypatch.setattr(scheduler, 'SCHEDULER_LOCK_FILE', path)
+    monkeypatch.setattr(scheduler, '_runner_lock', None)
+    yield path
+    if scheduler._runner_lock is not None:
+        scheduler._runner_lock.close()
+
+def test_one_process_runs_the_jobs(lock_file):
+    other_worker = open(lock_file, 'a')
+    fcntl.flock(other_worker, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    assert not scheduler.is_job_runner()
+
+    # The runner exits, the next job of this worker takes over
+    other_worker.close()
+    assert scheduler.is_job_runner()
+    assert scheduler.is_job_runner()
+
+@pytest.mark.parametrize('value, interval', [(None, 60), ('', 60), ('30', 30), (' 5 ', 5), ('-1', 0),
+                                             ('ten', 0), ('1.5', 0)])
+def test_intervals_are_read_without_failing_startup(monkeypatch, value, interval):
+    if value is None:
+        monkeypatch.delenv('TEST_INTERVAL', raising=False)
+    else:
+        monkeypatch.setenv('TEST_INTERVAL', value)
+
+    assert scheduler.read_interval('TEST_INTERVAL', 60) == interval
@@ -0,0 +1,83 @@
+# tests/test_services.py
+
+# Local Imports
+import manage
+from utils.allocation import compile_exclusions
+from utils.services import ServiceIndex, build_index, describe_port, read_registry, service_name
+
+IANA_CSV = '''Service Name,Port Number,Transport Protocol,Description,Assignee
+http,80,tcp,World Wide Web HTTP,
+http,80,udp,World Wide Web HTTP,
+,81,tcp,Unassigned,
+dns-range,6000-6002,udp,"A range, with a comma",
+domain,53,udp,Domain Name Server,
+'''
+
+SERVICES_FILE = '''# /etc/services
+ssh             22/tcp                          # SSH Remote Login Protocol
+domain          53/tcp
+domain          53/udp
+'''
+
+def build(tmp_path, name, content):
+    source = tmp_path / name
+    source.write_text(content)
+    path = str(tmp_path / 'services.idx')
+    count = build_index(read_registry(str(source)), path)
+    return count, ServiceIndex(path)
+
+def test_index_built_from_the_iana_export(tmp_path):
+    count, index = build(tmp_path, 'service-names-port-numbers.csv', IANA_CSV)
+
+    assert count == 6
+    assert index.name(80) == 'http'
+    assert index.name(81) is None
+    assert index.name(53, 'TCP') is None
+    assert index.name(53) == 'domain'
+    assert [index.name(port, 'udp') for port in (6000, 6002, 6003)] == ['dns-range', 'dns-range', None]
+    assert index.registered_intervals() == ((53, 53), (80, 80), (6000, 6002))
+
+def test_index_built_from_the_iana_export_as_published(tmp_path):
+    # The published file starts with a byte order mark and has descriptions spanning lines
+    published = '\ufeff' + IANA_CSV.replace('Domain Name Server', '"Domain Name\nServer"')
+
+    count, index = build(tmp_path, 'service-names-port-numbers.csv', published)
+
+    assert count == 6
+    assert index.name(53) == 'domain'
+
+def test_build_service_index_command_downloads_the_registry(tmp_path, monkeypatch):
+    source = tmp_path / 'service-names-port-numbers.csv'
+    source.write_text(IANA_CSV)
+    monkeypatch.setattr(manage, 'INDEX_PATH', str(tmp_path / 'services.idx'))
+
+    result = manage.cli.main(['build-service-index', source.as_uri()], standalone_mode=False)
+
+    assert result is None
+    assert ServiceIndex(str(tmp_path / 'services.idx')).name(6001, 'UDP') == 'dns-range'
+
+def test_index_built_from_a_services_file(tmp_path):
+    count, index = build(tmp_path, 'services', SERVICES_FILE)
+
+    assert count == 3
+    assert index.name(22, 'TCP') == 'ssh'
+    assert index.name(22, 'UDP') is None
+    assert index.name(70000) is None
+
+def test_missing_index_misses_every_lookup(tmp_path):
+    index = ServiceIndex(str(tmp_path / 'missing.idx'))
+
+    assert index.name(22) is None
+    assert index.registered_intervals() == ()
+
+def test_bundled_index_fills_descriptions():
+    assert service_name(22) == 'ssh'
+    assert service_name('not a port') is None
+    assert describe_port('', 22, 'TCP') == 'ssh'
+    assert describe_port('my shell', 22, 'TCP') == 'my shell'
+
+def test_registered_preset_excludes_every_registered_port():
+    intervals = compile_exclusions('registered').intervals()
+
+    assert any(low <= 22 <= high for low, high in intervals)
+    assert any(low <= 443 <= high for low, high in intervals)
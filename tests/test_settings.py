@@ -0,0 +1,75 @@
+# tests/test_settings.py
+
+# Local Imports
+from utils.database import db, Setting
+from utils.database import setting
+from utils.database.setting import REVISION_KEY
+
+def revision():
+    return db.session.query(Setting.value).filter_by(key=REVISION_KEY).scalar()
+
+def test_settings_are_read_from_the_cache(app):
+    db.session.add_all([Setting(key='port_start', value='9000'), Setting(key='docker_enabled', value='True')])
+    db.session.commit()
+
+    assert Setting.get('port_start') == '9000'
+    assert Setting.get_int('port_start') == 9000
+    assert Setting.get_int('port_end', 10000) == 10000
+    assert Setting.get_bool('docker_enabled') is True
+    assert Setting.get_many({'port_start': None, 'port_end': '9999'}) == {'port_start': '9000', 'port_end': '9999'}
+    assert REVISION_KEY not in setting._values
+
+def test_setting_writes_bump_the_revision(app):
+    db.session.add(Setting(key='theme', value='dark'))
+    db.session.commit()
+    assert revision() == '1'
+    assert Setting.get('theme') == 'dark'
+
+    Setting.query.filter_by(key='theme').one().value = 'light'
+    db.session.commit()
+
+    assert revision() == '2'
+    assert Setting.get('theme') == 'light'
+
+def test_other_workers_changes_are_picked_up(app):
+    db.session.add(Setting(key='theme', value='dark'))
+    db.session.commit()
+    assert Setting.get('theme') == 'dark'
+
+    # Another worker writes through its own connection; only the revision row tells us
+    table = Setting.__table__
+    with db.engine.begin() as connection:
+        connection.execute(table.update().where(table.c.key == 'theme').values(value='light'))
+        connection.execute(table.update().where(table.c.key == REVISION_KEY).values(value='2'))
+    db.session.rollback()
+
+    assert Setting.get('theme') == 'light'
+
+def test_rollback_drops_uncommitted_settings(app):
+    db.session.add(Setting(key='theme', value='dark'))
+    db.session.commit()
+
+    Setting.query.filter_by(key='theme').one().value = 'light'
+    db.session.flush()
+    db.session.rollback()
+
+    assert Setting.get('theme') == 'dark'
+
+def test_set_many_upserts_in_one_statement(app):
+    db.session.add(Setting(key='theme', value='dark'))
+    db.session.commit()
+
+    Setting.set_many({'theme': 'light', 'port_start': 9000, 'custom_css': None})
+    db.session.commit()
+
+    stored = dict(db.session.query(Setting.key, Setting.value))
+    assert stored == {'theme': 'light', 'port_start': '9000', 'custom_css': '', REVISION_KEY: '2'}
+    assert Setting.get('theme') == 'light'
+
+def test_saving_docker_config_writes_every_key(client):
+    response = client.post('/save_docker_config', json={'hostIP': '10.0.0.5', 'socketURL': 'unix:///var/run/docker.sock',
+                                                        'enabled': True})
+
+    assert response.status_code == 200
+    assert Setting.get_many({'docker_host_ip': None, 'docker_socket_url': None, 'docker_enabled': None}) == {
+        'docker_host_ip': '10.0.0.5', 'docker_socket_url': 'unix:///var/run/docker.sock', 'docker_enabled': 'True'}
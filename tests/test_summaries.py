@@ -0,0 +1,117 @@
+# tests/test_summaries.py
+
+# External Imports
+from sqlalchemy import event                    # For counting the statements sent
+
+# Local Imports
+from utils.allocation import PortRange, compile_exclusions
+from utils.database import db, check_summaries, Host, HostSummary, Port
+from utils.database import host_summary
+
+def summary(ip_address):
+    host = Host.query.filter_by(ip_address=ip_address).one()
+    db.session.expire_all()
+    return db.session.get(HostSummary, host.id)
+
+def test_summaries_follow_orm_writes(app):
+    host = Host.get_or_create('10.0.0.1')
+    ports = [Port(host=host, port_number=number, port_protocol=protocol, description='d', order=order)
+             for number, protocol, order in ((80, 'TCP', 1024), (80, 'UDP', 2048), (443, 'TCP', 3072))]
+    db.session.add_all(ports)
+    db.session.commit()
+
+    counts = summary('10.0.0.1')
+    assert (counts.port_count, counts.tcp_count, counts.udp_count, counts.max_order) == (3, 2, 1, 3072)
+
+    # Routes load the ports they change, so the summaries see their old values
+    ports = Port.query.order_by(Port.order).all()
+    db.session.delete(ports[2])
+    ports[1].port_protocol = 'TCP'
+    ports[1].port_number = 81
+    db.session.commit()
+
+    counts = summary('10.0.0.1')
+    assert (counts.port_count, counts.tcp_count, counts.udp_count, counts.max_order) == (2, 2, 0, 2048)
+    assert check_summaries() == []
+
+def test_summaries_count_distinct_numbers_in_range(app):
+    port_range = PortRange.from_settings(9000, 9009, compile_exclusions(''), 0)
+    host_summary.use_range(port_range)
+    host = Host.get_or_create('10.0.0.1')
+    db.session.add_all([Port(host=host, port_number=number, port_protocol=protocol, description='d')
+                        for number, protocol in ((9000, 'TCP'), (9000, 'UDP'), (9001, 'TCP'), (80, 'TCP'))])
+    db.session.commit()
+
+    assert HostSummary.used_in_range(host.id, port_range) == 2
+
+    # 9000 stays in use while its TCP row is left
+    Port.query.filter_by(port_number=9000, port_protocol='UDP').delete()
+    host_summary.apply_port_changes(db.session, [(-1, host.id, 9000, 'UDP', None)])
+    db.session.commit()
+
+    assert HostSummary.used_in_range(host.id, port_range) == 2
+    assert summary('10.0.0.1').port_count == 3
+
+def test_check_summaries_repairs_bulk_writes(app):
+    host = Host.get_or_create('10.0.0.1')
+    db.session.commit()
+    db.session.execute(Port.__table__.insert(), [
+        {'host_id': host.id, 'port_number': 22, 'port_protocol': 'TCP', 'description': 'd', 'order': 5}
+    ])
+    db.session.commit()
+
+    assert check_summaries(repair=True) == [host.id]
+    assert check_summaries() == []
+    assert summary('10.0.0.1').max_order == 5
+
+def test_routes_keep_summaries_current(client):
+    client.post('/port_settings', data={'port_start': '9000', 'port_end': '9009', 'port_exclude': '',
+                                        'port_length': '', 'copy_format': 'port_only', 'port_policy': 'lowest'})
+    client.post('/generate_ports', json={'ip_address': '10.0.0.1', 'description': 'a', 'count': 3})
+    client.post('/add_port', data={'ip': '10.0.0.1', 'ip_nickname': '', 'port_number': '80', 'description': 'web',
+                                   'protocol': 'UDP'})
+    client.post('/update_port_order', json={'ip': '10.0.0.1', 'port_order': [80, 9002, 9000, 9001]})
+
+    response = client.post('/check_summaries', data={'repair': 'false'}).get_json()
+
+    assert response == {'success': True, 'mismatched': 0, 'repaired': False}
+    counts = summary('10.0.0.1')
+    assert (counts.port_count, counts.tcp_count, counts.udp_count) == (4, 3, 1)
+
+def test_range_usage_is_read_without_writing(app):
+    host = Host.get_or_create('10.0.0.1')
+    db.session.add_all([Port(host=host, port_number=number, port_protocol='TCP', description='d')
+                        for number in (9000, 9001, 80)])
+    db.session.commit()
+
+    # Written while no range was known, so the stored usage is stale
+    port_range = PortRange.from_settings(9000, 9009, compile_exclusions(''), 0)
+    host_summary.use_range(port_range)
+    assert HostSummary.used_in_range(host.id, port_range) == 2
+    assert not db.session.dirty
+    assert summary('10.0.0.1').range_key is None
+
+    assert check_summaries(repair=True) == [host.id]
+    counts = summary('10.0.0.1')
+    assert (counts.in_range_count, counts.range_key) == (2, port_range.digest)
+    assert check_summaries() == []
+
+def test_range_usage_changes_are_counted_in_one_query(app):
+    host_summary.use_range(PortRange.from_settings(9000, 9009, compile_exclusions(''), 0))
+    hosts = [Host.get_or_create(f'10.0.0.{number}') for number in (1, 2)]
+    db.session.commit()
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        db.session.add_all([Port(host=host, port_number=number, port_protocol='TCP', description='d')
+                            for host in hosts for number in range(9000, 9005)])
+        db.session.commit()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert len([statement for statement in statements if 'GROUP BY port.host_id, port.port_number' in statement]) == 1
+    assert [summary(f'10.0.0.{number}').in_range_count for number in (1, 2)] == [5, 5]
+    assert check_summaries() == []
@@ -0,0 +1,8 @@
+# utils/allocation/__init__.py
+
+from .port_range import PortRange
+from .exclusions import ExclusionSpec, compile_exclusions, PRESETS
+from .port_index import PortIndex, port_index, POLICIES
+from .leases import lease_expiry, reap_if_due, reap_expired_leases, init_lease_reaper
+__all__ = ['PortRange', 'ExclusionSpec', 'compile_exclusions', 'PRESETS', 'PortIndex', 'port_index', 'POLICIES',
+           'lease_expiry', 'reap_if_due', 'reap_expired_leases', 'init_lease_reaper']
@@ -0,0 +1,151 @@
+# utils/allocation/exclusions.py
+
+# Standard Imports
+from functools import lru_cache                 # For compiling each spec once
+import re                                       # For parsing spec items
+
+# Local Imports
+from utils.services import service_index       # For the registered service ports
+from .port_range import MAX_PORT                # For validating port numbers
+
+# Named port blocks that can be excluded as a whole, callables are resolved on first use
+PRESETS = {
+    'well-known': ((0, 1023),),                 # IANA system ports
+    'ephemeral': ((49152, 65535),),             # IANA dynamic/private ports, also used by Windows
+    'linux-ephemeral': ((32768, 60999),),       # Default net.ipv4.ip_local_port_range
+    'x11': ((6000, 6063),),                     # X11 displays :0 to :63
+    'registered': lambda: service_index().registered_intervals(), # Ports in the bundled IANA service registry
+}
+
+PROTOCOLS = ('TCP', 'UDP')
+
+# "[protocol:]target" or "target[/protocol]", where target is a port, a range or a preset name
+_ITEM = re.compile(r'^(?:(?P<prefix>tcp|udp):)?(?P<target>[a-z0-9-]+?)(?:/(?P<suffix>tcp|udp))?$')
+_RANGE = re.compile(r'^(\d+)(?:-(\d+))?$')
+
+class ExclusionSpec:
+    """
+    A compiled ``port_exclude`` setting.
+
+    The spec is a comma-separated list of items. Each item is a port (``8080``), an
+    inclusive range (``9000-9100``) or a preset name from ``PRESETS``
+    (``ephemeral``), optionally limited to one protocol with ``tcp:``/``udp:`` in
+    front or ``/tcp``/``/udp`` behind it. Everything is kept as merged, sorted
+    ``(low, high)`` intervals per protocol scope, so allocation can subtract whole
+    ranges instead of testing ports one by one.
+    """
+
+    def __init__(self, presets=(), intervals=None):
+        self.presets = tuple(sorted(set(presets), key=lambda item: (item[0] or '', item[1])))
+        self._own = {scope: merge_intervals((intervals or {}).get(scope, ())) for scope in (None,) + PROTOCOLS}
+
+        # Fold the presets into the intervals of their scope
+        resolved = {scope: list(own) for scope, own in self._own.items()}
+        for protocol, name in self.presets:
+            preset = PRESETS[name]
+            resolved[protocol].extend(preset() if callable(preset) else preset)
+        self._intervals = {scope: merge_intervals(ranges) for scope, ranges in resolved.items()}
+        self.key = self.normalized()
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Parse a spec string.
+
+        Args:
+            text (str): The spec, e.g. ``"8080, 9000-9100, udp:5353, ephemeral"``
+
+        Returns:
+            ExclusionSpec: The compiled spec
+
+        Raises:
+            ValueError: If an item is not a valid port, range or preset
+        """
+        presets = []
+        intervals = {scope: [] for scope in (None,) + PROTOCOLS}
+        text = re.sub(r'\s*-\s*', '-', (text or '').strip().lower())
+        for raw_item in re.split(r'[,\s]+', text):
+            if not raw_item:
+                continue
+            match = _ITEM.match(raw_item)
+            if not match or (match.group('prefix') and match.group('suffix')):
+                raise ValueError(f"Invalid exclusion '{raw_item}'")
+            protocol = (match.group('prefix') or match.group('suffix') or '').upper() or None
+            target = match.group('target')
+
+            if target in PRESETS:
+                presets.append((protocol, target))
+                continue
+
+            range_match = _RANGE.match(target)
+            if not range_match:
+                raise ValueError(f"Unknown port or preset '{target}'. Presets: {', '.join(sorted(PRESETS))}")
+            low = int(range_match.group(1))
+            high = int(range_match.group(2) or low)
+            if low > high or high > MAX_PORT:
+                raise ValueError(f"Invalid port range '{target}'")
+            intervals[protocol].append((low, high))
+
+        return cls(presets, intervals)
+
+    def intervals(self, protocol=None):
+        """
+        Return the excluded intervals that apply to a protocol.
+
+        Args:
+            protocol (str): 'TCP' or 'UDP', or None for the exclusions of every protocol
+
+        Returns:
+            list: Merged, sorted ``(low, high)`` tuples
+        """
+        protocol = (protocol or '').upper() or None
+        if protocol not in PROTOCOLS:
+            return self._intervals[None]
+        return merge_intervals(self._intervals[None] + self._intervals[protocol])
+
+    def protocol_intervals(self):
+        """Return the extra intervals of each protocol that has any."""
+        return {protocol: self._intervals[protocol] for protocol in PROTOCOLS if self._intervals[protocol]}
+
+    def normalized(self):
+        """
+        Return the canonical spec string that is stored in the settings.
+
+        Presets come first, followed by the merged intervals of every scope.
+        """
+        items = [f"{protocol.lower()}:{name}" if protocol else name for protocol, name in self.presets]
+        for scope in (None,) + PROTOCOLS:
+            prefix = f"{scope.lower()}:" if scope else ''
+            items.extend(f"{prefix}{low}" if low == high else f"{prefix}{low}-{high}" for low, high in self._own[scope])
+        return ', '.join(items)
+
+@lru_cache(maxsize=32)
+def compile_exclusions(text):
+    """
+    Parse a stored ``port_exclude`` value, once per distinct value.
+
+    Values saved before specs were validated may contain junk; such items are skipped
+    instead of failing port generation.
+    """
+    try:
+        return ExclusionSpec.parse(text)
+    except ValueError:
+        valid = []
+        for item in (text or '').split(','):
+            try:
+                ExclusionSpec.parse(item)
+                valid.append(item)
+            except ValueError:
+                continue
+        return ExclusionSpec.parse(','.join(valid))
+
+def merge_intervals(intervals):
+    """Sort ``(low, high)`` intervals and merge the ones that overlap or touch."""
+    merged = []
+    for low, high in sorted(intervals):
+        if merged and low <= merged[-1][1] + 1:
+            if high > merged[-1][1]:
+                merged[-1] = (merged[-1][0], high)
+        else:
+            merged.append((low, high))
+    return merged
@@ -0,0 +1,159 @@
+# utils/allocation/leases.py
+
+# Standard Imports
+import logging                                  # For logging from the scheduler thread
+import re                                       # For validating lease durations
+import threading                                # For guarding the cached expiry time
+import time                                     # For timing the cached expiry time
+from datetime import datetime, timedelta, timezone # For lease expiry times
+
+# Local Imports
+from utils.database import db, Host, Port       # For accessing the database models
+from utils.database import host_summary         # For maintaining the per-host aggregates
+from utils.scheduler import read_interval, schedule_job # For running the reaper in the background
+from .port_index import port_index              # For returning ports to the free pool
+
+# Longest lease accepted, ten years
+MAX_LEASE_SECONDS = 10 * 365 * 24 * 60 * 60
+
+# Seconds the earliest expiry read from the database is trusted before reading it again
+EXPIRY_CACHE_SECONDS = 5
+
+# Earliest lease expiry as (monotonic time it was read, expiry or None), shared by the requests of this worker
+_expiry_cache = None
+_expiry_lock = threading.Lock()
+
+def utcnow():
+    """Return the current UTC time as a naive datetime, the way expiry times are stored."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def lease_expiry(lease_seconds):
+    """
+    Turn a lease duration from a request into an expiry time.
+
+    Args:
+        lease_seconds (str|int|None): Lease duration in seconds, empty for a permanent port
+
+    Returns:
+        datetime: The UTC expiry time, or None for a permanent port
+
+    Raises:
+        ValueError: If the duration is not a whole positive number of at most MAX_LEASE_SECONDS
+    """
+    if lease_seconds in (None, ''):
+        return None
+    if isinstance(lease_seconds, str) and re.fullmatch(r'\s*[+-]?\d+\s*', lease_seconds):
+        lease_seconds = int(lease_seconds)
+    elif isinstance(lease_seconds, bool) or not isinstance(lease_seconds, int):
+        # Fractions, Infinity and anything else from a form or JSON body
+        raise ValueError("Lease duration must be a whole number of seconds")
+    if lease_seconds <= 0:
+        raise ValueError("Lease duration must be a positive number of seconds")
+    if lease_seconds > MAX_LEASE_SECONDS:
+        raise ValueError(f"Lease duration must be at most {MAX_LEASE_SECONDS} seconds")
+    expires_at = utcnow() + timedelta(seconds=lease_seconds)
+    note_lease(expires_at)
+    return expires_at
+
+def note_lease(expires_at):
+    """Lower the cached earliest expiry for a lease created by this worker."""
+    global _expiry_cache
+    with _expiry_lock:
+        if _expiry_cache is not None and (_expiry_cache[1] is None or expires_at < _expiry_cache[1]):
+            _expiry_cache = (_expiry_cache[0], expires_at)
+
+def next_expiry():
+    """
+    Get the earliest lease expiry of any port.
+
+    The value comes from ``min(expires_at)``, answered from the index on Port.expires_at,
+    so leases created by other workers are seen too. It is cached for
+    EXPIRY_CACHE_SECONDS, so most calls don't query at all.
+
+    Returns:
+        datetime: The earliest expiry time, or None if no port is leased
+    """
+    global _expiry_cache
+    with _expiry_lock:
+        cached = _expiry_cache
+    if cached is not None and time.monotonic() - cached[0] < EXPIRY_CACHE_SECONDS:
+        return cached[1]
+
+    expires_at = db.session.query(db.func.min(Port.expires_at)).scalar()
+    with _expiry_lock:
+        _expiry_cache = (time.monotonic(), expires_at)
+    return expires_at
+
+def reap_if_due():
+    """
+    Reap expired leases if one has expired.
+
+    This is called before allocating ports so that expired leases go back to the free
+    pool right away instead of waiting for the next scheduled run. While nothing is due
+    it costs a comparison, and a query every EXPIRY_CACHE_SECONDS.
+
+    Returns:
+        int: The number of expired ports removed
+    """
+    expires_at = next_expiry()
+    return reap_expired_leases() if expires_at is not None and expires_at <= utcnow() else 0
+
+def reap_expired_leases():
+    """
+    Delete every port whose lease has expired.
+
+    Expired rows are found through the index on Port.expires_at, so the cost depends on
+    the number of expired leases rather than the size of the Port table.
+
+    Returns:
+        int: The number of expired ports removed
+    """
+    global _expiry_cache
+    now = utcnow()
+
+    expired = (db.session.query(Host.ip_address, Port.host_id, Port.port_number, Port.port_protocol, Port.order)
+               .join(Port.host)
+               .filter(Port.expires_at <= now).all())
+    if expired:
+        Port.query.filter(Port.expires_at <= now).delete(synchronize_session=False)
+        host_summary.apply_port_changes(db.session, [
+            (-1, row.host_id, row.port_number, row.port_protocol, row.order) for row in expired
+        ])
+
+    # Look up the next lease to expire, again straight from the index
+    expires_at = db.session.query(db.func.min(Port.expires_at)).scalar()
+    db.session.commit()
+    with _expiry_lock:
+        _expiry_cache = (time.monotonic(), expires_at)
+
+    # The bulk delete bypasses the session, so free the ports by hand
+    for row in expired:
+        port_index.remove(row.ip_address, row.port_number)
+
+    if expired:
+        logging.info(f"Reaped {len(expired)} expired port leases")
+    return len(expired)
+
+def init_lease_reaper(app):
+    """
+    Schedule the background job that expires port leases.
+
+    The interval is read from the LEASE_REAP_INTERVAL environment variable (seconds,
+    default 60, 0 disables the job). With several worker processes the job runs in one
+    of them, see ``schedule_job``.
+
+    Args:
+        app (Flask): The Flask application instance.
+    """
+    interval = read_interval('LEASE_REAP_INTERVAL', 60)
+    if interval <= 0:
+        return
+
+    def run_reaper():
+        try:
+            reap_expired_leases()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error reaping expired leases: {str(e)}")
+
+    schedule_job(app, 'reap_expired_leases', run_reaper, interval)
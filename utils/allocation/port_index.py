@@ -0,0 +1,472 @@
+# utils/allocation/port_index.py
+
+# Standard Imports
+import random                                   # For random port selection
+from itertools import chain, islice             # For taking ports from bitmap iterators
+import threading                                # For guarding the shared index
+
+# External Imports
+from sqlalchemy import event                    # For tracking Port writes
+from sqlalchemy import inspect                  # For reading attribute history
+from sqlalchemy.orm import Session              # For session-wide event hooks
+
+# Local Imports
+from utils.database import db, Host, Port       # For accessing the database models
+from .port_range import count_bits, iter_bits, lowest_bit, run_starts, bit_is_set # For bitmap operations
+
+# Allocation policies accepted by PortIndex.allocate
+POLICIES = ('random', 'lowest', 'next_fit')
+
+# Number of random probes tried before falling back to enumerating free ports
+RANDOM_PROBES = 64
+
+class HostPorts:
+    """
+    The used port numbers of a single IP address.
+
+    A port number counts as used if any protocol is registered on it, matching how
+    port generation has always treated existing entries. ``counts`` tracks how many
+    rows share a number so that deleting the TCP entry of a TCP/UDP pair keeps the
+    number used. ``reserved`` holds numbers handed out by ``allocate`` whose rows
+    have not been committed yet, and ``rows`` the number of rows counted.
+    """
+
+    def __init__(self, port_numbers, port_range):
+        self.counts = {}
+        self.reserved = set()
+        self.rows = 0
+        self.used = 0
+        self.in_use = 0
+        self.cursor = 0
+        self.range = port_range
+        for port in port_numbers:
+            self.add(port)
+
+    def is_used(self, port):
+        return port in self.counts or port in self.reserved
+
+    def free_mask(self):
+        return self.range.mask & ~self.used
+
+    def rebase(self, port_range):
+        """Recount the in-range usage against a new port range."""
+        self.range = port_range
+        self.in_use = sum(1 for port in self._used_ports() if port in port_range)
+
+    def add(self, port):
+        self.rows += 1
+        if port in self.reserved:
+            # The bit is already set and counted, the reservation just becomes a row
+            self.reserved.discard(port)
+            self.counts[port] = self.counts.get(port, 0) + 1
+            return
+        if not self.is_used(port):
+            self._mark(port)
+        self.counts[port] = self.counts.get(port, 0) + 1
+
+    def remove(self, port):
+        count = self.counts.get(port, 0)
+        if count:
+            self.rows -= 1
+        if count > 1:
+            self.counts[port] = count - 1
+        elif count == 1:
+            del self.counts[port]
+            if port not in self.reserved:
+                self._unmark(port)
+
+    def reserve(self, port):
+        self._mark(port)
+        self.reserved.add(port)
+
+    def release(self, port):
+        if port in self.reserved:
+            self.reserved.discard(port)
+            if port not in self.counts:
+                self._unmark(port)
+
+    def _used_ports(self):
+        return set(self.counts) | self.reserved
+
+    def _mark(self, port):
+        self.used |= 1 << port
+        if port in self.range:
+            self.in_use += 1
+
+    def _unmark(self, port):
+        self.used &= ~(1 << port)
+        if port in self.range:
+            self.in_use -= 1
+
+class PortIndex:
+    """
+    In-process index of free ports per IP address.
+
+    Each IP is loaded lazily from the Port table the first time it is needed and is
+    then kept current incrementally: ORM writes to Port are picked up from the session
+    at flush time and applied once the transaction commits. Code paths that bypass the
+    ORM (bulk deletes, Core inserts) must call ``invalidate`` or ``add``/``remove``.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._hosts = {}
+        self.range = None
+
+    def configure(self, port_range):
+        """
+        Switch the index to a new port range if the settings changed.
+
+        Args:
+            port_range (PortRange): The compiled range from the current settings
+
+        Returns:
+            PortRange: The range now in effect
+        """
+        with self._lock:
+            if self.range is None or self.range.key != port_range.key:
+                self.range = port_range
+                for host in self._hosts.values():
+                    host.rebase(port_range)
+            return self.range
+
+    def stats(self, ip_address):
+        """
+        Return how many ports of the current range are in use for an IP.
+
+        Returns:
+            tuple: (ports_in_use, total_ports)
+        """
+        with self._lock:
+            return self._host(ip_address).in_use, self.range.total
+
+    def allocate(self, ip_address, policy='random', protocol=None):
+        """
+        Pick a free port for an IP address and reserve it.
+
+        The reservation keeps concurrent requests from picking the same number until
+        the new row is committed (which turns it into a regular entry) or ``release``
+        is called because the insert failed.
+
+        Args:
+            ip_address (str): The IP address to allocate on
+            policy (str): One of 'random', 'lowest' or 'next_fit'
+            protocol (str): Protocol of the new entry, whose own exclusions also apply
+
+        Returns:
+            int: The reserved port number, or None if the range is exhausted
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown allocation policy: {policy}")
+
+        with self._lock:
+            host = self._host(ip_address)
+            free, free_count = self._free(host, protocol)
+            if free_count <= 0:
+                return None
+
+            if policy == 'lowest':
+                port = lowest_bit(free)
+            elif policy == 'next_fit':
+                port = self._next_fit(free, host.cursor)
+            else:
+                port = self._random(free, self._blocked(host, protocol), free_count)
+
+            if port is not None:
+                host.reserve(port)
+                host.cursor = port + 1
+            return port
+
+    def allocate_many(self, ip_address, count, policy='random', protocol=None):
+        """
+        Pick and reserve ``count`` free ports for an IP address in one pass.
+
+        Allocation is all-or-nothing: if fewer than ``count`` ports are free nothing
+        is reserved.
+
+        Args:
+            ip_address (str): The IP address to allocate on
+            count (int): Number of ports to allocate
+            policy (str): One of 'random', 'lowest' or 'next_fit'
+            protocol (str): Protocol of the new entries, whose own exclusions also apply
+
+        Returns:
+            list: The reserved port numbers, or None if the range cannot fit them all
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown allocation policy: {policy}")
+
+        with self._lock:
+            host = self._host(ip_address)
+            free, free_count = self._free(host, protocol)
+            if count <= 0 or free_count < count:
+                return None if count > 0 else []
+
+            if policy == 'lowest':
+                ports = list(islice(iter_bits(free), count))
+            elif policy == 'next_fit':
+                head = free >> host.cursor << host.cursor
+                ports = list(islice(chain(iter_bits(head), iter_bits(free ^ head)), count))
+            elif count * 4 <= free_count:
+                # Few ports out of a roomy range, probing stays cheap
+                ports = []
+                blocked = self._blocked(host, protocol)
+                while len(ports) < count:
+                    port = self._random(host.free_mask() & self.range.mask_for(protocol), blocked, free_count - len(ports))
+                    host.reserve(port)
+                    ports.append(port)
+            else:
+                ports = random.sample(list(iter_bits(free)), count)
+
+            for port in ports:
+                if port not in host.reserved:
+                    host.reserve(port)
+            host.cursor = ports[-1] + 1
+            return ports
+
+    def allocate_block(self, ip_address, size, policy='random', protocol=None):
+        """
+        Find and reserve a block of ``size`` consecutive free ports for an IP address.
+
+        Every port of the block must be a candidate of the current range, so excluded
+        ports and ports of the wrong length split blocks just like existing entries do.
+
+        Args:
+            ip_address (str): The IP address to allocate on
+            size (int): Number of consecutive ports needed
+            policy (str): One of 'random', 'lowest' or 'next_fit', applied to the block start
+            protocol (str): Protocol of the new entries, whose own exclusions also apply
+
+        Returns:
+            list: The reserved port numbers in ascending order, or None if no block fits
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown allocation policy: {policy}")
+
+        with self._lock:
+            host = self._host(ip_address)
+            free, free_count = self._free(host, protocol)
+            if size <= 0 or free_count < size:
+                return None
+
+            starts = run_starts(free, size)
+            if policy == 'lowest':
+                start = lowest_bit(starts)
+            elif policy == 'next_fit':
+                start = self._next_fit(starts, host.cursor)
+            else:
+                start = self._random_start(starts)
+
+            if start is None:
+                return None
+
+            ports = list(range(start, start + size))
+            for port in ports:
+                host.reserve(port)
+            host.cursor = start + size
+            return ports
+
+    def allocate_shared(self, ip_addresses, policy='random', protocol=None):
+        """
+        Pick a port that is free on every one of several IP addresses and reserve it on all.
+
+        The free bitmaps of the IP addresses are intersected with a bitwise AND, so the
+        cost grows with the number of hosts but not with how full their ranges are.
+
+        Args:
+            ip_addresses (list): The IP addresses that all need the port
+            policy (str): One of 'random', 'lowest' or 'next_fit'
+            protocol (str): Protocol of the new entries, whose own exclusions also apply
+
+        Returns:
+            int: The reserved port number, or None if no port is free on every IP address
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown allocation policy: {policy}")
+
+        with self._lock:
+            hosts = [self._host(ip_address) for ip_address in ip_addresses]
+            if not hosts:
+                return None
+
+            free = self.range.mask_for(protocol)
+            for host in hosts:
+                free &= ~host.used
+            if not free:
+                return None
+
+            if policy == 'lowest':
+                port = lowest_bit(free)
+            elif policy == 'next_fit':
+                port = self._next_fit(free, max(host.cursor for host in hosts))
+            else:
+                candidates = self._candidate_bytes(protocol)
+                port = self._random(free, lambda p: (candidates is not None and not bit_is_set(candidates, p))
+                                    or any(host.is_used(p) for host in hosts), count_bits(free))
+
+            for host in hosts:
+                host.reserve(port)
+                host.cursor = port + 1
+            return port
+
+    def release(self, ip_address, port):
+        """Drop a reservation made by ``allocate`` whose row was never committed."""
+        with self._lock:
+            host = self._hosts.get(ip_address)
+            if host is not None:
+                host.release(int(port))
+
+    def add(self, ip_address, port):
+        with self._lock:
+            host = self._hosts.get(ip_address)
+            if host is not None:
+                host.add(int(port))
+
+    def remove(self, ip_address, port):
+        with self._lock:
+            host = self._hosts.get(ip_address)
+            if host is not None:
+                host.remove(int(port))
+
+    def invalidate(self, ip_address=None):
+        """Forget one IP (or every IP) so it is reloaded from the database on next use."""
+        with self._lock:
+            if ip_address is None:
+                self._hosts.clear()
+            else:
+                self._hosts.pop(ip_address, None)
+
+    def sync(self, port_counts):
+        """
+        Forget IPs whose number of Port rows no longer matches the database.
+
+        Every worker process has its own index, which only follows the writes of its
+        own sessions. Comparing the indexed rows with a count shared through the
+        database catches ports other workers added or removed, on any protocol, and
+        those IPs are reloaded on next use.
+
+        Args:
+            port_counts (dict): Maps IP addresses to their number of Port rows
+        """
+        with self._lock:
+            for ip_address, port_count in port_counts.items():
+                host = self._hosts.get(ip_address)
+                if host is not None and host.rows != port_count:
+                    del self._hosts[ip_address]
+
+    def _host(self, ip_address):
+        host = self._hosts.get(ip_address)
+        if host is None:
+            rows = db.session.query(Port.port_number).join(Port.host).filter(Host.ip_address == ip_address)
+            host = HostPorts((row.port_number for row in rows), self.range)
+            self._hosts[ip_address] = host
+        return host
+
+    def _free(self, host, protocol):
+        """Return the free candidate bitmap of a host for a protocol and how many ports it holds."""
+        candidates = self.range.mask_for(protocol)
+        if candidates is self.range.mask:
+            return host.free_mask(), self.range.total - host.in_use
+        free = host.free_mask() & candidates
+        return free, count_bits(free)
+
+    def _candidate_bytes(self, protocol):
+        """Return the byte form of a protocol's candidate bitmap, or None if it has no own exclusions."""
+        candidates = self.range.mask_for(protocol)
+        if candidates is self.range.mask:
+            return None
+        return candidates.to_bytes((candidates.bit_length() + 7) // 8, 'little')
+
+    def _blocked(self, host, protocol):
+        """Return a test for ports that can't be picked on a host, for random probing."""
+        candidates = self._candidate_bytes(protocol)
+        if candidates is None:
+            return host.is_used
+        return lambda port: host.is_used(port) or not bit_is_set(candidates, port)
+
+    def _next_fit(self, free, cursor):
+        port = lowest_bit(free >> cursor << cursor)
+        return port if port is not None else lowest_bit(free)
+
+    def _random(self, free, is_used, free_count):
+        ports = self.range.ports
+        # While a reasonable share of the range is free, probing is expected O(1)
+        if free_count * 8 >= len(ports):
+            for _ in range(RANDOM_PROBES):
+                port = ports[random.randrange(len(ports))]
+                if not is_used(port):
+                    return port
+        candidates = list(iter_bits(free))
+        return random.choice(candidates) if candidates else None
+
+    def _random_start(self, starts):
+        if not starts:
+            return None
+        ports = self.range.ports
+        data = starts.to_bytes((starts.bit_length() + 7) // 8, 'little')
+        for _ in range(RANDOM_PROBES):
+            port = ports[random.randrange(len(ports))]
+            if bit_is_set(data, port):
+                return port
+        return random.choice(list(iter_bits(starts)))
+
+# Shared index for this worker process
+port_index = PortIndex()
+
+# Session Tracking
+
+def _track_port_changes(session, flush_context):
+    """Record Port inserts, deletes, host/number changes and Host re-addressing made in this flush."""
+    changes = session.info.setdefault('port_index_changes', [])
+    port_changes = []
+
+    for obj in session.new:
+        if isinstance(obj, Port):
+            port_changes.append(('add', obj.host_id, obj.port_number))
+
+    for obj in session.deleted:
+        if isinstance(obj, Port):
+            port_changes.append(('remove', obj.host_id, obj.port_number))
+
+    for obj in session.dirty:
+        state = inspect(obj)
+        if isinstance(obj, Host):
+            ip_history = state.attrs.ip_address.history
+            for ip_address in chain(ip_history.deleted or (), ip_history.added or ()):
+                changes.append(('invalidate', ip_address, None))
+            continue
+        if not isinstance(obj, Port):
+            continue
+        host_history = state.attrs.host_id.history
+        port_history = state.attrs.port_number.history
+        if not host_history.has_changes() and not port_history.has_changes():
+            continue
+        old_host = host_history.deleted[0] if host_history.deleted else obj.host_id
+        old_port = port_history.deleted[0] if port_history.deleted else obj.port_number
+        port_changes.append(('remove', old_host, old_port))
+        port_changes.append(('add', obj.host_id, obj.port_number))
+
+    if port_changes:
+        # The index is keyed by IP address, so resolve the hosts in one query
+        host_ids = set(host_id for _, host_id, _ in port_changes if host_id is not None)
+        with session.no_autoflush:
+            ip_addresses = dict(session.query(Host.id, Host.ip_address).filter(Host.id.in_(host_ids)).all())
+        for action, host_id, port in port_changes:
+            if host_id in ip_addresses:
+                changes.append((action, ip_addresses[host_id], port))
+
+def _apply_port_changes(session):
+    for action, ip_address, port in session.info.pop('port_index_changes', []):
+        if action == 'add':
+            port_index.add(ip_address, port)
+        elif action == 'remove':
+            port_index.remove(ip_address, port)
+        else:
+            port_index.invalidate(ip_address)
+
+def _discard_port_changes(session):
+    session.info.pop('port_index_changes', None)
+
+event.listen(Session, 'after_flush', _track_port_changes)
+event.listen(Session, 'after_commit', _apply_port_changes)
+event.listen(Session, 'after_rollback', _discard_port_changes)
@@ -0,0 +1,146 @@
+# utils/allocation/port_range.py
+
+# Standard Imports
+from array import array                         # For compact candidate port storage
+import hashlib                                  # For a stable range digest
+
+MAX_PORT = 65535
+
+class PortRange:
+    """
+    The set of port numbers that port generation is allowed to hand out.
+
+    A range is compiled once from the port generation settings and then shared by
+    every per-IP index. The candidates are built by interval arithmetic: the span
+    ``start``-``end`` is intersected with the span of the required digit count and
+    every excluded interval is masked out in one step. It keeps the candidate ports
+    in three forms so that each allocation policy can use the cheapest one:
+
+    - ``mask``: an integer bitmap (bit ``p`` set if port ``p`` is a candidate)
+    - ``allowed``: a bytearray lookup table for O(1) membership tests
+    - ``ports``: a sorted array of the candidate ports for uniform random picks
+
+    Exclusions that only apply to one protocol are kept as extra bitmaps, see
+    ``mask_for``.
+    """
+
+    def __init__(self, start, end, excluded=(), length=0, protocol_excluded=None):
+        self.start = max(0, start)
+        self.end = min(MAX_PORT, end)
+        self.excluded = tuple(excluded)
+        self.length = length
+        protocol_excluded = protocol_excluded or {}
+        self.key = (self.start, self.end, self.excluded, self.length,
+                    tuple(sorted((protocol, tuple(intervals)) for protocol, intervals in protocol_excluded.items())))
+        self.digest = hashlib.sha1(repr(self.key).encode()).hexdigest()
+
+        mask = interval_mask(self.start, self.end)
+        if length:
+            mask &= interval_mask(10 ** (length - 1) if length > 1 else 0, 10 ** length - 1)
+        for low, high in self.excluded:
+            mask &= ~interval_mask(low, high)
+        self.mask = mask
+
+        self.allowed = bytearray(MAX_PORT + 1)
+        self.ports = array('H', iter_bits(mask))
+        for port in self.ports:
+            self.allowed[port] = 1
+        self.total = len(self.ports)
+
+        self.protocol_masks = {}
+        for protocol, intervals in protocol_excluded.items():
+            protocol_mask = mask
+            for low, high in intervals:
+                protocol_mask &= ~interval_mask(low, high)
+            self.protocol_masks[protocol] = protocol_mask
+
+    @classmethod
+    def from_settings(cls, port_start, port_end, exclusions, port_length):
+        """
+        Build a range from the ``port_*`` setting values.
+
+        Ranges are cached per distinct combination of settings, so the candidates are
+        only computed again when the settings change.
+
+        Args:
+            port_start (int): First port of the range
+            port_end (int): Last port of the range (inclusive)
+            exclusions (ExclusionSpec): The compiled ``port_exclude`` setting
+            port_length (int): Required number of digits, or 0 for any length
+
+        Returns:
+            PortRange: The compiled range
+        """
+        return _cached_range(int(port_start), int(port_end), exclusions, int(port_length))
+
+    def mask_for(self, protocol=None):
+        """Return the candidate bitmap for a protocol, including its own exclusions."""
+        return self.protocol_masks.get((protocol or '').upper(), self.mask)
+
+    def __contains__(self, port):
+        return 0 <= port <= MAX_PORT and self.allowed[port] == 1
+
+    def __len__(self):
+        return self.total
+
+# Recently compiled ranges, keyed by their settings
+_range_cache = {}
+
+def _cached_range(port_start, port_end, exclusions, port_length):
+    key = (port_start, port_end, exclusions.key, port_length)
+    port_range = _range_cache.get(key)
+    if port_range is None:
+        if len(_range_cache) >= 8:
+            _range_cache.clear()
+        port_range = PortRange(port_start, port_end, exclusions.intervals(), port_length,
+                               exclusions.protocol_intervals())
+        _range_cache[key] = port_range
+    return port_range
+
+# Bitmap Helpers
+
+def interval_mask(low, high):
+    """Return a bitmap with the bits ``low`` to ``high`` (inclusive) set."""
+    if high < low:
+        return 0
+    return ((1 << (high - low + 1)) - 1) << low
+
+def lowest_bit(mask):
+    """Return the index of the lowest set bit in ``mask``, or None if it is empty."""
+    if not mask:
+        return None
+    return (mask & -mask).bit_length() - 1
+
+def iter_bits(mask):
+    """Yield the index of every set bit in ``mask`` in ascending order."""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    for offset, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield (offset << 3) + low.bit_length() - 1
+            byte ^= low
+
+def count_bits(mask):
+    """Return the number of set bits in ``mask``."""
+    return bin(mask).count('1')
+
+def run_starts(mask, size):
+    """
+    Return a bitmap of the positions where ``size`` consecutive bits of ``mask`` are set.
+
+    Runs are found by doubling: a run of length 2w starts wherever a run of length w
+    starts and another one starts w bits later. This needs O(log size) bitmap
+    operations no matter how fragmented the mask is.
+    """
+    runs, width = mask, 1
+    while width * 2 <= size:
+        runs &= runs >> width
+        width *= 2
+    if width < size:
+        runs &= runs >> (size - width)
+    return runs
+
+def bit_is_set(data, bit):
+    """Test a bit in the little-endian byte form of a bitmap."""
+    offset = bit >> 3
+    return offset < len(data) and (data[offset] >> (bit & 7)) & 1 == 1
@@ -0,0 +1,252 @@
+# utils/assets.py
+
+# Standard Imports
+import hashlib                                  # For content hashes
+import mimetypes                                # For the content type of bundled files
+import os                                       # For walking the static folder
+import posixpath                                # For resolving relative URLs
+import re                                       # For finding imports
+import threading                                # For rebuilding the manifest safely
+
+# External Imports
+from flask import Response                      # For serving bundled files
+from flask import abort                         # For unknown assets
+from flask import g                             # For checking the static folder once per request
+from flask import has_app_context               # For calls made outside a request
+from flask import request                       # For conditional responses
+from flask import send_file                     # For serving files as they are on disk
+from flask import send_from_directory           # For serving unversioned files
+from flask import url_for                       # For generating URLs
+
+# Fingerprinted assets never change, so they may be cached for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Length of the content hash in versioned file names
+HASH_LENGTH = 10
+
+# Relative module specifiers in "import ... from './x.js'", "export ... from" and "import './x.js'"
+_JS_IMPORT = re.compile(r'''(\bfrom\s*|\bimport\s*)(['"])(\.{1,2}/[^'"\n]+)\2''')
+# "@import 'x.css';" and "@import url(x.css);"
+_CSS_IMPORT = re.compile(r'''@import\s+(?:url\(\s*)?(['"]?)([^'")\s;]+)\1\s*\)?\s*;''')
+# Comments and strings, strings are matched so that comment markers inside them are kept
+_CSS_COMMENT = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/''', re.S)
+
+class Asset:
+    """A static file with its versioned path and, for bundles, the bytes to serve."""
+
+    def __init__(self, path, digest, body=None, dependencies=()):
+        self.path = path
+        self.digest = digest
+        self.body = body
+        self.dependencies = tuple(dependencies)
+        stem, extension = posixpath.splitext(path)
+        self.versioned_path = f"{stem}.{digest[:HASH_LENGTH]}{extension}"
+
+class AssetManifest:
+    """
+    Content-hashed names of every file in the static folder.
+
+    Stylesheets are bundled with the files they ``@import`` and stripped of comments
+    and indentation. JavaScript modules keep their own files, but their relative
+    imports are rewritten to the versioned names of the imported modules, and the hash
+    of a module covers everything it imports, so any change anywhere in a module graph
+    gives its entry point a new URL. Templates preload the whole graph of an entry
+    point, so the browser fetches it in parallel instead of one import at a time.
+    """
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.assets = {}
+        self.versioned = {}
+        self.stamp = None
+        self.build()
+
+    def build(self):
+        """Hash, bundle and rewrite every file in the static folder."""
+        sources = {}
+        for path in _walk(self.static_folder):
+            with open(os.path.join(self.static_folder, path), 'rb') as source:
+                sources[path] = source.read()
+
+        assets = {}
+        for path, content in sources.items():
+            if path.endswith('.css'):
+                body = _minify_css(_bundle_css(path, sources, set()))
+                assets[path] = Asset(path, _digest(body), body)
+            elif not path.endswith('.js'):
+                assets[path] = Asset(path, _digest(content))
+
+        # Module hashes cover the sources of the whole import graph
+        imports = {path: _js_imports(path, sources) for path in sources if path.endswith('.js')}
+        for path in imports:
+            graph = _closure(path, imports)
+            digest = _digest(b''.join(name.encode() + b'\0' + sources[name] for name in sorted(graph)))
+            assets[path] = Asset(path, digest, dependencies=sorted(graph - {path}))
+        for path in imports:
+            assets[path].body = _rewrite_js(path, sources[path], assets)
+
+        self.assets = assets
+        self.versioned = {asset.versioned_path: asset for asset in assets.values()}
+        self.stamp = _tree_stamp(self.static_folder)
+
+    def url(self, path):
+        """
+        Get the versioned URL of a static file.
+
+        Args:
+            path (str): The path of the file inside the static folder
+
+        Returns:
+            str: The versioned URL, or the plain static URL for unknown files
+        """
+        asset = self.assets.get(path)
+        if asset is None:
+            return url_for('static', filename=path)
+        return url_for('assets', filename=asset.versioned_path)
+
+    def preloads(self, path):
+        """Get the versioned URLs of every module imported, directly or not, by a module."""
+        asset = self.assets.get(path)
+        if asset is None:
+            return []
+        return [self.url(dependency) for dependency in asset.dependencies]
+
+    def serve(self, filename):
+        """
+        Serve a versioned asset with far-future cache headers.
+
+        Unversioned paths, such as files referenced relatively from a stylesheet,
+        are served from the static folder with the default cache headers.
+        """
+        asset = self.versioned.get(filename)
+        if asset is None:
+            if filename in self.assets:
+                return send_from_directory(self.static_folder, filename)
+            abort(404)
+
+        if asset.body is not None:
+            mimetype = mimetypes.guess_type(asset.path)[0] or 'application/octet-stream'
+            response = Response(asset.body, mimetype=mimetype)
+        else:
+            response = send_file(os.path.join(self.static_folder, asset.path), etag=False)
+        response.set_etag(asset.digest)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response.make_conditional(request)
+
+class _Assets:
+    """Holds the manifest of an app and rebuilds it in debug mode when files change."""
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.manifest = AssetManifest(app.static_folder)
+
+    def current(self):
+        """Get the manifest, in debug mode checking the static folder for changes once per request."""
+        if self.app.debug and self._needs_check():
+            if _tree_stamp(self.app.static_folder) != self.manifest.stamp:
+                with self.lock:
+                    self.manifest = AssetManifest(self.app.static_folder)
+        return self.manifest
+
+    def _needs_check(self):
+        # A page renders many asset URLs, walking the static folder for each one is too slow
+        if not has_app_context():
+            return True
+        if g.get('assets_checked'):
+            return False
+        g.assets_checked = True
+        return True
+
+def init_assets(app):
+    """
+    Build the asset manifest and register the versioned asset route and template helpers.
+
+    Templates get ``asset_url(path)`` for the versioned URL of a static file and
+    ``asset_preloads(path)`` for the URLs to preload along with a JavaScript module.
+
+    Args:
+        app (Flask): The Flask application
+    """
+    assets = _Assets(app)
+    app.extensions['assets'] = assets
+    app.add_url_rule('/assets/<path:filename>', 'assets', lambda filename: assets.current().serve(filename))
+    app.jinja_env.globals['asset_url'] = lambda path: assets.current().url(path)
+    app.jinja_env.globals['asset_preloads'] = lambda path: assets.current().preloads(path)
+
+# Build Helpers
+
+def _walk(folder):
+    """Yield the paths of every file below a folder, relative to it and with forward slashes."""
+    for root, _, files in os.walk(folder):
+        for name in files:
+            yield os.path.relpath(os.path.join(root, name), folder).replace(os.sep, '/')
+
+def _tree_stamp(folder):
+    """Return a value that changes whenever a file below a folder is added, removed or modified."""
+    stamps = []
+    for path in _walk(folder):
+        stat = os.stat(os.path.join(folder, path))
+        stamps.append((path, stat.st_mtime_ns, stat.st_size))
+    return hash(tuple(sorted(stamps)))
+
+def _digest(content):
+    return hashlib.sha1(content).hexdigest()
+
+def _resolve(path, reference):
+    """Resolve a relative reference from the file at ``path`` to a path in the static folder."""
+    return posixpath.normpath(posixpath.join(posixpath.dirname(path), reference))
+
+def _bundle_css(path, sources, seen):
+    """Return a stylesheet with the local stylesheets it imports inlined, each only once."""
+    seen.add(path)
+
+    def inline(match):
+        target = _resolve(path, match.group(2))
+        if target not in sources or not target.endswith('.css'):
+            return match.group(0)
+        if target in seen:
+            return ''
+        return _bundle_css(target, sources, seen).decode('utf-8')
+
+    return _CSS_IMPORT.sub(inline, sources[path].decode('utf-8')).encode('utf-8')
+
+def _minify_css(content):
+    """Strip comments, indentation and blank lines from a stylesheet."""
+    text = _CSS_COMMENT.sub(lambda match: match.group(1) or '', content.decode('utf-8'))
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line).encode('utf-8')
+
+def _js_imports(path, sources):
+    """Return the local modules a module imports."""
+    imports = set()
+    for match in _JS_IMPORT.finditer(sources[path].decode('utf-8')):
+        target = _resolve(path, match.group(3))
+        if target in sources:
+            imports.add(target)
+    return imports
+
+def _closure(path, imports):
+    """Return a module and every module it imports, directly or not."""
+    graph = set()
+    pending = [path]
+    while pending:
+        current = pending.pop()
+        if current not in graph:
+            graph.add(current)
+            pending.extend(imports.get(current, ()))
+    return graph
+
+def _rewrite_js(path, content, assets):
+    """Point the relative imports of a module at the versioned names of the imported modules."""
+    def rewrite(match):
+        target = _resolve(path, match.group(3))
+        if target not in assets:
+            return match.group(0)
+        directory = posixpath.dirname(path) or '.'
+        reference = posixpath.relpath(assets[target].versioned_path, directory)
+        if not reference.startswith('.'):
+            reference = './' + reference
+        return f"{match.group(1)}{match.group(2)}{reference}{match.group(2)}"
+
+    return _JS_IMPORT.sub(rewrite, content.decode('utf-8')).encode('utf-8')
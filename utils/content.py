@@ -0,0 +1,59 @@
+# utils/content.py
+
+# Standard Imports
+import hashlib                                  # For content ETags
+import os                                       # For file modification times
+import threading                                # For guarding the shared cache
+
+# Computed values with the file stamps they were computed from
+_entries = {}
+_lock = threading.Lock()
+
+def file_stamp(path):
+    """
+    Return what identifies the current version of a file or directory.
+
+    Args:
+        path (str): The file or directory
+
+    Returns:
+        tuple: (mtime_ns, size), or None if the path doesn't exist
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def cached_from_files(key, paths, compute):
+    """
+    Return a value derived from files, recomputing it only when one of them changes.
+
+    The files are stat'ed on every call, which is much cheaper than reading and
+    processing them. A directory changes when entries are added, removed or renamed.
+
+    Args:
+        key (str): Name of the cached value
+        paths (list): The files or directories the value is computed from
+        compute (callable): Computes the value, called without arguments
+
+    Returns:
+        The cached or freshly computed value
+    """
+    stamps = tuple(file_stamp(path) for path in paths)
+    entry = _entries.get(key)
+    if entry is not None and entry[0] == stamps:
+        return entry[1]
+
+    value = compute()
+    with _lock:
+        _entries[key] = (stamps, value)
+    return value
+
+def content_etag(*parts):
+    """Return a strong ETag value for some text or bytes."""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part.encode('utf-8') if isinstance(part, str) else part)
+        digest.update(b'\0')
+    return digest.hexdigest()
@@ -1,7 +1,10 @@
 # utils/database/__init__.py
 
 from .db import db, init_db, create_tables
+from .host import Host
+from .maintenance import delete_in_chunks, reclaim_space
 from .port import Port
+from .host_summary import HostSummary, check_summaries
 from .setting import Setting
 from .sockets import Sockets
-__all__ = ['db', 'init_db', 'create_tables', 'Port', 'Setting', "Sockets"]
\ No newline at end of file
+__all__ = ['db', 'init_db', 'create_tables', 'Host', 'delete_in_chunks', 'reclaim_space', 'Port', 'HostSummary', 'check_summaries', 'Setting', "Sockets"]
\ No newline at end of file
@@ -0,0 +1,73 @@
+# utils/database/host.py
+
+import json
+
+from sqlalchemy import insert
+
+from utils.ordering import next_order
+from .db import db
+
+class Host(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    ip_address = db.Column(db.String(45), unique=True, nullable=False)
+    nickname = db.Column(db.String(50), nullable=True)
+    panel_order = db.Column(db.Integer, nullable=False, default=0)
+    settings = db.Column(db.Text, nullable=True, default='{}')
+
+    # Ports are removed with set-based deletes, never one by one through the ORM
+    ports = db.relationship('Port', back_populates='host', passive_deletes='all')
+
+    @classmethod
+    def get_or_create(cls, ip_address, nickname=None):
+        """
+        Return the host for an IP address, creating it at the end of the panel order if needed.
+
+        A nickname is only applied to new hosts or hosts that don't have one yet;
+        renaming a host is done through edit_ip.
+        """
+        host = cls.query.filter_by(ip_address=ip_address).first()
+        if host is None:
+            last_panel = db.session.query(db.func.max(cls.panel_order)).scalar()
+            host = cls(ip_address=ip_address, nickname=nickname or None, settings='{}',
+                       panel_order=next_order(last_panel))
+            db.session.add(host)
+            db.session.flush()
+        elif nickname and not host.nickname:
+            host.nickname = nickname
+        return host
+
+    @classmethod
+    def get_or_create_many(cls, nicknames):
+        """
+        Return the hosts for several IP addresses, creating the missing ones in one statement.
+
+        Args:
+            nicknames (dict): Maps IP addresses to the nickname to use if the host is new
+
+        Returns:
+            dict: Maps every given IP address to its host
+        """
+        hosts = {host.ip_address: host for host in cls.query.filter(cls.ip_address.in_(list(nicknames)))}
+        missing = [ip_address for ip_address in nicknames if ip_address not in hosts]
+        if missing:
+            last_panel = db.session.query(db.func.max(cls.panel_order)).scalar()
+            rows = []
+            for ip_address in missing:
+                last_panel = next_order(last_panel)
+                rows.append({'ip_address': ip_address, 'nickname': nicknames[ip_address] or None,
+                             'settings': '{}', 'panel_order': last_panel})
+            # A bulk INSERT ... RETURNING creates the hosts without a flush per object
+            created = db.session.scalars(insert(cls).returning(cls, sort_by_parameter_order=True), rows)
+            hosts.update((host.ip_address, host) for host in created)
+        return hosts
+
+    def get_setting(self, key, default=None):
+        return json.loads(self.settings or '{}').get(key, default)
+
+    def set_setting(self, key, value):
+        settings = json.loads(self.settings or '{}')
+        if value in (None, ''):
+            settings.pop(key, None)
+        else:
+            settings[key] = value
+        self.settings = json.dumps(settings)
@@ -0,0 +1,305 @@
+# utils/database/host_summary.py
+
+from sqlalchemy import bindparam, case, event, func, inspect, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from .db import db
+from .host import Host
+from .port import Port
+
+class HostSummary(db.Model):
+    """
+    Aggregates of the ports of one host, kept current on every write.
+
+    Inserts, deletes and changes made through the ORM are applied by a session hook
+    in the same transaction. Code paths that write Port rows with Core statements
+    call ``apply_port_changes`` or ``refresh`` themselves.
+
+    ``in_range_count`` is the number of distinct port numbers inside the port range
+    identified by ``range_key``. It is only maintained while the writing worker knows
+    the active range; otherwise ``range_key`` is cleared, reads count the ports instead,
+    and ``refresh`` or ``check_summaries`` store the count again.
+    """
+    host_id = db.Column(db.Integer, db.ForeignKey('host.id'), primary_key=True)
+    port_count = db.Column(db.Integer, nullable=False, default=0)
+    tcp_count = db.Column(db.Integer, nullable=False, default=0)
+    udp_count = db.Column(db.Integer, nullable=False, default=0)
+    max_order = db.Column(db.Integer, nullable=True)
+    in_range_count = db.Column(db.Integer, nullable=False, default=0)
+    range_key = db.Column(db.String(40), nullable=True)
+
+    @classmethod
+    def highest_orders(cls, host_ids):
+        """
+        Get the highest port order of several hosts.
+
+        Returns:
+            dict: Maps every given host id to its highest order, or None if it has no ports
+        """
+        host_ids = list(host_ids)
+        orders = dict.fromkeys(host_ids)
+        if host_ids:
+            orders.update(db.session.query(cls.host_id, cls.max_order).filter(cls.host_id.in_(host_ids)))
+        return orders
+
+    @classmethod
+    def highest_order(cls, host_id):
+        return cls.highest_orders([host_id])[host_id]
+
+    @classmethod
+    def used_in_range(cls, host_id, port_range):
+        """
+        Get the number of distinct port numbers of a host inside a port range.
+
+        The stored count is used if it belongs to this range, otherwise the ports are
+        counted. Nothing is written, stale counts are repaired by ``check_summaries``.
+
+        Args:
+            host_id (int): The host to look up
+            port_range (PortRange): The active port range
+
+        Returns:
+            int: The number of used port numbers in the range
+        """
+        summary = db.session.get(cls, host_id)
+        if summary is not None and summary.range_key == port_range.digest:
+            return summary.in_range_count
+        return _count_in_range(db.session, host_id, port_range)
+
+# Port range used for in_range_count by this worker, set by the port generation routes
+_active_range = None
+
+# Hosts, or (host, port number) keys, looked up per round of queries
+_REFRESH_CHUNK = 500
+
+def use_range(port_range):
+    """Set the port range whose usage is maintained by subsequent writes."""
+    global _active_range
+    _active_range = port_range
+
+def apply_port_changes(session, changes):
+    """
+    Apply Port row changes to the summaries of the affected hosts.
+
+    This must run in the transaction that wrote the rows, after they were written.
+
+    Args:
+        session (Session): The session whose transaction wrote the rows
+        changes (list): (sign, host_id, port_number, port_protocol, order) tuples,
+                        sign being 1 for a new row and -1 for a removed one
+    """
+    deltas = {}
+    key_counts = {}
+    for sign, host_id, port_number, protocol, order in changes:
+        if host_id is None:
+            continue
+        # Routes may assign the port number straight from a form, before the column converts it
+        port_number = int(port_number) if port_number is not None else None
+        delta = deltas.setdefault(host_id, {'count': 0, 'tcp': 0, 'udp': 0, 'in_range': 0,
+                                            'added_max': None, 'removed_max': None, 'numbers': False})
+        delta['count'] += sign
+        protocol = (protocol or '').upper()
+        if protocol in ('TCP', 'UDP'):
+            delta[protocol.lower()] += sign
+        if order is not None:
+            slot = 'added_max' if sign > 0 else 'removed_max'
+            delta[slot] = order if delta[slot] is None else max(delta[slot], order)
+        if _active_range is None:
+            delta['numbers'] = True
+        elif port_number in _active_range:
+            key = (host_id, port_number)
+            key_counts[key] = key_counts.get(key, 0) + sign
+
+    # A number enters or leaves the range usage when its first row appears or its last one goes
+    changed_keys = [key for key, net in key_counts.items() if net]
+    rows_now = dict.fromkeys(changed_keys, 0)
+    for start in range(0, len(changed_keys), _REFRESH_CHUNK):
+        chunk = changed_keys[start:start + _REFRESH_CHUNK]
+        rows_now.update(((host_id, port_number), count) for host_id, port_number, count in session.execute(
+            select(Port.host_id, Port.port_number, func.count())
+            .where(tuple_(Port.host_id, Port.port_number).in_(chunk))
+            .group_by(Port.host_id, Port.port_number)
+        ))
+    for key in changed_keys:
+        net = key_counts[key]
+        deltas[key[0]]['in_range'] += (rows_now[key] > 0) - (rows_now[key] - net > 0)
+
+    table = HostSummary.__table__
+    for host_id, delta in deltas.items():
+        values = {
+            table.c.port_count: table.c.port_count + delta['count'],
+            table.c.tcp_count: table.c.tcp_count + delta['tcp'],
+            table.c.udp_count: table.c.udp_count + delta['udp'],
+        }
+
+        grown_max = table.c.max_order
+        if delta['added_max'] is not None:
+            grown_max = case((or_(table.c.max_order.is_(None), table.c.max_order < delta['added_max']),
+                              delta['added_max']), else_=table.c.max_order)
+        if delta['removed_max'] is not None:
+            # Removing the highest order means looking up the next highest one
+            values[table.c.max_order] = case(
+                (table.c.max_order <= delta['removed_max'],
+                 select(func.max(Port.order)).where(Port.host_id == host_id).scalar_subquery()),
+                else_=grown_max)
+        elif delta['added_max'] is not None:
+            values[table.c.max_order] = grown_max
+
+        if delta['numbers']:
+            values[table.c.range_key] = None
+        elif delta['in_range']:
+            values[table.c.in_range_count] = case(
+                (table.c.range_key == _active_range.digest, table.c.in_range_count + delta['in_range']),
+                else_=table.c.in_range_count)
+
+        result = session.execute(table.update().where(table.c.host_id == host_id).values(values))
+        if result.rowcount == 0:
+            refresh([host_id], session)
+
+def refresh(host_ids, session=None):
+    """
+    Recompute the summaries of some hosts from the Port table.
+
+    The range usage is stored for the active port range, if this worker knows one.
+
+    Args:
+        host_ids (iterable): The hosts to recompute
+        session (Session): The session to use, the Flask-SQLAlchemy session by default
+    """
+    session = session or db.session
+    host_ids = list(host_ids)
+    if not host_ids:
+        return
+
+    table = HostSummary.__table__
+    for start in range(0, len(host_ids), _REFRESH_CHUNK):
+        chunk = host_ids[start:start + _REFRESH_CHUNK]
+        rows = {row.host_id: row for row in session.execute(_aggregate_query().where(Port.host_id.in_(chunk)))}
+        existing = set(session.execute(select(table.c.host_id).where(table.c.host_id.in_(chunk))).scalars())
+        in_range = _count_in_range_many(session, chunk, _active_range) if _active_range is not None else {}
+
+        updates, inserts = [], []
+        for host_id in chunk:
+            values = _summary_values(rows.get(host_id))
+            values['in_range_count'] = in_range.get(host_id, 0)
+            values['range_key'] = _active_range.digest if _active_range is not None else None
+            if host_id in existing:
+                updates.append({'summary_host_id': host_id, **values})
+            else:
+                inserts.append({'host_id': host_id, **values})
+
+        # One executemany per kind of statement instead of a statement per host
+        if updates:
+            session.execute(table.update().where(table.c.host_id == bindparam('summary_host_id')), updates)
+        if inserts:
+            session.execute(table.insert(), inserts)
+
+def remove(host_ids, session=None):
+    """Drop the summaries of hosts that are about to be deleted."""
+    session = session or db.session
+    table = HostSummary.__table__
+    if host_ids is None:
+        session.execute(table.delete())
+    else:
+        session.execute(table.delete().where(table.c.host_id.in_(list(host_ids))))
+
+def check_summaries(repair=False):
+    """
+    Compare every host summary with the Port table.
+
+    Port counts, per-protocol counts and the highest order are checked for every host,
+    and so is the range usage while this worker knows the active port range.
+
+    Args:
+        repair (bool): Recompute the summaries that don't match
+
+    Returns:
+        list: The ids of the hosts whose summary was missing or wrong
+    """
+    actual = {row.host_id: _summary_values(row) for row in db.session.execute(_aggregate_query())}
+    stored = {summary.host_id: summary for summary in HostSummary.query}
+    host_ids = [host_id for (host_id,) in db.session.query(Host.id)]
+    in_range = {}
+    if _active_range is not None:
+        for start in range(0, len(host_ids), _REFRESH_CHUNK):
+            in_range.update(_count_in_range_many(db.session, host_ids[start:start + _REFRESH_CHUNK], _active_range))
+
+    mismatched = []
+    for host_id in host_ids:
+        expected = actual.get(host_id) or _summary_values(None)
+        if _active_range is not None:
+            expected.update(in_range_count=in_range.get(host_id, 0), range_key=_active_range.digest)
+        summary = stored.pop(host_id, None)
+        if summary is None or any(getattr(summary, key) != value for key, value in expected.items()):
+            mismatched.append(host_id)
+
+    if repair:
+        refresh(mismatched)
+        if stored:
+            remove(stored)
+        db.session.commit()
+    return mismatched
+
+def _aggregate_query():
+    protocol = func.upper(Port.port_protocol)
+    return (select(Port.host_id,
+                   func.count().label('port_count'),
+                   func.sum(case((protocol == 'TCP', 1), else_=0)).label('tcp_count'),
+                   func.sum(case((protocol == 'UDP', 1), else_=0)).label('udp_count'),
+                   func.max(Port.order).label('max_order'))
+            .where(Port.host_id.isnot(None))
+            .group_by(Port.host_id))
+
+def _summary_values(row):
+    if row is None:
+        return {'port_count': 0, 'tcp_count': 0, 'udp_count': 0, 'max_order': None}
+    return {'port_count': row.port_count, 'tcp_count': int(row.tcp_count or 0),
+            'udp_count': int(row.udp_count or 0), 'max_order': row.max_order}
+
+def _count_in_range(session, host_id, port_range):
+    return _count_in_range_many(session, [host_id], port_range).get(host_id, 0)
+
+def _count_in_range_many(session, host_ids, port_range):
+    """Count the distinct port numbers inside a port range of several hosts, in one query."""
+    counts = {}
+    for host_id, number in session.execute(
+        select(Port.host_id, Port.port_number).distinct()
+        .where(Port.host_id.in_(host_ids), Port.port_number.between(port_range.start, port_range.end))
+    ):
+        if number in port_range:
+            counts[host_id] = counts.get(host_id, 0) + 1
+    return counts
+
+# Session Tracking
+
+def _track_summary_changes(session, flush_context):
+    """Apply the Port inserts, deletes and changes of this flush to the host summaries."""
+    changes = []
+
+    for obj in session.new:
+        if isinstance(obj, Port):
+            changes.append((1, obj.host_id, obj.port_number, obj.port_protocol, obj.order))
+
+    for obj in session.deleted:
+        if isinstance(obj, Port):
+            changes.append((-1, obj.host_id, obj.port_number, obj.port_protocol, obj.order))
+
+    for obj in session.dirty:
+        if not isinstance(obj, Port):
+            continue
+        state = inspect(obj)
+        old_values = []
+        changed = False
+        for name in ('host_id', 'port_number', 'port_protocol', 'order'):
+            history = state.attrs[name].history
+            changed = changed or history.has_changes()
+            old_values.append(history.deleted[0] if history.deleted else getattr(obj, name))
+        if changed:
+            changes.append((-1, *old_values))
+            changes.append((1, obj.host_id, obj.port_number, obj.port_protocol, obj.order))
+
+    if changes:
+        with session.no_autoflush:
+            apply_port_changes(session, changes)
+
+event.listen(Session, 'after_flush', _track_summary_changes)
@@ -0,0 +1,73 @@
+# utils/database/maintenance.py
+
+import os
+
+from sqlalchemy import text
+
+from .db import db
+
+# Rows deleted per transaction, so a large delete never holds the write lock for long
+DELETE_CHUNK_SIZE = int(os.environ.get('DELETE_CHUNK_SIZE', 500))
+
+def delete_in_chunks(model, *criteria, chunk_size=None):
+    """
+    Delete the rows of ``model`` matching ``criteria`` in bounded-size transactions.
+
+    Each chunk is found by looking up the id of its last row, then deleted with one
+    set-based DELETE and committed on its own, so other requests can write between
+    chunks. The delete as a whole is therefore not atomic; rows committed to the
+    selection after it starts are picked up by later chunks.
+
+    Args:
+        model (db.Model): The model to delete from
+        *criteria: Filter expressions selecting the rows to delete
+        chunk_size (int): Rows per transaction, DELETE_CHUNK_SIZE by default
+
+    Returns:
+        int: The number of rows deleted
+    """
+    chunk_size = chunk_size or DELETE_CHUNK_SIZE
+    total = 0
+    while True:
+        # Upper id bound of the next chunk, None once fewer rows than a chunk remain
+        bound = (db.session.query(model.id).filter(*criteria)
+                 .order_by(model.id).offset(chunk_size - 1).limit(1).scalar())
+
+        query = model.query.filter(*criteria)
+        if bound is not None:
+            query = query.filter(model.id <= bound)
+        deleted = query.delete(synchronize_session=False)
+        db.session.commit()
+
+        total += deleted
+        if bound is None or deleted == 0:
+            return total
+
+def reclaim_space(full=False):
+    """
+    Give the space of deleted rows back to the file system on SQLite.
+
+    Databases created with ``PRAGMA auto_vacuum = INCREMENTAL`` are shrunk with an
+    incremental vacuum, which only touches the free pages. Otherwise a full VACUUM,
+    which rewrites the whole file, only runs when ``full`` is set. Other database
+    backends manage their own space and are left alone.
+
+    Args:
+        full (bool): Run a full VACUUM if incremental vacuuming is not available
+
+    Returns:
+        str: 'incremental', 'full' or None, depending on what was run
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return None
+
+    # VACUUM can't run inside a transaction
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        auto_vacuum = conn.execute(text("PRAGMA auto_vacuum")).scalar()
+        if auto_vacuum == 2:
+            conn.execute(text("PRAGMA incremental_vacuum"))
+            return 'incremental'
+        if full:
+            conn.execute(text("VACUUM"))
+            return 'full'
+    return None
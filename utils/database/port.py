@@ -1,15 +1,32 @@
 # utils/database/port.py
 
 from .db import db
+from .host import Host
 
 class Port(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    ip_address = db.Column(db.String(15), nullable=False)
-    nickname = db.Column(db.String(50), nullable=True)
+    host_id = db.Column(db.Integer, db.ForeignKey('host.id'), nullable=False, index=True)
     port_number = db.Column(db.Integer, nullable=False)
     port_protocol = db.Column(db.String(3), nullable=False)
     description = db.Column(db.String(100), nullable=False)
     order = db.Column(db.Integer, default=0)
     docker_id = db.Column(db.String(20), nullable=True)
+    block_id = db.Column(db.String(32), nullable=True, index=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
 
-    __table_args__ = (db.UniqueConstraint('ip_address', 'port_number', 'port_protocol', name='_ip_port_protocol_uc'),)
\ No newline at end of file
+    host = db.relationship('Host', back_populates='ports')
+
+    __table_args__ = (db.UniqueConstraint('host_id', 'port_number', 'port_protocol', name='_host_port_protocol_uc'),)
+
+    @classmethod
+    def for_ip(cls, ip_address):
+        """Query the ports registered on an IP address."""
+        return cls.query.join(cls.host).filter(Host.ip_address == ip_address)
+
+    @property
+    def ip_address(self):
+        return self.host.ip_address
+
+    @property
+    def nickname(self):
+        return self.host.nickname
@@ -1,8 +1,164 @@
 # utils/database/setting.py
 
+import threading
+from itertools import chain
+
+from flask import g, has_request_context
+from sqlalchemy import Integer, String, case, cast, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
 from .db import db
 
+# Key of the row counting setting changes, bumped in the same transaction as every write
+REVISION_KEY = '_revision'
+
 class Setting(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(50), unique=True, nullable=False)
-    value = db.Column(db.String(100), nullable=False, default='')
\ No newline at end of file
+    value = db.Column(db.String(100), nullable=False, default='')
+
+    @classmethod
+    def get(cls, key, default=None):
+        """
+        Return the value of a setting from the in-process cache.
+
+        Args:
+            key (str): The setting key
+            default: Value to return if the setting doesn't exist
+
+        Returns:
+            str: The stored value, or ``default``
+        """
+        return _current_values().get(key, default)
+
+    @classmethod
+    def get_int(cls, key, default=0):
+        """Return a setting as an integer, or ``default`` if it is missing, empty or not a number."""
+        try:
+            return int(cls.get(key))
+        except (TypeError, ValueError):
+            return default
+
+    @classmethod
+    def get_bool(cls, key, default=False):
+        """Return a setting stored as 'True'/'False' as a boolean, or ``default`` if it is missing."""
+        value = cls.get(key)
+        return value.lower() == 'true' if value is not None else default
+
+    @classmethod
+    def get_many(cls, defaults):
+        """
+        Return several settings at once.
+
+        Args:
+            defaults (dict): Maps setting keys to the value to use if they don't exist
+
+        Returns:
+            dict: Maps every given key to its value
+        """
+        values = _current_values()
+        return {key: values.get(key, default) for key, default in defaults.items()}
+
+    @classmethod
+    def set_many(cls, values):
+        """
+        Write several settings with a single upsert statement.
+
+        On SQLite and PostgreSQL all keys, and the bump of the revision row, are written
+        by one ``INSERT ... ON CONFLICT DO UPDATE``, so concurrent saves can't fail on
+        the unique key or lose each other's rows. Other databases fall back to one
+        lookup per key. The caller commits.
+
+        Args:
+            values (dict): Maps setting keys to their new values
+        """
+        if not values:
+            return
+
+        dialect = db.session.get_bind().dialect.name
+        if dialect not in ('sqlite', 'postgresql'):
+            for key, value in values.items():
+                setting = cls.query.filter_by(key=key).first()
+                if setting:
+                    setting.value = value
+                else:
+                    db.session.add(cls(key=key, value=value))
+            return
+
+        table = cls.__table__
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        rows = [{'key': key, 'value': '' if value is None else str(value)} for key, value in values.items()]
+        rows.append({'key': REVISION_KEY, 'value': '1'})
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(index_elements=[table.c.key], set_={
+            'value': case((table.c.key == REVISION_KEY, cast(cast(table.c.value, Integer) + 1, String)),
+                          else_=stmt.excluded.value)
+        })
+        db.session.execute(stmt)
+        db.session.info['settings_changed'] = True
+
+    @classmethod
+    def set(cls, key, value):
+        """Write a single setting, see ``set_many``."""
+        cls.set_many({key: value})
+
+# In-process copy of every setting and the revision it was loaded at
+_values = None
+_revision = None
+_lock = threading.Lock()
+
+def _current_values():
+    """
+    Return the cached settings, reloading them if another worker changed them.
+
+    The revision row is compared once per request; later lookups in the same request
+    are served from memory without touching the database.
+    """
+    global _values, _revision
+    values = _values
+    if values is not None and has_request_context() and g.get('settings_values') is values:
+        return values
+
+    revision = db.session.query(Setting.value).filter_by(key=REVISION_KEY).scalar()
+    with _lock:
+        if _values is None or revision != _revision:
+            _values = {row.key: row.value for row in db.session.query(Setting.key, Setting.value)
+                       if row.key != REVISION_KEY}
+            _revision = revision
+        values = _values
+
+    if has_request_context():
+        g.settings_values = values
+    return values
+
+def invalidate_settings():
+    """Drop the cached settings so the next lookup reloads them."""
+    global _values
+    with _lock:
+        _values = None
+
+# Session Tracking
+
+def _bump_revision(session, flush_context):
+    """Count a setting change in the revision row, in the transaction that makes it."""
+    changed = any(isinstance(obj, Setting) and obj.key != REVISION_KEY
+                  for obj in chain(session.new, session.dirty, session.deleted))
+    if not changed:
+        return
+
+    session.info['settings_changed'] = True
+    table = Setting.__table__
+    with session.no_autoflush:
+        result = session.execute(table.update().where(table.c.key == REVISION_KEY)
+                                 .values(value=cast(cast(table.c.value, Integer) + 1, String)))
+        if result.rowcount == 0:
+            session.execute(table.insert().values(key=REVISION_KEY, value='1'))
+
+def _drop_changed_settings(session):
+    if session.info.pop('settings_changed', False):
+        invalidate_settings()
+
+event.listen(Session, 'after_flush', _bump_revision)
+event.listen(Session, 'after_commit', _drop_changed_settings)
+event.listen(Session, 'after_rollback', _drop_changed_settings)
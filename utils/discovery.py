@@ -0,0 +1,337 @@
+# utils/discovery.py
+
+# Standard Imports
+from array import array                         # For decoding addresses in bulk
+import logging                                  # For logging from the scheduler thread
+import os                                       # For reading /proc
+import socket                                   # For formatting addresses
+import sys                                      # For the byte order of /proc addresses
+
+# Local Imports
+from utils.database import db, Host, Port, Setting # For accessing the database models
+from utils.importer import import_entries       # For saving discovered ports in bulk
+from utils.scheduler import read_interval, schedule_job # For scheduling the reconciliation
+from utils.services import describe_port, service_name # For describing discovered ports
+
+# Root of the proc filesystem, e.g. /host/proc when the host's is mounted into a container
+PROC_ROOT = os.environ.get('PROC_ROOT', '/proc')
+
+# Socket tables: (file name, protocol, address family)
+_SOCKET_TABLES = (
+    ('tcp', 'TCP', socket.AF_INET),
+    ('tcp6', 'TCP', socket.AF_INET6),
+    ('udp', 'UDP', socket.AF_INET),
+    ('udp6', 'UDP', socket.AF_INET6),
+)
+# TCP_LISTEN, and TCP_CLOSE for UDP sockets that are bound but not connected
+_LISTEN_STATES = {'TCP': '0A', 'UDP': '07'}
+# Addresses are printed as 32-bit words in host byte order
+_WORD = 'I' if array('I').itemsize == 4 else 'L'
+_IPV4_MAPPED = b'\0' * 10 + b'\xff\xff'
+# Addresses that mean "every interface"
+_ANY_ADDRESS = ('0.0.0.0', '::')
+# Documentation addresses used to find the primary address; nothing is sent to them
+_ROUTE_PROBES = ((socket.AF_INET, '192.0.2.1'), (socket.AF_INET6, '2001:db8::1'))
+
+def read_listening_sockets(proc_root=None, processes=False):
+    """
+    Read the listening TCP and bound UDP sockets of the host from /proc/net.
+
+    Every table is read with a single read and split into lines, sockets in other states
+    are dropped by comparing the state field, and the hex addresses of the remaining ones
+    are decoded in bulk: the distinct addresses are joined, converted with one
+    ``bytes.fromhex`` and one byte swap, and sliced into addresses. IPv4-mapped IPv6
+    addresses are reported as IPv4. UDP sockets on ephemeral ports are client sockets and
+    are skipped.
+
+    Inside a container, /proc/net shows the container's own network namespace; run with
+    the host network or point PROC_ROOT at the host's /proc to see the host's sockets.
+
+    Args:
+        proc_root (str): The proc filesystem, PROC_ROOT by default
+        processes (bool): Find the process owning every socket by scanning
+                          ``/proc/<pid>/fd``, which requires the permission to read the
+                          file descriptors of other users' processes
+
+    Returns:
+        list: Dicts with 'ip', 'port', 'protocol', 'pid' and 'process', sorted by
+              protocol and port
+    """
+    proc_root = proc_root or PROC_ROOT
+    ephemeral = _ephemeral_ports(proc_root)
+    sockets = {}
+    inodes = {}
+
+    for table, protocol, family in _SOCKET_TABLES:
+        rows = _listening_rows(os.path.join(proc_root, 'net', table), _LISTEN_STATES[protocol])
+        addresses = _decode_addresses({address for address, _, _ in rows}, family)
+        for address, port, inode in rows:
+            if protocol == 'UDP' and port in ephemeral:
+                continue
+            key = (addresses[address], port, protocol)
+            if key not in sockets:
+                sockets[key] = {'ip': key[0], 'port': port, 'protocol': protocol, 'pid': None, 'process': None}
+                inodes.setdefault(inode, []).append(sockets[key])
+
+    if processes and inodes:
+        for inode, (pid, name) in _socket_owners(proc_root, inodes).items():
+            for found in inodes[inode]:
+                found['pid'], found['process'] = pid, name
+
+    return sorted(sockets.values(), key=lambda found: (found['protocol'], found['port'], found['ip']))
+
+def primary_address():
+    """
+    Return the address the host reaches other machines from, or None if it has none.
+
+    A UDP socket is connected to a documentation address, which picks the outgoing
+    interface without sending anything, and its local address is read back. Inside a
+    container without the host network this is the container's address, so set
+    LOCAL_DISCOVERY_HOST_IP there.
+
+    Returns:
+        str: The primary address, IPv4 if the host has one
+    """
+    for family, probe_address in _ROUTE_PROBES:
+        try:
+            with socket.socket(family, socket.SOCK_DGRAM) as probe:
+                probe.connect((probe_address, 9))
+                address = probe.getsockname()[0]
+        except OSError:
+            continue
+        if address not in _ANY_ADDRESS and not _is_loopback(address):
+            return address
+    return None
+
+def local_host_ip(requested=None):
+    """
+    Work out the IP to record ports listening on every interface under.
+
+    Looks at, in order: the IP given by the caller, the 'local_host_ip' setting, the
+    LOCAL_DISCOVERY_HOST_IP environment variable and the host's primary address.
+    Loopback addresses are never picked on their own, so that wildcard listeners aren't
+    filed under 127.0.0.1 where no other machine can reach them.
+
+    Args:
+        requested (str): The IP asked for, if any
+
+    Returns:
+        str: The IP, or None if none is configured and the primary address is unknown
+    """
+    return (requested or Setting.get('local_host_ip') or os.environ.get('LOCAL_DISCOVERY_HOST_IP')
+            or primary_address())
+
+def discover_local_ports(host_ip, proc_root=None, processes=False, loopback=False):
+    """
+    Discover the ports listening on the Portall host, in the shape of discovered Docker ports.
+
+    The process plays the part of the container: 'container_name' is the process name
+    and 'container_id' its PID, both None unless ``processes`` is set, and
+    'container_port' is the port with its protocol, e.g. '53/udp'. Ports listening on
+    every interface are reported for ``host_ip``, once for IPv4 and IPv6 together.
+
+    Args:
+        host_ip (str): The IP of the Portall host, for sockets listening on every interface
+        proc_root (str): The proc filesystem, PROC_ROOT by default
+        processes (bool): Attribute the ports to processes, see ``read_listening_sockets``
+        loopback (bool): Include sockets only reachable from the host itself
+
+    Returns:
+        list: Dicts with 'container_name', 'container_id', 'container_port', 'host_ip',
+              'host_port' and 'service', like ``discover_docker_ports``
+    """
+    discovered = {}
+    for found in read_listening_sockets(proc_root, processes):
+        ip_address = found['ip']
+        if ip_address in _ANY_ADDRESS:
+            ip_address = host_ip
+        elif _is_loopback(ip_address) and not loopback:
+            continue
+        key = (ip_address, found['port'], found['protocol'])
+        if key in discovered:
+            continue
+        discovered[key] = {
+            'container_name': found['process'],
+            'container_id': str(found['pid']) if found['pid'] is not None else None,
+            'container_port': f"{found['port']}/{found['protocol'].lower()}",
+            'host_ip': ip_address,
+            'host_port': str(found['port']),
+            'service': service_name(found['port'], found['protocol'])
+        }
+    return list(discovered.values())
+
+def reconcile_local_ports(host_ip, proc_root=None, processes=False):
+    """
+    Bring the Port table in line with the ports listening on the Portall host.
+
+    Listening ports that are missing are added in bulk, described by their process or
+    else their registered service. Recorded ports of the host's IP that nothing listens
+    on are only reported: they may belong to services that are merely stopped, or be
+    documented on purpose, so removing them is left to the user.
+
+    Args:
+        host_ip (str): The IP of the Portall host
+        proc_root (str): The proc filesystem, PROC_ROOT by default
+        processes (bool): Describe new ports by their process
+
+    Returns:
+        dict: 'added' and 'existing' port counts, and 'stale', the (port, protocol) pairs
+              recorded for ``host_ip`` that nothing listens on
+    """
+    discovered = discover_local_ports(host_ip, proc_root, processes)
+    entries = []
+    for found in discovered:
+        port, protocol = found['container_port'].split('/')
+        entries.append({
+            'ip': found['host_ip'],
+            'nickname': None,
+            'port': int(port),
+            'description': describe_port(found['container_name'], int(port), protocol.upper()),
+            'port_protocol': protocol.upper()
+        })
+    added, existing = import_entries(entries)
+
+    listening = {(entry['port'], entry['port_protocol']) for entry in entries if entry['ip'] == host_ip}
+    recorded = (db.session.query(Port.port_number, Port.port_protocol)
+                .join(Port.host).filter(Host.ip_address == host_ip).order_by(Port.port_number))
+    stale = [(number, protocol) for number, protocol in recorded if (number, protocol.upper()) not in listening]
+    return {'added': added, 'existing': existing, 'stale': stale}
+
+def init_local_discovery(app):
+    """
+    Schedule the reconciliation of the Port table with the ports listening on the host.
+
+    Configured with environment variables: LOCAL_DISCOVERY_INTERVAL (seconds, unset or 0
+    disables the job), LOCAL_DISCOVERY_HOST_IP (see ``local_host_ip``) and
+    LOCAL_DISCOVERY_PROCESSES ('true' to describe new ports by their process). Like the
+    routes of the local plugin, the job only does anything while the 'local_enabled'
+    setting is on. With several worker processes the job runs in one of them, see
+    ``schedule_job``.
+
+    Args:
+        app (Flask): The Flask application instance.
+    """
+    interval = read_interval('LOCAL_DISCOVERY_INTERVAL')
+    if interval <= 0:
+        return
+    processes = os.environ.get('LOCAL_DISCOVERY_PROCESSES', 'false').lower() == 'true'
+
+    def run_discovery():
+        if not Setting.get_bool('local_enabled'):
+            return
+        host_ip = local_host_ip()
+        if host_ip is None:
+            logging.error("Local discovery needs LOCAL_DISCOVERY_HOST_IP, the host has no primary address")
+            return
+        try:
+            result = reconcile_local_ports(host_ip, processes=processes)
+            if result['added']:
+                logging.info(f"Added {result['added']} listening ports of {host_ip}")
+            if result['stale']:
+                logging.info(f"{len(result['stale'])} recorded ports of {host_ip} are not listening")
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error reconciling local ports: {str(e)}")
+
+    schedule_job(app, 'reconcile_local_ports', run_discovery, interval)
+
+# /proc Parsing
+
+def _listening_rows(path, state):
+    """
+    Read the listening sockets of one /proc/net table.
+
+    Returns:
+        list: (hex address, port, inode) tuples
+    """
+    try:
+        with open(path) as table:
+            lines = table.read().splitlines()
+    except OSError:
+        # No IPv6 support, or /proc/net isn't available
+        return []
+
+    rows = []
+    for line in lines[1:]:
+        fields = line.split()
+        if len(fields) < 10 or fields[3] != state:
+            continue
+        address, _, port = fields[1].partition(':')
+        if state == '07' and not fields[2].endswith(':0000'):
+            # A connected UDP socket
+            continue
+        rows.append((address, int(port, 16), fields[9]))
+    return rows
+
+def _decode_addresses(hex_addresses, family):
+    """
+    Decode the hex addresses of a /proc/net table, all at once.
+
+    Returns:
+        dict: Maps every hex address to its text form, IPv4-mapped addresses as IPv4
+    """
+    hex_addresses = list(hex_addresses)
+    if not hex_addresses:
+        return {}
+    words = array(_WORD, bytes.fromhex(''.join(hex_addresses)))
+    if sys.byteorder == 'little':
+        words.byteswap()
+    packed = words.tobytes()
+
+    size = 4 if family == socket.AF_INET else 16
+    decoded = {}
+    for index, hex_address in enumerate(hex_addresses):
+        raw = packed[index * size:(index + 1) * size]
+        if size == 16 and raw.startswith(_IPV4_MAPPED):
+            decoded[hex_address] = socket.inet_ntop(socket.AF_INET, raw[12:])
+        else:
+            decoded[hex_address] = socket.inet_ntop(family, raw)
+    return decoded
+
+def _ephemeral_ports(proc_root):
+    try:
+        with open(os.path.join(proc_root, 'sys', 'net', 'ipv4', 'ip_local_port_range')) as setting:
+            low, high = (int(value) for value in setting.read().split())
+    except (OSError, ValueError):
+        return range(0)
+    return range(low, high + 1)
+
+def _socket_owners(proc_root, inodes):
+    """
+    Find the processes owning sockets, by the ``socket:[inode]`` links in /proc/<pid>/fd.
+
+    Processes whose file descriptors can't be read are skipped, and the scan stops once
+    every socket is found.
+
+    Returns:
+        dict: Maps socket inodes to (pid, process name) tuples
+    """
+    owners = {}
+    for pid in os.listdir(proc_root):
+        if not pid.isdigit():
+            continue
+        fd_dir = os.path.join(proc_root, pid, 'fd')
+        try:
+            descriptors = os.listdir(fd_dir)
+        except OSError:
+            continue
+        for descriptor in descriptors:
+            try:
+                target = os.readlink(os.path.join(fd_dir, descriptor))
+            except OSError:
+                continue
+            if target.startswith('socket:[') and target[8:-1] in inodes and target[8:-1] not in owners:
+                owners[target[8:-1]] = (int(pid), _process_name(proc_root, pid))
+        if len(owners) == len(inodes):
+            break
+    return owners
+
+def _process_name(proc_root, pid):
+    try:
+        with open(os.path.join(proc_root, pid, 'comm')) as comm:
+            return comm.read().strip() or None
+    except OSError:
+        return None
+
+def _is_loopback(ip_address):
+    return ip_address.startswith('127.') or ip_address == '::1'
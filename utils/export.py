@@ -0,0 +1,131 @@
+# utils/export.py
+
+# Standard Imports
+import csv                                      # For CSV exports
+import io                                       # For buffering CSV rows
+import json                                     # For JSON exports
+import os                                       # For the batch size setting
+import zlib                                     # For gzip compression
+
+# External Imports
+from sqlalchemy import select                   # For reading ports without ORM objects
+
+# Local Imports
+from utils.database import db, Host, Port       # For accessing the database models
+
+# Rows read per query while exporting
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+# Exported columns, in the order and with the names that import_json expects
+EXPORT_FIELDS = ('ip_address', 'nickname', 'port_number', 'description', 'port_protocol', 'order')
+
+# Format name: (mimetype, file extension)
+EXPORT_FORMATS = {
+    'json': ('application/json', 'json'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+def iter_port_batches(batch_size=None):
+    """
+    Read every port in batches, ordered by ID.
+
+    Each batch is a separate keyset query (``id > last seen id``), so no more than one
+    batch of rows is held in memory and no cursor stays open between batches.
+
+    Args:
+        batch_size (int): Rows per batch, EXPORT_BATCH_SIZE by default
+
+    Yields:
+        list: Dictionaries with the EXPORT_FIELDS of up to ``batch_size`` ports
+    """
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+    query = (select(Port.id, Host.ip_address, Host.nickname, Port.port_number, Port.description,
+                    Port.port_protocol, Port.order)
+             .join(Host, Port.host_id == Host.id)
+             .order_by(Port.id)
+             .limit(batch_size))
+    last_id = None
+    while True:
+        batch_query = query if last_id is None else query.where(Port.id > last_id)
+        rows = db.session.execute(batch_query).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield [{field: getattr(row, field) for field in EXPORT_FIELDS} for row in rows]
+        if len(rows) < batch_size:
+            return
+
+def encode_export(batches, export_format):
+    """
+    Encode batches of ports as consecutive text chunks of an export file.
+
+    The JSON format produces the same document as ``json.dumps(ports, indent=2)``.
+
+    Args:
+        batches (iterable): Lists of port dictionaries, see ``iter_port_batches``
+        export_format (str): 'json', 'ndjson' or 'csv'
+
+    Yields:
+        str: The next part of the file
+    """
+    if export_format == 'json':
+        first = True
+        for batch in batches:
+            items = ['  ' + json.dumps(item, indent=2).replace('\n', '\n  ') for item in batch]
+            if items:
+                yield ('[\n' if first else ',\n') + ',\n'.join(items)
+                first = False
+        yield '[]' if first else '\n]'
+
+    elif export_format == 'ndjson':
+        for batch in batches:
+            yield ''.join(json.dumps(item) + '\n' for item in batch)
+
+    elif export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        for batch in batches:
+            writer.writerows(batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+def gzip_chunks(chunks):
+    """
+    Compress a stream of byte chunks into a gzip file, chunk by chunk.
+
+    Args:
+        chunks (iterable): The uncompressed bytes
+
+    Yields:
+        bytes: The next part of the gzip file
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def stream_export(export_format, compress=False, batch_size=None):
+    """
+    Stream every port as an export file.
+
+    Args:
+        export_format (str): 'json', 'ndjson' or 'csv'
+        compress (bool): Gzip the file
+        batch_size (int): Rows read per query
+
+    Returns:
+        iterator: The parts of the file, as bytes
+    """
+    chunks = (text.encode('utf-8') for text in encode_export(iter_port_batches(batch_size), export_format) if text)
+    if compress:
+        chunks = gzip_chunks(chunks)
+    return chunks
@@ -0,0 +1,449 @@
+# utils/importer.py
+
+# Standard Imports
+from collections import deque                   # For the files being parsed by workers
+from concurrent.futures import ProcessPoolExecutor # For parsing files in parallel
+from concurrent.futures.process import BrokenProcessPool # For replacing a pool whose worker died
+import gzip                                     # For compressed uploads
+import io                                       # For reading uploads as text
+import json                                     # For parsing JSON incrementally
+import multiprocessing                          # For starting the parser workers
+import os                                       # For the batch size setting
+from itertools import chain, islice             # For reading entries in batches
+import tarfile                                  # For uploaded configuration tarballs
+import threading                                # For creating the shared parser pool once
+import zipfile                                  # For uploaded configuration zip files
+import zlib                                     # For corrupt compressed uploads
+
+# External Imports
+from sqlalchemy import insert                   # For bulk inserts
+from sqlalchemy import select                   # For loading existing keys
+from sqlalchemy.dialects import postgresql, sqlite # For INSERT ... ON CONFLICT DO NOTHING
+
+# Local Imports
+from utils.allocation import port_index         # For the free-port index
+from utils.database import db, Host, HostSummary, Port # For accessing the database models
+from utils.database import host_summary         # For maintaining the per-host aggregates
+from utils.ordering import next_order           # For sparse order keys
+
+# Entries processed per round of lookups and inserts
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 5000))
+
+# Host IDs per query when loading existing keys
+_KEY_QUERY_CHUNK = 500
+
+# Worker processes parsing configuration files in parallel, shared by all imports
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Imports with fewer files are parsed in the calling process, starting workers costs more
+_PARALLEL_MIN_FILES = 16
+
+# The parser pool, created on first use
+_executor = None
+_executor_lock = threading.Lock()
+
+# Characters read at a time when parsing a JSON array incrementally
+_JSON_READ_SIZE = 64 * 1024
+
+# File names of uploads that are archives of configuration files
+_TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+class PortImporter:
+    """
+    Saves imported entries with a few set-based statements per batch.
+
+    Existing (host, port, protocol) keys are loaded once per host and checked in memory,
+    duplicates within the import are skipped the same way, and new rows are written with
+    one bulk ``INSERT ... ON CONFLICT DO NOTHING``, so a row committed concurrently by
+    another request is skipped instead of failing the import. Every entry is a dict
+    with 'ip', 'nickname', 'port', 'description' and 'port_protocol'.
+
+    Nothing is committed until ``finish``, so an import is applied as a whole.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or IMPORT_BATCH_SIZE
+        self.added = 0
+        self.skipped = 0
+        self._hosts = {}
+        self._keys = set()
+        self._orders = {}
+
+    def add(self, entries):
+        """
+        Import entries from any iterable, reading at most one batch at a time.
+
+        Args:
+            entries (iterable): The entries to import
+        """
+        entries = iter(entries)
+        while True:
+            batch = list(islice(entries, self.batch_size))
+            if not batch:
+                return
+            self._add_batch(batch)
+
+    def finish(self):
+        """
+        Recompute the summaries of the affected hosts and commit the import.
+
+        Returns:
+            tuple: (added, skipped) entry counts
+        """
+        host_ids = [host.id for host in self._hosts.values()]
+        host_summary.refresh(host_ids)
+        db.session.commit()
+
+        # The bulk insert bypasses the session, so reload the imported IPs on next use
+        for ip_address in self._hosts:
+            port_index.invalidate(ip_address)
+        return self.added, self.skipped
+
+    def _add_batch(self, batch):
+        self._load_hosts(batch)
+
+        rows = []
+        for item in batch:
+            host = self._hosts[item['ip']]
+            protocol = (item.get('port_protocol') or 'TCP').upper()
+            key = (host.id, int(item['port']), protocol)
+            if key in self._keys:
+                self.skipped += 1
+                continue
+            self._keys.add(key)
+            self._orders[host.id] = next_order(self._orders[host.id])
+            rows.append({
+                'host_id': host.id,
+                'port_number': key[1],
+                'description': item.get('description') or '',
+                'port_protocol': protocol,
+                'order': self._orders[host.id]
+            })
+
+        inserted = _insert_ignoring_duplicates(rows) if rows else 0
+        self.added += inserted
+        self.skipped += len(rows) - inserted
+
+    def _load_hosts(self, batch):
+        """Create the new hosts of a batch and load the keys and highest order of every new one."""
+        nicknames = {}
+        for item in batch:
+            if item['ip'] not in self._hosts and not nicknames.get(item['ip']):
+                nicknames[item['ip']] = item.get('nickname')
+        if not nicknames:
+            return
+
+        hosts = Host.get_or_create_many(nicknames)
+        self._hosts.update(hosts)
+        host_ids = [host.id for host in hosts.values()]
+        self._orders.update(HostSummary.highest_orders(host_ids))
+        for start in range(0, len(host_ids), _KEY_QUERY_CHUNK):
+            chunk = host_ids[start:start + _KEY_QUERY_CHUNK]
+            self._keys.update(db.session.execute(
+                select(Port.host_id, Port.port_number, Port.port_protocol).where(Port.host_id.in_(chunk))
+            ).tuples())
+
+def import_entries(entries, batch_size=None):
+    """
+    Import entries and commit them, see ``PortImporter``.
+
+    Args:
+        entries (iterable): Dicts with 'ip', 'nickname', 'port', 'description' and 'port_protocol'
+        batch_size (int): Entries per batch, IMPORT_BATCH_SIZE by default
+
+    Returns:
+        tuple: (added, skipped) entry counts
+    """
+    importer = PortImporter(batch_size)
+    importer.add(entries)
+    return importer.finish()
+
+def _insert_ignoring_duplicates(rows):
+    """
+    Insert Port rows, skipping the ones whose key already exists.
+
+    Returns:
+        int: The number of rows inserted
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        db.session.execute(insert(Port), rows)
+        return len(rows)
+
+    stmt = (sqlite.insert if dialect == 'sqlite' else postgresql.insert)(Port)
+    stmt = stmt.on_conflict_do_nothing(index_elements=['host_id', 'port_number', 'port_protocol'])
+    return len(db.session.execute(stmt.returning(Port.id), rows).all())
+
+# Upload Parsing
+
+def open_upload(upload):
+    """
+    Open an uploaded file for reading as text, decompressing it if it is gzipped.
+
+    The upload is read straight from the spooled file Werkzeug saved it to, so the
+    whole file never has to be held in memory.
+
+    Args:
+        upload (FileStorage): The uploaded file
+
+    Returns:
+        TextIO: The text of the file
+    """
+    stream = upload.stream
+    if hasattr(stream, 'peek'):
+        magic = stream.peek(2)[:2]
+    else:
+        magic = stream.read(2)
+        stream.seek(0)
+    if magic == b'\x1f\x8b' or (upload.filename or '').endswith('.gz'):
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline=None)
+
+def as_text_stream(content):
+    """Return a text stream for either an uploaded stream or a string of file content."""
+    if isinstance(content, str):
+        return io.StringIO(content)
+    return content
+
+def iter_json_array(content):
+    """
+    Parse a JSON array one element at a time.
+
+    Only the element being parsed and the unread part of the current read are held in
+    memory. A document that is not an array is read as a sequence of JSON values
+    separated by whitespace, which covers NDJSON.
+
+    Args:
+        content (str|TextIO): The JSON text or a stream of it
+
+    Yields:
+        The elements of the array
+
+    Raises:
+        ValueError: If the JSON is invalid
+    """
+    stream = as_text_stream(content)
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = stream.read(_JSON_READ_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        eof = not chunk
+
+    def skip_whitespace():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            fill()
+
+    def next_value():
+        nonlocal position
+        # Read more until the value is complete; a value ending at the end of the
+        # buffer might continue in the next read (e.g. a number)
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                if end < len(buffer) or eof:
+                    position = end
+                    return value
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f"Invalid JSON format: {e.msg}")
+            fill()
+
+    skip_whitespace()
+    if position == len(buffer):
+        return
+
+    if buffer[position] != '[':
+        while position < len(buffer):
+            yield next_value()
+            skip_whitespace()
+        return
+
+    position += 1
+    first = True
+    while True:
+        skip_whitespace()
+        if position == len(buffer):
+            raise ValueError("Invalid JSON format: unexpected end of array")
+        if buffer[position] == ']':
+            return
+        if not first:
+            if buffer[position] != ',':
+                raise ValueError(f"Invalid JSON format: expected ',' or ']' at '{buffer[position]}'")
+            position += 1
+            skip_whitespace()
+        first = False
+        yield next_value()
+
+def iter_ndjson(content):
+    """
+    Parse newline-delimited JSON, one value per line.
+
+    Args:
+        content (str|TextIO): The NDJSON text or a stream of it
+
+    Yields:
+        The value of every non-empty line
+
+    Raises:
+        ValueError: If a line is not valid JSON
+    """
+    for number, line in enumerate(as_text_stream(content), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {number}: {e.msg}")
+
+def iter_upload_files(uploads):
+    """
+    Read uploaded configuration files, unpacking tarballs and zip files.
+
+    A directory such as ``conf.d`` can be uploaded as its files, as a tarball
+    (optionally compressed) or as a zip file. Tarballs are read in a single pass in
+    the order of their members. Hidden files, such as editor backups and macOS
+    metadata, are skipped.
+
+    Args:
+        uploads (list): The uploaded files
+
+    Yields:
+        tuple: (name, text) of every configuration file
+
+    Raises:
+        ValueError: If an archive is corrupt
+    """
+    for upload in uploads:
+        filename = upload.filename or ''
+        try:
+            if _is_tarball(upload):
+                with tarfile.open(fileobj=upload.stream, mode='r:*') as archive:
+                    for member in archive:
+                        if member.isfile() and not _is_hidden(member.name):
+                            yield member.name, _decode(archive.extractfile(member).read())
+            elif _is_zip(upload):
+                with zipfile.ZipFile(upload.stream) as archive:
+                    for info in archive.infolist():
+                        if not info.is_dir() and not _is_hidden(info.filename):
+                            yield info.filename, _decode(archive.read(info))
+            else:
+                yield filename, open_upload(upload).read()
+        except (tarfile.TarError, zipfile.BadZipFile, EOFError, zlib.error) as e:
+            raise ValueError(f"{filename}: invalid archive: {e}")
+
+def _is_tarball(upload):
+    if (upload.filename or '').lower().endswith(_TAR_SUFFIXES):
+        return True
+    # Gzipped tarballs with another name are recognized by the ustar magic of their first header
+    stream = upload.stream
+    position = stream.tell()
+    header = stream.read(512)
+    if header[:2] == b'\x1f\x8b':
+        stream.seek(position)
+        with gzip.GzipFile(fileobj=stream, mode='rb') as decompressed:
+            try:
+                header = decompressed.read(512)
+            except (OSError, EOFError, zlib.error):
+                header = b''
+    stream.seek(position)
+    return header[257:262] == b'ustar'
+
+def _is_zip(upload):
+    stream = upload.stream
+    position = stream.tell()
+    magic = stream.read(4)
+    stream.seek(position)
+    return magic == b'PK\x03\x04'
+
+def _is_hidden(path):
+    return any(part.startswith('.') and part not in ('.', '..') for part in path.split('/'))
+
+def _decode(content):
+    return content.decode('utf-8-sig', errors='replace')
+
+# Parallel Parsing
+
+def parse_files(parser, files, workers=None):
+    """
+    Parse configuration files on the shared pool of worker processes.
+
+    Files are handed to the workers as they are read, with at most two per worker
+    waiting, and their entries are yielded in file order, so the entries of the first
+    files are saved while later ones are still being read and parsed. Imports of fewer
+    than ``_PARALLEL_MIN_FILES`` files are parsed in the calling process.
+
+    Args:
+        parser (callable): A module-level function called with the text and name of a
+                           file, returning its entries
+        files (iterable): (name, text) tuples, see ``iter_upload_files``
+        workers (int): Files parsed at once, IMPORT_WORKERS by default
+
+    Yields:
+        dict: The entries of every file
+
+    Raises:
+        ValueError: If a file can't be parsed
+    """
+    workers = workers or IMPORT_WORKERS
+    files = iter(files)
+    first = list(islice(files, _PARALLEL_MIN_FILES))
+    if len(first) < _PARALLEL_MIN_FILES or workers < 2:
+        for name, text in chain(first, files):
+            yield from parser(text, name)
+        return
+
+    executor = _get_executor()
+    pending = deque()
+    try:
+        for name, text in chain(first, files):
+            pending.append(executor.submit(_parse_file, parser, name, text))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+
+def _get_executor():
+    """
+    Return the shared parser pool, creating it on first use.
+
+    The app runs request threads and the scheduler, and forking a threaded process can
+    leave locks held in the child, so workers are started by a forkserver, or spawned
+    where there is none. They stay up between imports.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _executor = ProcessPoolExecutor(max_workers=IMPORT_WORKERS,
+                                            mp_context=multiprocessing.get_context(start_method))
+        return _executor
+
+def _discard_executor(executor):
+    """Drop a pool whose worker died, the next import starts a new one."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+def _parse_file(parser, name, text):
+    """Parse one file in a worker process."""
+    return list(parser(text, name))
@@ -0,0 +1,9 @@
+# utils/importers/__init__.py
+
+from .caddy import iter_caddy_entries
+from .compose import ComposeError, iter_compose_entries, load_services, parse_port_spec
+from .nginx import iter_nginx_entries
+from .nmap import iter_nmap_entries
+from .traefik import iter_traefik_entries
+__all__ = ['iter_caddy_entries', 'ComposeError', 'iter_compose_entries', 'load_services', 'parse_port_spec',
+           'iter_nginx_entries', 'iter_nmap_entries', 'iter_traefik_entries']
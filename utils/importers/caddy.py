@@ -0,0 +1,307 @@
+# utils/importers/caddy.py
+
+# Standard Imports
+import io                                       # For reading strings as streams
+import re                                       # For tokenizing lines
+
+# Local Imports
+from utils.services import describe_port        # For describing upstreams without a site name
+from .quoting import open_quote                 # For quoted tokens spanning lines
+
+# Quoted tokens, backtick tokens and bare tokens
+_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|`[^`]*`|\S+')
+# {$VAR} and {$VAR:default} environment placeholders
+_ENV = re.compile(r'\{\$([A-Za-z_][A-Za-z0-9_]*)(?::([^}]*))?\}')
+# Snippet arguments: {args[0]}, {args.0} and {args[:]}
+_ARGS = re.compile(r'\{args(?:\[(\d+|:)\]|\.(\d+))\}')
+# Upstream schemes that proxy to a TCP port
+_SCHEMES = {'': 80, 'http': 80, 'h2c': 80, 'https': 443}
+
+def iter_caddy_entries(content, environment=None):
+    """
+    Extract the reverse proxy upstreams of a Caddyfile as import entries.
+
+    The file is tokenized and parsed in a single pass, reading it line by line, so
+    entries are produced while the rest of the file is still being read. Supported are
+    site blocks with address lists, nested blocks (``handle``, ``route``, matchers, ...),
+    snippets and ``import`` of snippets with arguments, ``reverse_proxy`` with several
+    upstreams and ``to`` subdirectives, upstream schemes, IPv6 and port ranges,
+    environment placeholders, line continuations, quotes and heredocs. Snippets must
+    be defined before they are imported; file imports can't be followed and are skipped.
+
+    Args:
+        content (str|TextIO): The Caddyfile, or a stream of it
+        environment (dict): Values of ``{$VAR}`` placeholders, unset ones use their default
+
+    Yields:
+        dict: The port information of each upstream, described by the site's first address
+    """
+    lines = _logical_lines(io.StringIO(content) if isinstance(content, str) else content, environment or {})
+    snippets = {}
+    first = True
+
+    for line in lines:
+        if line == ['}']:
+            continue
+
+        if line[-1] == '{':
+            head = line[:-1]
+            if not head and first:
+                # Global options
+                _skip_block(lines)
+            elif len(head) == 1 and head[0].startswith('(') and head[0].endswith(')'):
+                snippets[head[0][1:-1]] = _collect_block(lines)
+            else:
+                yield from _site(_addresses(head), lines, snippets)
+            first = False
+            continue
+
+        if line[0] == 'import':
+            # Top-level imports of snippets can define whole sites
+            yield from _site(None, _expand_import(line, snippets), snippets)
+            continue
+
+        if line[0] == 'reverse_proxy':
+            # Not valid Caddy, but fragments pasted without their site are still imported
+            yield from _directive(line, lines, None, snippets)
+            continue
+
+        # A Caddyfile with a single site may leave out the braces
+        yield from _site(_addresses(line), lines, snippets)
+        return
+
+def _site(addresses, lines, snippets):
+    """Parse the body of a site, up to its closing brace or the end of ``lines``."""
+    label = _site_label(addresses)
+    for line in lines:
+        if line == ['}']:
+            return
+        yield from _directive(line, lines, label, snippets)
+
+def _directive(line, lines, label, snippets):
+    """Handle one directive of a site or nested block, consuming its block if it has one."""
+    name = line[0]
+    opens_block = line[-1] == '{'
+    arguments = line[1:-1] if opens_block else line[1:]
+
+    if name == 'import':
+        for imported in _nested(_expand_import(line, snippets)):
+            yield from _directive(imported[0], imported[1], label, snippets)
+        return
+
+    if name == 'reverse_proxy':
+        upstreams = [token for token in arguments if not _is_matcher(token)]
+        if opens_block:
+            for sub in _block_lines(lines):
+                if sub[0] == 'to':
+                    upstreams.extend(token for token in sub[1:] if token != '{')
+                if sub[-1] == '{':
+                    _skip_block(lines)
+        for upstream in upstreams:
+            for host, port in _parse_upstream(upstream):
+                yield {
+                    'ip': host,
+                    'nickname': None,
+                    'port': port,
+                    'description': describe_port(label, port, 'TCP'),
+                    'port_protocol': 'TCP'
+                }
+        return
+
+    if opens_block:
+        # handle, route, matcher definitions and other blocks may contain proxies
+        for sub in _block_lines(lines):
+            yield from _directive(sub, lines, label, snippets)
+
+def _nested(lines):
+    """Pair every line of a finite line iterator with the iterator, for directives with blocks."""
+    for line in lines:
+        if line != ['}']:
+            yield line, lines
+
+def _block_lines(lines):
+    """Yield the lines of a block up to, and consuming, its closing brace."""
+    for line in lines:
+        if line == ['}']:
+            return
+        yield line
+
+def _skip_block(lines):
+    depth = 1
+    for line in lines:
+        if line == ['}']:
+            depth -= 1
+            if depth == 0:
+                return
+        elif line[-1] == '{':
+            depth += 1
+
+def _collect_block(lines):
+    """Return the lines of a block, for snippets that are expanded later."""
+    collected = []
+    depth = 1
+    for line in lines:
+        if line == ['}']:
+            depth -= 1
+            if depth == 0:
+                break
+        elif line[-1] == '{':
+            depth += 1
+        collected.append(line)
+    return collected
+
+def _expand_import(line, snippets):
+    """Return an iterator over the lines of an imported snippet, with its arguments filled in."""
+    arguments = line[1:]
+    snippet = snippets.get(arguments[0]) if arguments else None
+    if snippet is None:
+        return iter(())
+    values = arguments[1:]
+
+    def substitute(match):
+        index = match.group(1) if match.group(1) is not None else match.group(2)
+        if index == ':':
+            return ' '.join(values)
+        return values[int(index)] if int(index) < len(values) else ''
+
+    return iter([[_ARGS.sub(substitute, token) for token in snippet_line] for snippet_line in snippet])
+
+def _addresses(tokens):
+    """Split the tokens of a site block header into addresses."""
+    return [address for token in tokens for address in token.split(',') if address]
+
+def _site_label(addresses):
+    if not addresses:
+        return None
+    label = addresses[0]
+    for scheme in ('http://', 'https://'):
+        if label.startswith(scheme):
+            label = label[len(scheme):]
+    return label
+
+def _is_matcher(token):
+    return token.startswith('@') or token.startswith('/') or token == '*'
+
+def _parse_upstream(token):
+    """
+    Parse a reverse proxy upstream.
+
+    Returns:
+        list: (host, port) tuples, several for port ranges, none for placeholders,
+              Unix sockets and unsupported schemes
+    """
+    if token.startswith('{') or token.startswith('unix/'):
+        return []
+    scheme, separator, address = token.partition('://')
+    if not separator:
+        scheme, address = '', token
+    scheme = scheme.lower()
+    if scheme not in _SCHEMES:
+        return []
+    address = address.split('/', 1)[0]
+
+    if address.startswith('['):
+        host, _, rest = address[1:].partition(']')
+        port = rest[1:] if rest.startswith(':') else ''
+    elif address.count(':') == 1:
+        host, port = address.split(':')
+    elif ':' in address:
+        # Unbracketed IPv6 can't carry a port
+        host, port = address, ''
+    else:
+        host, port = address, ''
+
+    if not host or '{' in host:
+        return []
+    if not port:
+        return [(host, _SCHEMES[scheme])]
+    low, _, high = port.partition('-')
+    if not low.isdigit() or not (high or low).isdigit():
+        return []
+    low, high = int(low), int(high or low)
+    if not 0 < low <= high <= 65535:
+        return []
+    return [(host, number) for number in range(low, high + 1)]
+
+# Tokenizing
+
+def _logical_lines(stream, environment):
+    """
+    Tokenize a Caddyfile into lines of tokens.
+
+    Braces that open or close blocks become tokens of their own, an opening brace
+    always ends a line and a closing brace is always a line by itself.
+
+    Yields:
+        list: The tokens of the next line
+    """
+    for tokens in _physical_lines(stream, environment):
+        current = []
+        for token in tokens:
+            if token == '{':
+                current.append(token)
+                yield current
+                current = []
+            elif token == '}':
+                if current:
+                    yield current
+                    current = []
+                yield ['}']
+            else:
+                current.append(token)
+        if current:
+            yield current
+
+def _physical_lines(stream, environment):
+    """Yield the tokens of every non-empty line, joining continued and multi-line tokens."""
+    pending = ''
+    for raw_line in stream:
+        line = pending + raw_line
+        pending = ''
+
+        # Backslash line continuations and quotes spanning lines are read to the end
+        stripped = line.rstrip('\r\n')
+        if stripped.endswith('\\') and not stripped.endswith('\\\\'):
+            pending = stripped[:-1] + ' '
+            continue
+        if open_quote(line, '"`', escapable='"'):
+            pending = line
+            continue
+
+        tokens = []
+        heredoc = None
+        for match in _TOKEN.finditer(line):
+            token = match.group(0)
+            if token.startswith('#'):
+                break
+            if token.startswith('<<') and len(token) > 2:
+                heredoc = token[2:]
+                break
+            tokens.append(_unquote(token, environment))
+
+        if heredoc is not None:
+            text = []
+            for heredoc_line in stream:
+                if heredoc_line.strip() == heredoc:
+                    break
+                text.append(heredoc_line)
+            tokens.append(''.join(text))
+
+        if tokens:
+            yield tokens
+
+    if pending.strip():
+        tokens = [_unquote(match.group(0), environment) for match in _TOKEN.finditer(pending)]
+        if tokens:
+            yield tokens
+
+def _unquote(token, environment):
+    def substitute(match):
+        value = environment.get(match.group(1))
+        return value if value is not None else (match.group(2) or '')
+
+    if token[:1] == '"' and token[-1:] == '"' and len(token) > 1:
+        return _ENV.sub(substitute, re.sub(r'\\(.)', r'\1', token[1:-1]))
+    if token[:1] == '`' and token[-1:] == '`' and len(token) > 1:
+        return token[1:-1]
+    return _ENV.sub(substitute, token)
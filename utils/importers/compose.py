@@ -0,0 +1,207 @@
+# utils/importers/compose.py
+
+# Standard Imports
+import re                                       # For interpolation and port specs
+
+# External Imports
+import yaml                                     # For parsing Compose files
+
+# The C loader is much faster on large files, fall back to the pure Python one
+_BaseLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+class ComposeLoader(_BaseLoader):
+    """
+    Safe YAML loader that reads ``22:22`` as a string.
+
+    YAML 1.1 reads unquoted ``HOST:CONTAINER`` pairs whose parts are below 60 as
+    base-60 integers, which silently turns short-syntax port mappings into
+    unrelated numbers. Compose itself treats them as strings.
+    """
+
+ComposeLoader.yaml_implicit_resolvers = {
+    first: [(tag, regexp) for tag, regexp in resolvers
+            if tag not in ('tag:yaml.org,2002:int', 'tag:yaml.org,2002:float')]
+    for first, resolvers in _BaseLoader.yaml_implicit_resolvers.items()
+}
+ComposeLoader.add_implicit_resolver(
+    'tag:yaml.org,2002:int',
+    re.compile(r'^(?:[-+]?0b[0-1_]+|[-+]?0[0-7_]+|[-+]?(?:0|[1-9][0-9_]*)|[-+]?0x[0-9a-fA-F_]+)$'),
+    list('-+0123456789'))
+ComposeLoader.add_implicit_resolver(
+    'tag:yaml.org,2002:float',
+    re.compile(r'^(?:[-+]?(?:[0-9][0-9_]*)\.[0-9_]*(?:[eE][-+][0-9]+)?|\.[0-9_]+(?:[eE][-+][0-9]+)?'
+               r'|[-+]?\.(?:inf|Inf|INF)|\.(?:nan|NaN|NAN))$'),
+    list('-+0123456789.'))
+
+# ${VAR}, ${VAR:-default}, ${VAR-default}, ${VAR:?error}, ${VAR?error}, $VAR and the $$ escape
+_VARIABLE = re.compile(r'\$(?:(?P<escaped>\$)|\{(?P<braced>[A-Za-z_][A-Za-z0-9_]*)(?P<operator>:?[-?+])?(?P<argument>[^}]*)\}'
+                       r'|(?P<named>[A-Za-z_][A-Za-z0-9_]*))')
+
+# [HOST_IP:][HOST_PORT[-END]:]CONTAINER_PORT[-END][/PROTOCOL], the host IP may be bracketed IPv6
+_PORT_SPEC = re.compile(r'^(?:(?:\[(?P<ip6>[^\]]+)\]|(?P<ip>[^:\[\]]*)):(?=[^:]*:))?'
+                        r'(?:(?P<host>\d*(?:-\d+)?):)?(?P<container>\d+(?:-\d+)?)(?:/(?P<protocol>\w+))?$')
+
+# Host IPs that mean "every interface", reported as the default IP instead
+_ANY_ADDRESS = ('', '0.0.0.0', '::')
+
+class ComposeError(ValueError):
+    """Raised for Compose files that can't be imported."""
+
+def load_services(contents, names=None):
+    """
+    Load and merge the services of one or more Compose files.
+
+    Files are merged in order like ``docker compose -f first -f second``. Later files
+    override the settings of a service and add to its ``ports``. A file containing
+    several YAML documents is treated as several files.
+
+    Args:
+        contents (list): The files, as strings or text streams
+        names (list): The file names, for error messages
+
+    Returns:
+        dict: Maps service names to their merged definitions
+
+    Raises:
+        ComposeError: If a file is not valid YAML or not a Compose file
+    """
+    services = {}
+    for index, content in enumerate(contents):
+        label = names[index] if names and index < len(names) else f"Compose file {index + 1}"
+        try:
+            documents = list(yaml.load_all(content, Loader=ComposeLoader))
+        except yaml.YAMLError as e:
+            raise ComposeError(f"{label}: invalid YAML: {e}")
+        for document in documents:
+            if document is None:
+                continue
+            if not isinstance(document, dict):
+                raise ComposeError(f"{label}: a Compose file must be a mapping")
+            file_services = document.get('services') or {}
+            if not isinstance(file_services, dict):
+                raise ComposeError(f"{label}: 'services' must be a mapping of service names to services")
+            for name, service in file_services.items():
+                if service is None:
+                    continue
+                if not isinstance(service, dict):
+                    raise ComposeError(f"{label}: service '{name}' must be a mapping")
+                service_ports = service.get('ports') or []
+                if not isinstance(service_ports, list):
+                    raise ComposeError(f"{label}: 'ports' of service '{name}' must be a list")
+                merged = services.setdefault(name, {})
+                ports = merged.get('ports', []) + [port for port in service_ports
+                                                   if port not in merged.get('ports', [])]
+                merged.update(service)
+                merged['ports'] = ports
+    return services
+
+def interpolate(value, environment):
+    """
+    Substitute Compose variables in a string.
+
+    Args:
+        value (str): The value to interpolate
+        environment (dict): The variables; unset variables without a default are empty
+
+    Returns:
+        str: The interpolated value
+    """
+    def substitute(match):
+        if match.group('escaped'):
+            return '$'
+        name = match.group('braced') or match.group('named')
+        operator = match.group('operator') or ''
+        current = environment.get(name)
+        if operator in (':-', '-'):
+            unset = current is None or (operator == ':-' and current == '')
+            return match.group('argument') if unset else current
+        if operator in (':+', '+'):
+            is_set = current is not None and (operator == '+' or current != '')
+            return match.group('argument') if is_set else ''
+        return current or ''
+
+    return _VARIABLE.sub(substitute, value) if '$' in value else value
+
+def parse_port_spec(spec, environment=None):
+    """
+    Parse one entry of a service's ``ports``, in short or long syntax.
+
+    Host port ranges are expanded against container ranges of the same length. Entries
+    without a published host port, and a host range mapped to a single container port
+    (where Docker picks one port of the range), publish no fixed port and are skipped.
+
+    Args:
+        spec (str|int|dict): The ports entry
+        environment (dict): Variables for interpolation
+
+    Returns:
+        list: (host_ip, host_port, container_port, protocol) tuples
+    """
+    environment = environment or {}
+
+    if isinstance(spec, dict):
+        published = interpolate(str(spec.get('published') or ''), environment)
+        target = interpolate(str(spec.get('target') or ''), environment)
+        host_ip = interpolate(str(spec.get('host_ip') or ''), environment)
+        protocol = interpolate(str(spec.get('protocol') or 'tcp'), environment)
+        if not published or not target:
+            return []
+        return _expand(host_ip, published, target, protocol)
+
+    match = _PORT_SPEC.match(interpolate(str(spec).strip(), environment))
+    if not match or not match.group('host'):
+        return []
+    host_ip = match.group('ip6') or match.group('ip') or ''
+    return _expand(host_ip, match.group('host'), match.group('container'), match.group('protocol') or 'tcp')
+
+def iter_compose_entries(contents, environment=None, default_ip='127.0.0.1', names=None):
+    """
+    Extract the published ports of one or more Compose files as import entries.
+
+    Args:
+        contents (list): The Compose files, as strings or text streams
+        environment (dict): Variables for interpolation
+        default_ip (str): IP address for ports published on every interface
+        names (list): The file names, for error messages
+
+    Yields:
+        dict: The port information of each published port
+
+    Raises:
+        ComposeError: If a file is not valid YAML or not a Compose file
+    """
+    environment = environment or {}
+    for name, service in load_services(contents, names).items():
+        image = interpolate(str(service.get('image') or ''), environment)
+        description = image.split('/')[-1].split(':')[0] if image else name
+        for spec in service['ports']:
+            for host_ip, host_port, _, protocol in parse_port_spec(spec, environment):
+                yield {
+                    'ip': default_ip if host_ip in _ANY_ADDRESS else host_ip,
+                    'nickname': None,
+                    'port': host_port,
+                    'description': description,
+                    'port_protocol': protocol
+                }
+
+def _expand(host_ip, published, target, protocol):
+    """Expand a published port or range against a target port or range."""
+    protocol = protocol.upper()
+    if protocol not in ('TCP', 'UDP'):
+        return []
+    try:
+        host_low, host_high = _port_range(published)
+        target_low, target_high = _port_range(target)
+    except ValueError:
+        return []
+    if host_high - host_low != target_high - target_low:
+        return []
+    return [(host_ip, host_low + offset, target_low + offset, protocol)
+            for offset in range(host_high - host_low + 1)]
+
+def _port_range(value):
+    low, _, high = value.strip().partition('-')
+    low, high = int(low), int(high or low)
+    if not 0 < low <= high <= 65535:
+        raise ValueError(f"Invalid port range '{value}'")
+    return low, high
@@ -0,0 +1,283 @@
+# utils/importers/nginx.py
+
+# Standard Imports
+import io                                       # For reading strings as streams
+import ipaddress                                # For telling IP addresses from upstream names
+import re                                       # For tokenizing lines
+
+# Local Imports
+from utils.services import describe_port        # For describing ports without a server name
+from .quoting import open_quote                 # For quoted tokens spanning lines
+
+# Quoted tokens, comments, block and statement delimiters and bare tokens, where ${var} may contain braces
+_TOKEN = re.compile(r'''"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|#.*|[;{}]|(?:\$\{[^}\s]*\}|[^\s;{}"'])(?:\$\{[^}\s]*\}|[^\s;{}])*''')
+# Directives that pass requests to an upstream, with the schemes they accept and their default ports
+_PASS_DIRECTIVES = {
+    'proxy_pass': {'': None, 'http': 80, 'https': 443},
+    'grpc_pass': {'': None, 'grpc': 80, 'grpcs': 443},
+    'fastcgi_pass': {'': None},
+    'uwsgi_pass': {'': None, 'uwsgi': None, 'suwsgi': None},
+}
+# Listen addresses that mean "every interface", reported as the default IP instead
+_ANY_ADDRESS = ('*', '0.0.0.0', '::')
+
+def iter_nginx_entries(content, name=None, default_ip='127.0.0.1'):
+    """
+    Extract the listening ports and proxied upstreams of an nginx configuration file.
+
+    The file is tokenized and parsed in a single pass, reading it line by line. Every
+    ``server`` block is reported when its closing brace is read: its ``listen`` ports
+    and the targets of its ``proxy_pass``, ``grpc_pass``, ``fastcgi_pass`` and
+    ``uwsgi_pass`` directives, in any nested ``location`` or ``if`` block, described by
+    its first ``server_name``. The servers of ``upstream`` blocks are reported at the
+    end of the file, described by the first site that proxies to them or else by the
+    upstream's name. ``stream`` servers that only listen on UDP proxy UDP ports.
+
+    A pass target without a port that isn't an IP address or a dotted host name is an
+    upstream, possibly defined in another file, and isn't reported itself. Variables,
+    Unix sockets and ``include`` directives are skipped, include the included files in
+    the import instead.
+
+    Args:
+        content (str|TextIO): The configuration file, or a stream of it
+        name (str): The file name, for error messages
+        default_ip (str): The IP for ports listening on every interface
+
+    Yields:
+        dict: The port information of each listening port and upstream
+
+    Raises:
+        ValueError: If the braces of the file are unbalanced
+    """
+    stream = io.StringIO(content) if isinstance(content, str) else content
+    parser = _Parser(name or 'nginx configuration', default_ip)
+    yield from parser.block(_statements(stream, parser.location), [])
+    yield from parser.upstream_entries()
+
+class _Parser:
+    """Parsing state of one file: upstream definitions and the sites proxying to them."""
+
+    def __init__(self, name, default_ip):
+        self.name = name
+        self.default_ip = default_ip
+        self.line = 0
+        self.upstreams = {}
+        self.upstream_labels = {}
+
+    def location(self, line):
+        self.line = line
+
+    def error(self, message):
+        return ValueError(f"{self.name}, line {self.line}: {message}")
+
+    def block(self, statements, contexts):
+        """Parse the statements of a block, up to its closing brace or the end of the file."""
+        for words, terminator in statements:
+            if terminator == '}':
+                if not contexts:
+                    raise self.error("unexpected '}'")
+                return
+            if terminator == ';':
+                continue
+            directive = words[0] if words else ''
+            if directive == 'server' and (not contexts or contexts[-1] in ('http', 'stream', 'mail')):
+                yield from self.server(statements, contexts + ['server'])
+            elif directive == 'upstream' and len(words) > 1:
+                self.upstream(words[1], statements, contexts + ['upstream'])
+            else:
+                yield from self.block(statements, contexts + [directive])
+        if contexts:
+            raise self.error("unexpected end of file, expecting '}'")
+
+    def server(self, statements, contexts):
+        """Parse a server block and report its ports once it is complete."""
+        site = {'names': [], 'listens': [], 'passes': []}
+        self.collect(statements, contexts, site)
+
+        label = next((name for name in site['names'] if name not in ('_', '') and not name.startswith('~')), None)
+        label = label[2:] if label and label.startswith('*.') else label
+        stream = 'stream' in contexts
+        protocols = {protocol for _, _, protocol in site['listens']}
+
+        for host, port, protocol in site['listens']:
+            yield _entry(host, port, protocol, label)
+
+        pass_protocol = 'UDP' if stream and protocols == {'UDP'} else 'TCP'
+        for directive, target in site['passes']:
+            upstream = self.pass_target(directive, target, stream)
+            if isinstance(upstream, str):
+                self.upstream_labels.setdefault(upstream, label)
+            else:
+                for host, port in upstream:
+                    yield _entry(host, port, pass_protocol, label)
+
+    def collect(self, statements, contexts, site):
+        """Collect the names, listen ports and pass targets of a server block and its nested blocks."""
+        for words, terminator in statements:
+            if terminator == '}':
+                return
+            if terminator == '{':
+                self.collect(statements, contexts + [words[0] if words else ''], site)
+                continue
+            if not words:
+                continue
+            directive, arguments = words[0], words[1:]
+            if directive == 'server_name':
+                site['names'].extend(arguments)
+            elif directive == 'listen' and arguments:
+                site['listens'].extend(self.listen(arguments, 'stream' in contexts))
+            elif directive in _PASS_DIRECTIVES and arguments:
+                site['passes'].append((directive, arguments[0]))
+        raise self.error("unexpected end of file, expecting '}'")
+
+    def upstream(self, upstream_name, statements, contexts):
+        """Remember the servers of an upstream block, they are reported at the end of the file."""
+        servers = self.upstreams.setdefault(upstream_name, [])
+        for words, terminator in statements:
+            if terminator == '}':
+                return
+            if terminator == '{':
+                # Not valid inside an upstream, but skip it instead of reading it as servers
+                self.collect(statements, contexts, {'names': [], 'listens': [], 'passes': []})
+                continue
+            if len(words) > 1 and words[0] == 'server':
+                servers.extend(_address(words[1], 80))
+        raise self.error("unexpected end of file, expecting '}'")
+
+    def upstream_entries(self):
+        for upstream_name, servers in self.upstreams.items():
+            label = self.upstream_labels.get(upstream_name) or upstream_name
+            for host, port in servers:
+                yield _entry(host, port, 'TCP', label)
+
+    def listen(self, arguments, stream):
+        """
+        Parse the arguments of a listen directive.
+
+        Returns:
+            list: (host, port, protocol) tuples, several for port ranges
+        """
+        protocol = 'UDP' if 'udp' in arguments[1:] else 'TCP'
+        address = arguments[0]
+        if address.startswith('unix:'):
+            return []
+        if _is_port(address):
+            host, port = '*', address
+        else:
+            host, port = _split_host_port(address)
+            port = port or ('' if stream else '80')
+        if not port:
+            return []
+        host = self.default_ip if host in _ANY_ADDRESS else host
+        return [(host, number, protocol) for number in _port_range(port)]
+
+    def pass_target(self, directive, target, stream):
+        """
+        Resolve the target of a pass directive.
+
+        Returns:
+            str|list: The name of an upstream, or (host, port) tuples
+        """
+        if '$' in target:
+            return []
+        schemes = _PASS_DIRECTIVES[directive]
+        scheme, separator, address = target.partition('://')
+        if not separator:
+            scheme, address = '', target
+        scheme = scheme.lower()
+        if scheme not in schemes or address.startswith('unix:'):
+            return []
+        address = address.split('/', 1)[0]
+        host, port = _split_host_port(address)
+        if not host:
+            return []
+        if port:
+            return [(host, number) for number in _port_range(port)]
+        default_port = schemes[scheme]
+        if host in self.upstreams or not (_is_ip(host) or '.' in host or host == 'localhost') or default_port is None:
+            return host
+        return [(host, default_port)]
+
+def _entry(host, port, protocol, label):
+    return {
+        'ip': host,
+        'nickname': None,
+        'port': port,
+        'description': describe_port(label, port, protocol),
+        'port_protocol': protocol
+    }
+
+def _address(address, default_port):
+    """Parse the address of an upstream server into (host, port) tuples."""
+    if address.startswith('unix:') or '$' in address:
+        return []
+    host, port = _split_host_port(address)
+    if not host:
+        return []
+    return [(host, number) for number in _port_range(port or str(default_port))]
+
+def _split_host_port(address):
+    """Split ``host:port``, ``[ipv6]:port``, ``host`` or a bare IPv6 address into host and port."""
+    if address.startswith('['):
+        host, _, rest = address[1:].partition(']')
+        return host, rest[1:] if rest.startswith(':') else ''
+    if address.count(':') == 1:
+        return tuple(address.split(':'))
+    return address, ''
+
+def _is_port(token):
+    low, _, high = token.partition('-')
+    return low.isdigit() and (not high or high.isdigit())
+
+def _port_range(port):
+    """Return the port numbers of ``port`` or ``low-high``, or none if it isn't valid."""
+    if not _is_port(port):
+        return []
+    low, _, high = port.partition('-')
+    low, high = int(low), int(high or low)
+    if not 0 < low <= high <= 65535:
+        return []
+    return range(low, high + 1)
+
+def _is_ip(host):
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+# Tokenizing
+
+def _statements(stream, location):
+    """
+    Tokenize an nginx configuration into statements.
+
+    Yields:
+        tuple: (words, terminator), where the terminator is ';', '{' or '}'
+    """
+    words = []
+    pending = ''
+    for number, raw_line in enumerate(stream, 1):
+        line = pending + raw_line
+        if open_quote(line, '"\'', delimiters=';{}'):
+            # Quoted strings may span lines
+            pending = line
+            continue
+        pending = ''
+        location(number)
+        for match in _TOKEN.finditer(line):
+            token = match.group(0)
+            if token[0] == '#':
+                break
+            if token in (';', '{', '}'):
+                yield words, token
+                words = []
+            else:
+                words.append(_unquote(token))
+    if words:
+        yield words, ';'
+
+def _unquote(token):
+    if len(token) > 1 and token[0] in '"\'' and token[-1] == token[0]:
+        return re.sub(r'\\(.)', r'\1', token[1:-1])
+    return token
@@ -0,0 +1,101 @@
+# utils/importers/nmap.py
+
+# Standard Imports
+import io                                       # For reading strings as streams
+import xml.etree.ElementTree as ET              # For parsing scan results incrementally
+
+# Local Imports
+from utils.services import describe_port        # For describing ports without a detected service
+
+# Port states that are imported
+_OPEN_STATES = ('open',)
+# Address types, in order of preference for a host's IP
+_ADDRESS_TYPES = ('ipv4', 'ipv6')
+# Lengths of the Host.nickname and Port.description columns
+_NICKNAME_LENGTH = 50
+_DESCRIPTION_LENGTH = 100
+
+def iter_nmap_entries(content):
+    """
+    Extract the open ports of an nmap XML scan (``nmap -oX``).
+
+    The XML is parsed incrementally and every ``host`` element is cleared as soon as its
+    ports are read, so memory use stays flat however many hosts the scan covers. The
+    entries of a host are produced together, in the order of the scan.
+
+    A host's IP is its IPv4 address, or its IPv6 address if it has none, and its
+    nickname is its first host name, preferring user-supplied names over reverse DNS.
+    Ports are described by the detected service, with its product and version when
+    nmap probed them, or else by the service registered on the port.
+
+    Args:
+        content (str|TextIO|BinaryIO): The XML, or a stream of it
+
+    Yields:
+        dict: The port information of each open TCP and UDP port
+
+    Raises:
+        ValueError: If the XML is not valid
+    """
+    if isinstance(content, str):
+        source = io.StringIO(content)
+    else:
+        # Expat decodes bytes itself, which is much faster than reading decoded text
+        source = getattr(content, 'buffer', content)
+
+    try:
+        events = ET.iterparse(source, events=('start', 'end'))
+        root = None
+        for event, element in events:
+            if root is None:
+                root = element
+            if event != 'end' or element.tag != 'host':
+                continue
+            yield from _host_entries(element)
+            # Drop the host, and the reference the root keeps to it
+            root.clear()
+    except ET.ParseError as e:
+        raise ValueError(f"Invalid nmap XML: {e}")
+
+def _host_entries(host):
+    ip_address = _host_address(host)
+    if ip_address is None:
+        return
+    nickname = _host_nickname(host)
+    for port in host.iterfind('ports/port'):
+        state = port.find('state')
+        protocol = port.get('protocol', '').upper()
+        number = port.get('portid', '')
+        if state is None or state.get('state') not in _OPEN_STATES:
+            continue
+        if protocol not in ('TCP', 'UDP') or not number.isdigit():
+            continue
+        number = int(number)
+        yield {
+            'ip': ip_address,
+            'nickname': nickname,
+            'port': number,
+            'description': describe_port(_service_description(port.find('service')), number, protocol),
+            'port_protocol': protocol
+        }
+
+def _host_address(host):
+    addresses = {address.get('addrtype'): address.get('addr') for address in host.iterfind('address')}
+    return next((addresses[kind] for kind in _ADDRESS_TYPES if addresses.get(kind)), None)
+
+def _host_nickname(host):
+    names = [(hostname.get('type') != 'user', hostname.get('name')) for hostname in host.iterfind('hostnames/hostname')]
+    names = [name for name in names if name[1]]
+    return min(names, key=lambda name: name[0])[1][:_NICKNAME_LENGTH] if names else None
+
+def _service_description(service):
+    """Describe a detected service like nmap's port table: ``ssl/http (nginx 1.24.0)``."""
+    if service is None or not service.get('name') or service.get('name') == 'unknown':
+        return None
+    description = service.get('name')
+    if service.get('tunnel'):
+        description = f"{service.get('tunnel')}/{description}"
+    product = ' '.join(value for value in (service.get('product'), service.get('version')) if value)
+    if product:
+        description = f"{description} ({product})"
+    return description[:_DESCRIPTION_LENGTH]
@@ -0,0 +1,37 @@
+# utils/importers/quoting.py
+
+def open_quote(line, quotes, escapable=None, delimiters=''):
+    """
+    Return whether a line ends inside a quoted token, so that the next line continues it.
+
+    A quote only opens a token at the start of a word, and a ``#`` there starts a comment
+    that ends the line. Inside quotes listed in ``escapable`` a backslash escapes the
+    next character.
+
+    Args:
+        line (str): The line read so far
+        quotes (str): The characters that quote a token
+        escapable (str): The quotes in which backslash escapes apply, all of them by default
+        delimiters (str): Characters besides whitespace that end a word
+
+    Returns:
+        bool: True if a quoted token is still open at the end of the line
+    """
+    escapable = quotes if escapable is None else escapable
+    quote = None
+    escaped = False
+    at_start = True
+    for char in line:
+        if quote:
+            if quote in escapable and char == '\\' and not escaped:
+                escaped = True
+                continue
+            if char == quote and not escaped:
+                quote = None
+            escaped = False
+        elif char in quotes and at_start:
+            quote = char
+        elif char == '#' and at_start:
+            return False
+        at_start = char.isspace() or char in delimiters if not quote else at_start
+    return quote is not None
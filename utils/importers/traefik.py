@@ -0,0 +1,204 @@
+# utils/importers/traefik.py
+
+# Standard Imports
+import re                                       # For reading router rules
+
+# External Imports
+import yaml                                     # For parsing YAML configuration
+
+try:
+    import tomllib                              # For parsing TOML configuration (Python 3.11+)
+except ImportError:
+    try:
+        import tomli as tomllib                 # For parsing TOML configuration on older Pythons
+    except ImportError:
+        tomllib = None
+
+# The C loader is much faster on large files, fall back to the pure Python one
+_Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Host(`a`, `b`), HostSNI(`a`) and Host(`a`) || Host(`b`) matchers of router rules
+_RULE_HOST = re.compile(r'\bHost(?:SNI)?\s*\(([^)]*)\)')
+_RULE_VALUE = re.compile(r'`([^`]*)`|"([^"]*)"')
+# TOML table headers and key/value pairs, for recognizing TOML content without a file name
+_TOML_LINE = re.compile(r'^\s*(?:\[\[?[\w.\-"]+\]\]?|[\w.\-"]+\s*=)')
+# Default ports of server URL schemes
+_SCHEMES = {'http': 80, 'h2c': 80, 'https': 443}
+# Listen addresses that mean "every interface", reported as the default IP instead
+_ANY_ADDRESS = ('', '0.0.0.0', '::', '*')
+
+def iter_traefik_entries(content, name=None, default_ip='127.0.0.1'):
+    """
+    Extract the ports of a Traefik configuration file.
+
+    Reads the file provider's dynamic configuration in YAML or TOML: the servers of the
+    ``http``, ``tcp`` and ``udp`` load balancer services, described by the first host
+    name of the routers using them or else by the service name. Entry points, which
+    belong to the static configuration but are often kept in the same directory, are
+    reported as ports of the default IP unless they listen on a specific address.
+
+    Configuration files are small, so each is loaded as a whole with the C YAML or TOML
+    parser; large imports are split over many files, which are parsed in parallel.
+
+    Args:
+        content (str|TextIO): The configuration file, or a stream of it
+        name (str): The file name, used to tell TOML from YAML and for error messages
+        default_ip (str): The IP for entry points listening on every interface
+
+    Yields:
+        dict: The port information of each server and entry point
+
+    Raises:
+        ValueError: If the file is not valid YAML or TOML
+    """
+    text = content if isinstance(content, str) else content.read()
+    label = name or 'Traefik configuration'
+    for document in _load(text, name, label):
+        if document is None:
+            continue
+        if not isinstance(document, dict):
+            raise ValueError(f"{label}: a Traefik configuration must be a mapping")
+        yield from _entry_point_entries(_get(document, 'entryPoints'), default_ip)
+        for protocol in ('http', 'tcp', 'udp'):
+            section = _get(document, protocol)
+            if isinstance(section, dict):
+                yield from _service_entries(section, protocol)
+
+def _load(text, name, label):
+    """Parse a configuration file into its documents."""
+    if _is_toml(text, name):
+        if tomllib is None:
+            raise ValueError(f"{label}: importing TOML requires Python 3.11 or the tomli package")
+        try:
+            return [tomllib.loads(text)]
+        except tomllib.TOMLDecodeError as e:
+            raise ValueError(f"{label}: invalid TOML: {e}")
+    try:
+        return list(yaml.load_all(text, Loader=_Loader))
+    except yaml.YAMLError as e:
+        raise ValueError(f"{label}: invalid YAML: {e}")
+
+def _is_toml(text, name):
+    if name:
+        extension = name.rsplit('.', 1)[-1].lower()
+        if extension == 'toml':
+            return True
+        if extension in ('yml', 'yaml'):
+            return False
+    for line in text.splitlines():
+        if line.strip() and not line.lstrip().startswith('#'):
+            return bool(_TOML_LINE.match(line))
+    return False
+
+def _get(mapping, key):
+    """Get a value by key, ignoring case like Traefik does."""
+    if not isinstance(mapping, dict):
+        return None
+    if key in mapping:
+        return mapping[key]
+    key = key.lower()
+    return next((value for name, value in mapping.items() if str(name).lower() == key), None)
+
+def _entry_point_entries(entry_points, default_ip):
+    if not isinstance(entry_points, dict):
+        return
+    for entry_point, settings in entry_points.items():
+        address = _get(settings, 'address')
+        if not isinstance(address, str):
+            continue
+        address, _, protocol = address.partition('/')
+        host, port = _parse_address(address)
+        if host is None or port is None:
+            continue
+        yield _entry(default_ip if host in _ANY_ADDRESS else host, port, (protocol or 'tcp').upper(), entry_point)
+
+def _service_entries(section, protocol):
+    """Report the load balancer servers of the services of an http, tcp or udp section."""
+    labels = {}
+    routers = _get(section, 'routers')
+    if isinstance(routers, dict):
+        for router in routers.values():
+            service = _get(router, 'service')
+            host = _rule_host(_get(router, 'rule'))
+            if isinstance(service, str) and host:
+                labels.setdefault(service.split('@', 1)[0], host)
+
+    services = _get(section, 'services')
+    if not isinstance(services, dict):
+        return
+    port_protocol = 'UDP' if protocol == 'udp' else 'TCP'
+    for service_name, service in services.items():
+        servers = _get(_get(service, 'loadBalancer'), 'servers')
+        if not isinstance(servers, list):
+            continue
+        label = labels.get(service_name, service_name)
+        for server in servers:
+            if protocol == 'http':
+                host, port = _parse_url(_get(server, 'url'))
+            else:
+                host, port = _parse_address(_get(server, 'address'))
+            if host and port:
+                yield _entry(host, port, port_protocol, label)
+
+def _rule_host(rule):
+    """Return the first host name matched by a router rule."""
+    if not isinstance(rule, str):
+        return None
+    for match in _RULE_HOST.finditer(rule):
+        for value in _RULE_VALUE.finditer(match.group(1)):
+            host = value.group(1) if value.group(1) is not None else value.group(2)
+            if host and host != '*':
+                return host
+    return None
+
+def _parse_url(url):
+    if not isinstance(url, str):
+        return None, None
+    scheme, separator, address = url.partition('://')
+    if not separator or scheme.lower() not in _SCHEMES:
+        return None, None
+    host, port = _split_host_port(address.split('/', 1)[0])
+    if host is None:
+        return None, None
+    if not port:
+        return host, _SCHEMES[scheme.lower()]
+    return host, _port_number(port)
+
+def _parse_address(address):
+    if not isinstance(address, str):
+        return None, None
+    host, port = _split_host_port(address)
+    if host is None:
+        return None, None
+    return host, _port_number(port)
+
+def _split_host_port(address):
+    """
+    Split ``host:port``, ``[ipv6]:port`` or ``host`` into host and port.
+
+    IPv6 addresses must be bracketed, as Traefik requires: without brackets the port
+    can't be told apart from the address, so such addresses, like unclosed brackets,
+    come back without a host.
+    """
+    if address.startswith('['):
+        host, closed, rest = address[1:].partition(']')
+        if not closed or (rest and not rest.startswith(':')):
+            return None, ''
+        return host, rest[1:]
+    if address.count(':') > 1:
+        return None, ''
+    host, _, port = address.partition(':')
+    return host, port
+
+def _port_number(port):
+    """Return a port as a number, or None if it isn't one between 1 and 65535."""
+    return int(port) if port.isdigit() and 0 < int(port) <= 65535 else None
+
+def _entry(host, port, protocol, label):
+    return {
+        'ip': host,
+        'nickname': None,
+        'port': port,
+        'description': label,
+        'port_protocol': protocol
+    }
@@ -0,0 +1,102 @@
+# utils/ordering.py
+
+# Standard Imports
+from bisect import bisect_left                  # For the longest increasing subsequence
+
+# Distance between neighbouring order keys, leaving room to insert items in between
+ORDER_GAP = 1024
+
+def next_order(last_order):
+    """
+    Return the order key for an item appended after ``last_order``.
+
+    Args:
+        last_order (int|None): The highest existing key, or None if there are no items
+
+    Returns:
+        int: The new key
+    """
+    return ORDER_GAP if last_order is None else last_order + ORDER_GAP
+
+def reorder(current, desired):
+    """
+    Work out the minimal set of key changes that put items into a new order.
+
+    Items whose keys already increase along the new order (the longest increasing
+    subsequence) keep their keys. Only the others get new keys, spaced evenly in the
+    gap between their neighbours, so dragging a single item changes a single key.
+    When a gap has no room left, the whole sequence is renumbered ``ORDER_GAP`` apart.
+
+    Args:
+        current (dict): Maps item IDs to their current keys (None for items without a key)
+        desired (list): Item IDs in their new order
+
+    Returns:
+        dict: Maps the IDs of the items that need a new key to that key
+    """
+    original = [current.get(item) for item in desired]
+    keys = list(original)
+    keep = _increasing_positions(keys)
+
+    changes = {}
+    position = 0
+    while position < len(desired):
+        if position in keep:
+            position += 1
+            continue
+
+        # Collect the run of items that need new keys and the keys around it
+        run_start = position
+        while position < len(desired) and position not in keep:
+            position += 1
+        low = keys[run_start - 1] if run_start > 0 else None
+        high = keys[position] if position < len(desired) else None
+        new_keys = _spread(low, high, position - run_start)
+
+        if new_keys is None:
+            return _rebalance(original, desired)
+
+        for offset, key in enumerate(new_keys):
+            keys[run_start + offset] = key
+            changes[desired[run_start + offset]] = key
+
+    return changes
+
+def _spread(low, high, count):
+    """Return ``count`` increasing keys strictly between ``low`` and ``high``, or None if they don't fit."""
+    if low is None and high is None:
+        return [ORDER_GAP * (i + 1) for i in range(count)]
+    if low is None:
+        return [high - ORDER_GAP * (count - i) for i in range(count)]
+    if high is None:
+        return [low + ORDER_GAP * (i + 1) for i in range(count)]
+    step = (high - low) // (count + 1)
+    if step < 1:
+        return None
+    return [low + step * (i + 1) for i in range(count)]
+
+def _rebalance(keys, desired):
+    """Renumber every item ``ORDER_GAP`` apart, returning only the keys that changed."""
+    return {item: ORDER_GAP * (i + 1) for i, item in enumerate(desired) if keys[i] != ORDER_GAP * (i + 1)}
+
+def _increasing_positions(keys):
+    """Return the positions of a longest strictly increasing subsequence of ``keys``, ignoring None."""
+    tails, tail_positions, previous = [], [], {}
+    for position, key in enumerate(keys):
+        if key is None:
+            continue
+        slot = bisect_left(tails, key)
+        if slot == len(tails):
+            tails.append(key)
+            tail_positions.append(position)
+        else:
+            tails[slot] = key
+            tail_positions[slot] = position
+        previous[position] = tail_positions[slot - 1] if slot > 0 else None
+
+    positions = set()
+    position = tail_positions[-1] if tail_positions else None
+    while position is not None:
+        positions.add(position)
+        position = previous[position]
+    return positions
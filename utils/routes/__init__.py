@@ -9,6 +9,7 @@ from .settings import settings_bp
 
 # Import Plugins Blueprints
 from .plugins.docker_plugin.docker import docker_bp
+from .plugins.local_plugin.local import local_bp
 from .plugins.portainer_plugin.portainer import portainer_bp
 
 # Register Blueprints
@@ -20,4 +21,5 @@ routes_bp.register_blueprint(settings_bp)
 
 # Register Plugins Blueprints
 routes_bp.register_blueprint(docker_bp)
+routes_bp.register_blueprint(local_bp)
 routes_bp.register_blueprint(portainer_bp)
\ No newline at end of file
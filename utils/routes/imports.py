@@ -1,18 +1,26 @@
 # utils/routes/imports.py
 
 # Standard Imports
+from itertools import chain                     # For importing several files at once
 import json                                     # For parsing JSON data
-import re                                       # For regular expressions
 
 # External Imports
 from flask import Blueprint                     # For creating a blueprint
+from flask import current_app as app            # For accessing the Flask app
 from flask import jsonify                       # For returning JSON responses
 from flask import render_template               # For rendering HTML templates
 from flask import request                       # For handling HTTP requests
 from flask import session                       # For storing session data
 
 # Local Imports
-from utils.database import db, Port             # For accessing the database models
+from utils.database import db                   # For rolling back failed imports
+from utils.importer import import_entries       # For saving imported entries in bulk
+from utils.importer import open_upload, iter_json_array, iter_ndjson # For parsing uploads incrementally
+from utils.importer import iter_upload_files, parse_files # For parsing configuration directories in parallel
+from utils.importers import iter_caddy_entries, iter_compose_entries # For parsing Caddyfiles and Docker Compose files
+from utils.importers import iter_nginx_entries, iter_traefik_entries # For parsing nginx and Traefik configuration
+from utils.importers import iter_nmap_entries   # For parsing nmap scans
+from utils.services import describe_port        # For describing bare port numbers
 
 # Create the blueprint
 imports_bp = Blueprint('imports', __name__)
@@ -28,10 +36,16 @@ def import_data():
     - GET: Renders the import template.
     - POST: Processes the uploaded file based on the import type.
 
-    The function supports importing from Caddyfile, JSON, and Docker-Compose formats.
-    It checks for existing entries in the database to avoid duplicates and
-    provides a summary of added and skipped entries.
-    The order is reset for each unique IP address.
+    The function supports importing from Caddyfile, JSON, NDJSON, Docker-Compose, nginx,
+    Traefik and nmap XML formats. The content is either one or more multipart 'file'
+    uploads, which may be gzip-compressed, or the 'file_content' form field. nginx and
+    Traefik configuration directories may be uploaded as their files or as a tarball or
+    zip file, whose files are parsed in parallel by a pool of worker processes. Uploads
+    are parsed incrementally and the parsed entries are saved in batches, so large files
+    are never held in memory as a whole.
+    Existing entries are looked up once per IP address and skipped, new ones are saved
+    with bulk inserts, and a summary of added and skipped entries is returned.
+    New entries are appended after the existing ports of each IP address.
 
     Returns:
         For GET: Rendered HTML template
@@ -40,57 +54,44 @@ def import_data():
     """
     if request.method == 'POST':
         import_type = request.form.get('import_type')
-        file_content = request.form.get('file_content')
-
-        if import_type == 'Caddyfile':
-            imported_data = import_caddyfile(file_content)
-        elif import_type == 'JSON':
-            imported_data = import_json(file_content)
-        elif import_type == 'Docker-Compose':
-            imported_data = import_docker_compose(file_content)
+        uploads = [upload for upload in request.files.getlist('file') if upload.filename]
+        if import_type in ('nginx', 'Traefik'):
+            # Configuration directories are read file by file, unpacking archives
+            file_contents = iter_upload_files(uploads) if uploads else [(None, request.form.get('file_content') or '')]
+        elif uploads:
+            file_contents = [open_upload(upload) for upload in uploads]
+        else:
+            file_contents = [request.form.get('file_content') or '']
+
+        parsers = {
+            'Caddyfile': import_caddyfile,
+            'JSON': import_json,
+            'NDJSON': import_ndjson,
+            'nmap': import_nmap,
+        }
+        if import_type == 'Docker-Compose':
+            # Compose files are merged into one stack
+            imported_data = import_docker_compose(file_contents, [upload.filename for upload in uploads])
+        elif import_type == 'nginx':
+            imported_data = import_nginx(file_contents)
+        elif import_type == 'Traefik':
+            imported_data = import_traefik(file_contents)
+        elif import_type in parsers:
+            imported_data = chain.from_iterable(parsers[import_type](content) for content in file_contents)
         else:
             return jsonify({'success': False, 'message': 'Unsupported import type'}), 400
 
-        added_count = 0
-        skipped_count = 0
-        ip_order_map = {}  # To keep track of the current order for each IP
-
-        # Group imported data by IP address
-        grouped_data = {}
-        for item in imported_data:
-            ip = item['ip']
-            if ip not in grouped_data:
-                grouped_data[ip] = []
-            grouped_data[ip].append(item)
-
-        for ip, items in grouped_data.items():
-            # Get the maximum order for this IP
-            max_order = db.session.query(db.func.max(Port.order)).filter(Port.ip_address == ip).scalar()
-            current_order = max_order if max_order is not None else -1
-
-            for item in items:
-                existing_port = Port.query.filter_by(
-                    ip_address=item['ip'],
-                    port_number=item['port'],
-                    port_protocol=item['port_protocol']
-                ).first()
-
-                if existing_port is None:
-                    current_order += 1
-                    port = Port(
-                        ip_address=item['ip'],
-                        nickname=item['nickname'] if item['nickname'] is not None else None,
-                        port_number=item['port'],
-                        description=item['description'],
-                        port_protocol=item['port_protocol'],
-                        order=current_order
-                    )
-                    db.session.add(port)
-                    added_count += 1
-                else:
-                    skipped_count += 1
-
-        db.session.commit()
+        # Save the new entries as they are parsed, skipping the ones that already exist
+        try:
+            added_count, skipped_count = import_entries(imported_data)
+        except ValueError as e:
+            db.session.rollback()
+            app.logger.warning(f"Invalid import file: {str(e)}")
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error importing entries: {str(e)}")
+            return jsonify({'success': False, 'message': 'Error importing entries'}), 500
 
         return jsonify({
             'success': True,
@@ -105,228 +106,166 @@ def import_caddyfile(content):
     """
     Parse a Caddyfile and extract port information.
 
-    This function processes a Caddyfile content, extracting domain names and
-    their associated reverse proxy configurations.
+    This function tokenizes the Caddyfile in a single pass with the engine in
+    utils.importers.caddy, producing an entry for every reverse proxy upstream of
+    every site as soon as it is read. Entries are described by the first address of
+    their site, or by the service registered on their port outside of a site.
 
     Args:
-        content (str): The content of the Caddyfile
+        content (str|TextIO): The content of the Caddyfile, or a stream of it
 
     Returns:
-        list: A list of dictionaries containing extracted port information
+        iterator: The extracted port information of each reverse proxy upstream
     """
-    entries = []
-    lines = content.split('\n')
-    current_domain = None
-
-    for line in lines:
-        line = line.strip()
-        if line and not line.startswith('#'):
-            if '{' in line:
-                # Extract domain name
-                current_domain = line.split('{')[0].strip()
-            elif 'reverse_proxy' in line:
-                # Extract IP and port from reverse proxy directive
-                parts = line.split()
-                if len(parts) > 1:
-                    ip_port = parts[-1]
-                    ip, port = ip_port.split(':')
-                    entries.append({
-                        'ip': ip,
-                        'nickname': None,
-                        'port': int(port),
-                        'description': current_domain,
-                        'port_protocol': 'TCP'  # Assume TCP
-                    })
-
-    return entries
-
-def import_docker_compose(content):
+    return iter_caddy_entries(content)
+
+def import_docker_compose(contents, names=None):
     """
-    Parse a Docker Compose file and extract port information.
+    Parse Docker Compose files and extract port information.
 
-    This function processes Docker Compose file content, extracting service names,
-    ports, and protocols.
+    This function loads the files with the YAML engine in utils.importers.compose,
+    merging several files like ``docker compose -f a.yml -f b.yml``. Short and long
+    port syntax, port ranges, host IP bindings and variable defaults are supported.
+    Ports published on every interface are assigned to 127.0.0.1.
 
     Args:
-        content (str): The content of the Docker Compose file
+        contents (list): The Compose files, as strings or text streams
+        names (list): The file names, for error messages
 
     Returns:
-        list: A list of dictionaries containing extracted port information
+        iterator: The extracted port information of each published port
 
     Raises:
-        ValueError: If there's an error parsing the Docker Compose file
+        ValueError: If there's an error parsing a Docker Compose file
     """
-    try:
-        parsed_data = parse_docker_compose(content)
-
-        entries = []
-        for image, ports in parsed_data.items():
-            for port, protocol in ports:
-                entry = {
-                    "ip": "127.0.0.1",
-                    "nickname": None,
-                    "port": int(port),
-                    "description": image,
-                    "port_protocol": protocol
-                }
-                entries.append(entry)
-
-        print(f"Total entries found: {len(entries)}")
-        return entries
-
-    except Exception as e:
-        raise ValueError(f"Error parsing Docker-Compose file: {str(e)}")
+    return iter_compose_entries(contents, names=names)
+
+def import_nginx(files):
+    """
+    Parse nginx configuration files and extract port information.
+
+    This function parses every file with the streaming engine in utils.importers.nginx,
+    spreading the files over a pool of worker processes. The ``listen`` ports of every
+    server block are assigned to 127.0.0.1 unless they listen on a specific address, and
+    ``proxy_pass`` targets and ``upstream`` servers to their own host. All are described
+    by the server name of their site.
+
+    Args:
+        files (iterable): (name, text) tuples of the configuration files
+
+    Returns:
+        iterator: The extracted port information of each listening port and upstream
+
+    Raises:
+        ValueError: If a file has unbalanced braces
+    """
+    return parse_files(iter_nginx_entries, files)
+
+def import_traefik(files):
+    """
+    Parse Traefik configuration files and extract port information.
+
+    This function reads the file provider's dynamic configuration, in YAML or TOML, with
+    the engine in utils.importers.traefik, spreading the files over a pool of worker
+    processes. The servers of http, tcp and udp services are described by the host name
+    of the router using them, entry points by their name.
+
+    Args:
+        files (iterable): (name, text) tuples of the configuration files
+
+    Returns:
+        iterator: The extracted port information of each server and entry point
+
+    Raises:
+        ValueError: If a file is not valid YAML or TOML
+    """
+    return parse_files(iter_traefik_entries, files)
 
 def import_json(content):
     """
     Parse JSON content and extract port information.
 
-    This function processes JSON content, expecting a specific format
-    for port entries.
+    This function processes JSON content, expecting an array of port entries in the
+    export format. The array is parsed one entry at a time. Entries without a
+    description are described by the service registered on their port.
 
     Args:
-        content (str): JSON-formatted string containing port information
+        content (str|TextIO): JSON-formatted port information, or a stream of it
 
-    Returns:
-        list: A list of dictionaries containing extracted port information
+    Yields:
+        dict: The extracted port information of each entry
 
     Raises:
         ValueError: If the JSON format is invalid
     """
-    try:
-        data = json.loads(content)
-        entries = []
-        for item in data:
-            entries.append({
-                'ip': item['ip_address'],
-                'nickname': item['nickname'],
-                'port': int(item['port_number']),
-                'description': item['description'],
-                'port_protocol': item['port_protocol'].upper()
-            })
-        return entries
-    except json.JSONDecodeError:
-        raise ValueError("Invalid JSON format")
-
-# Import Helpers
+    for item in iter_json_array(content):
+        yield json_entry(item)
 
-def parse_docker_compose(content):
+def import_ndjson(content):
     """
-    Parse Docker Compose file content and extract service information.
+    Parse newline-delimited JSON content and extract port information.
+
+    This function processes one port entry in the export format per line, reading
+    the content line by line.
 
     Args:
-        content (str): The content of the Docker Compose file
+        content (str|TextIO): NDJSON-formatted port information, or a stream of it
 
-    Returns:
-        dict: A dictionary with service names as keys and lists of (port, protocol) tuples as values
+    Yields:
+        dict: The extracted port information of each line
+
+    Raises:
+        ValueError: If a line is not a valid entry
     """
-    result = {}
-    current_service = None
-    current_image = None
-    in_services = False
-    in_ports = False
-    indent_level = 0
-
-    def add_port(image, port, protocol):
-        image_parts = image.split('/')
-        image_name = image_parts[-1].split(':')[0]
-        if image_name not in result:
-            result[image_name] = []
-        result[image_name].append((port, protocol))
-
-    lines = content.split('\n')
-    for line in lines:
-        original_line = line
-        line = line.strip()
-        current_indent = len(original_line) - len(original_line.lstrip())
-
-        if line.startswith('services:'):
-            in_services = True
-            indent_level = current_indent
-            continue
-
-        if in_services and current_indent == indent_level + 2:
-            if ':' in line and not line.startswith('-'):
-                current_service = line.split(':')[0].strip()
-                current_image = None
-                in_ports = False
-
-        if in_services and current_indent == indent_level + 4:
-            if line.startswith('image:'):
-                current_image = line.split('image:')[1].strip()
-            if line.startswith('ports:'):
-                in_ports = True
-                continue
-
-        if in_ports and current_indent == indent_level + 6:
-            if line.startswith('-'):
-                port_mapping = line.split('-')[1].strip().strip('"').strip("'")
-                if ':' in port_mapping:
-                    host_port = port_mapping.split(':')[0]
-                    protocol = 'UDP' if '/udp' in port_mapping else 'TCP'
-                    host_port = host_port.split('/')[0]  # Remove any protocol specification from the port
-                    if current_image:
-                        add_port(current_image, host_port, protocol)
-        elif in_ports and current_indent <= indent_level + 4:
-            in_ports = False
-
-    return result
-
-def parse_port_and_protocol(port_value):
+    for item in iter_ndjson(content):
+        yield json_entry(item)
+
+def import_nmap(content):
     """
-    Parse a port value and protocol, handling direct integers, environment variable expressions,
-    and complex port mappings.
+    Parse an nmap XML scan and extract port information.
+
+    This function reads the output of ``nmap -oX`` with the incremental parser in
+    utils.importers.nmap, which clears every host once its ports are read, so scans of
+    whole subnets are imported with flat memory use. Every open TCP and UDP port is
+    assigned to the host's IP address, nicknamed by its host name and described by the
+    service nmap detected on it.
 
     Args:
-        port_value (str): The port value to parse
+        content (str|TextIO): The XML scan, or a stream of it
 
     Returns:
-        tuple: (int, str) The parsed port number and protocol ('TCP' or 'UDP' if specified, else 'TCP')
+        iterator: The extracted port information of each open port, grouped by host
 
     Raises:
-        ValueError: If no valid port number can be found
+        ValueError: If the XML is not valid
     """
-    # Remove any leading/trailing whitespace
-    port_value = port_value.strip()
-
-    # Check for explicit protocol specification
-    if '/tcp' in port_value:
-        protocol = 'TCP'
-        port_value = port_value.replace('/tcp', '')
-    elif '/udp' in port_value:
-        protocol = 'UDP'
-        port_value = port_value.replace('/udp', '')
-    else:
-        protocol = 'TCP'  # Default to TCP if not explicitly specified
-
-    # Find the last colon in the string
-    last_colon_index = port_value.rfind(':')
-    if last_colon_index != -1:
-        # Look for numbers after the last colon
-        after_colon = port_value[last_colon_index + 1:]
-        number_match = re.search(r'(\d+)', after_colon)
-        if number_match:
-            return int(number_match.group(1)), protocol
-
-    # If no number found after the last colon, check for other patterns
-    # Check for complete environment variable syntax with default value
-    complete_env_var_match = re.search(r':-(\d+)', port_value)
-    if complete_env_var_match:
-        return int(complete_env_var_match.group(1)), protocol
-
-    # Check if it's a direct integer
-    if port_value.isdigit():
-        return int(port_value), protocol
-
-    # If we can't parse it, raise an error
-    raise ValueError(f"Unable to parse port value: {port_value}")
-
-def get_max_order():
+    return iter_nmap_entries(content)
+
+# Import Helpers
+
+def json_entry(item):
     """
-    Retrieve the maximum order value from the Port table.
+    Convert an exported port entry to an import entry.
+
+    Args:
+        item (dict): The entry, with 'ip_address', 'port_number', 'port_protocol' and
+                     optionally 'nickname' and 'description'
 
     Returns:
-        int: The maximum order value, or -1 if the table is empty.
+        dict: The port information in the import format
+
+    Raises:
+        ValueError: If the entry is missing a field or has an invalid port number
     """
-    max_order = db.session.query(db.func.max(Port.order)).scalar()
-    return max_order if max_order is not None else -1
+    try:
+        port = int(item['port_number'])
+        protocol = item['port_protocol'].upper()
+        return {
+            'ip': item['ip_address'],
+            'nickname': item.get('nickname'),
+            'port': port,
+            'description': describe_port(item.get('description'), port, protocol),
+            'port_protocol': protocol
+        }
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid entry {json.dumps(item)[:200]}: {str(e)}")
@@ -6,7 +6,7 @@ from flask import render_template               # For rendering HTML templates
 from flask import session                       # For storing session data
 
 # Local Imports
-from utils.database import db, Port, Setting    # For accessing the database models
+from utils.database import db, Host, Setting    # For accessing the database models
 
 # Create the blueprint
 index_bp = Blueprint('index', __name__)
@@ -18,7 +18,7 @@ def index():
 
     This function handles requests to the root URL ('/') and prepares data
     for rendering the main page. It performs the following tasks:
-    1. Retrieves distinct IP addresses and their nicknames from the database.
+    1. Retrieves the IP addresses that have ports and their nicknames, in panel order.
     2. Determines the default IP address to display.
     3. Manages the theme setting for the user interface.
 
@@ -26,19 +26,19 @@ def index():
         rendered_template: The 'new.html' template with context data including
                             IP addresses, default IP, and current theme.
     """
-    # Query distinct IP addresses and their nicknames from the Port table
-    ip_addresses = db.session.query(Port.ip_address, Port.nickname).distinct().all()
+    # Query the IP addresses and their nicknames from the Host table
+    ip_addresses = (db.session.query(Host.ip_address, Host.nickname)
+                    .filter(Host.ports.any())
+                    .order_by(Host.panel_order, Host.id).all())
 
     # Determine the default IP address
-    default_ip = Setting.query.filter_by(key='default_ip').first()
-    default_ip = default_ip.value if default_ip else (ip_addresses[0][0] if ip_addresses else '')
+    default_ip = Setting.get('default_ip') or (ip_addresses[0][0] if ip_addresses else '')
 
     # Check if theme is set in session, if not, retrieve from database
     if 'theme' not in session:
 
         # Retrieve theme setting from database
-        theme_setting = Setting.query.filter_by(key='theme').first()
-        theme = theme_setting.value if theme_setting else 'light'
+        theme = Setting.get('theme', 'light')
 
         # Store theme in session for future requests
         session['theme'] = theme
@@ -11,7 +11,8 @@ from flask import request
 import docker
 
 # Local Imports
-from utils.database import db, Setting, Port
+from utils.database import db, Host, Setting, Port
+from utils.services import service_name
 
 # Create the blueprint
 docker_bp = Blueprint('docker', __name__)
@@ -27,14 +28,10 @@ def get_docker_config():
         JSON: A JSON response containing the Docker configuration or an error message.
     """
     try:
-        host_ip_setting = Setting.query.filter_by(key='docker_host_ip').first()
-        socket_url_setting = Setting.query.filter_by(key='docker_socket_url').first()
-        enabled_setting = Setting.query.filter_by(key='docker_enabled').first()
-
         config = {
-            'hostIP': host_ip_setting.value if host_ip_setting else '',
-            'socketURL': socket_url_setting.value if socket_url_setting else '',
-            'enabled': enabled_setting.value.lower() == 'true' if enabled_setting else False
+            'hostIP': Setting.get('docker_host_ip', ''),
+            'socketURL': Setting.get('docker_socket_url', ''),
+            'enabled': Setting.get_bool('docker_enabled')
         }
 
         app.logger.debug(f"Retrieved Docker config: {config}")
@@ -64,30 +61,12 @@ def save_docker_config():
         return jsonify({'success': False, 'message': 'Missing Host IP or Socket URL'}), 400
 
     try:
-        # Save Host IP
-        host_ip_setting = Setting.query.filter_by(key='docker_host_ip').first()
-        if host_ip_setting:
-            host_ip_setting.value = host_ip
-        else:
-            host_ip_setting = Setting(key='docker_host_ip', value=host_ip)
-            db.session.add(host_ip_setting)
-
-        # Save Socket URL
-        socket_url_setting = Setting.query.filter_by(key='docker_socket_url').first()
-        if socket_url_setting:
-            socket_url_setting.value = socket_url
-        else:
-            socket_url_setting = Setting(key='docker_socket_url', value=socket_url)
-            db.session.add(socket_url_setting)
-
-        # Save enabled state
-        enabled_setting = Setting.query.filter_by(key='docker_enabled').first()
-        if enabled_setting:
-            enabled_setting.value = str(enabled)
-        else:
-            enabled_setting = Setting(key='docker_enabled', value=str(enabled))
-            db.session.add(enabled_setting)
-
+        # Save Host IP, Socket URL and enabled state
+        Setting.set_many({
+            'docker_host_ip': host_ip,
+            'docker_socket_url': socket_url,
+            'docker_enabled': str(enabled)
+        })
         db.session.commit()
         app.logger.info("Docker configuration saved successfully")
         return jsonify({'success': True, 'message': 'Configuration saved successfully'})
@@ -142,21 +121,20 @@ def discover_docker_ports():
 
     This function connects to Docker, retrieves information about running containers,
     and returns their port mappings. It works with both local and remote Docker daemons.
+    Each mapping carries the service registered on its container port, if any, as a
+    suggested description.
 
     Returns:
         JSON: A JSON response containing discovered ports or an error message.
     """
     try:
         # Retrieve Docker configuration
-        host_ip_setting = Setting.query.filter_by(key='docker_host_ip').first()
-        socket_url_setting = Setting.query.filter_by(key='docker_socket_url').first()
+        host_ip = Setting.get('docker_host_ip')
+        socket_url = Setting.get('docker_socket_url')
 
-        if not host_ip_setting or not socket_url_setting:
+        if host_ip is None or socket_url is None:
             return jsonify({'success': False, 'message': 'Docker configuration not found'}), 400
 
-        host_ip = host_ip_setting.value
-        socket_url = socket_url_setting.value
-
         # Determine the appropriate connection method
         if host_ip in ('localhost', '127.0.0.1'):
             if socket_url.startswith('unix://'):
@@ -176,13 +154,15 @@ def discover_docker_ports():
             container_ports = container.ports
             for container_port, host_ports in container_ports.items():
                 if host_ports:
+                    number, _, protocol = container_port.partition('/')
                     for host_port in host_ports:
                         discovered_ports.append({
                             'container_name': container.name,
                             'container_id': container.id,
                             'container_port': container_port,
                             'host_ip': host_port['HostIp'] or host_ip,
-                            'host_port': host_port['HostPort']
+                            'host_port': host_port['HostPort'],
+                            'service': service_name(number, protocol or 'tcp')
                         })
 
         return jsonify({'success': True, 'ports': discovered_ports})
@@ -212,13 +192,13 @@ def add_discovered_port():
 
     try:
         # Check if the port already exists
-        existing_port = Port.query.filter_by(ip_address=host_ip, port_number=host_port).first()
+        existing_port = Port.for_ip(host_ip).filter(Port.port_number == host_port).first()
         if existing_port:
             return jsonify({'success': False, 'message': 'Port already exists in database'}), 400
 
         # Add the new port
         new_port = Port(
-            ip_address=host_ip,
+            host=Host.get_or_create(host_ip),
             port_number=host_port,
             description=f"{container_name}",
             port_protocol="TCP"  # Assuming TCP, will need to be updated if UDP ports are discovered
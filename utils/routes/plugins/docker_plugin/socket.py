@@ -1,7 +1,7 @@
 # External Imports
 from flask import current_app as app            # For accessing the Flask app
 import docker
-from utils.database import db, Port, Setting    # For accessing the database models
+from utils.database import db, Host, Port, Setting # For accessing the database models
 def access_docker_socket(url = "unix://var/run/docker.sock", ip = "127.0.0.1" ):
     client = docker.DockerClient(base_url=url, version="auto")
     for container in client.containers.list():
@@ -22,14 +22,13 @@ def write_port(ip, port, description, docker_id):
     try:
         port_entry = Port.query.filter_by(docker_id=docker_id).one()
         if not port_entry:
-            port = Port(ip_address=ip, port_number=port, description=description)
+            port = Port(host=Host.get_or_create(ip), port_number=port, description=description)
             db.session.add(port)
 
         else:
             # Check if the new port number already exists for this IP
-            existing_port = Port.query.filter(Port.ip_address == ip,
-                                              Port.port_number == port, 
-                                              Port.docker_id != docker_id ).first()
+            existing_port = Port.for_ip(ip).filter(Port.port_number == port,
+                                                   Port.docker_id != docker_id ).first()
             if existing_port:
                 app.logger.info(f"Warning: Port {port} already exists on this ip")
 
@@ -0,0 +1,139 @@
+# utils/routes/plugins/local_plugin/local.py
+
+# External Imports
+from flask import Blueprint                     # For creating a blueprint
+from flask import current_app as app            # For accessing the Flask app
+from flask import jsonify                       # For returning JSON responses
+from flask import request                       # For handling HTTP requests
+
+# Local Imports
+from utils.database import db, Setting          # For the plugin settings
+from utils.discovery import discover_local_ports, reconcile_local_ports # For reading the listening sockets
+from utils.discovery import local_host_ip       # For the IP of wildcard listeners
+
+# Create the blueprint
+local_bp = Blueprint('local', __name__)
+
+# Routes that read the host's sockets, only served while the plugin is enabled
+_DISCOVERY_VIEWS = ('discover_local_ports_route', 'reconcile_local_ports_route')
+
+@local_bp.before_request
+def require_local_enabled():
+    """
+    Refuse the discovery routes while the 'local_enabled' setting is off.
+
+    Returns:
+        tuple: A JSON error response and 403 if the plugin is disabled, otherwise None.
+    """
+    # The blueprint is nested, so endpoints carry the names of the parent blueprints
+    if request.endpoint.rpartition('.')[2] in _DISCOVERY_VIEWS and not Setting.get_bool('local_enabled'):
+        return jsonify({'success': False, 'message': 'Local port discovery is disabled'}), 403
+
+@local_bp.route('/get_local_config', methods=['GET'])
+def get_local_config():
+    """
+    Retrieve the current local discovery configuration.
+
+    This function fetches the host IP and enabled status from the database. 'hostIP'
+    is the IP that ports listening on every interface are recorded under, as worked out
+    by local_host_ip when no IP is saved.
+
+    Returns:
+        JSON: A JSON response containing the local discovery configuration or an error message.
+    """
+    try:
+        config = {
+            'hostIP': local_host_ip() or '',
+            'enabled': Setting.get_bool('local_enabled')
+        }
+        return jsonify({'success': True, 'config': config})
+    except Exception as e:
+        app.logger.error(f"Error retrieving local discovery configuration: {str(e)}")
+        return jsonify({'success': False, 'message': 'Error retrieving configuration'}), 500
+
+@local_bp.route('/save_local_config', methods=['POST'])
+def save_local_config():
+    """
+    Save the local discovery configuration.
+
+    This function saves the host IP, which may be empty to use the default, and the
+    enabled status to the database.
+
+    Returns:
+        JSON: A JSON response indicating success or failure of the operation.
+    """
+    data = request.get_json(silent=True) or {}
+    host_ip = data.get('hostIP') or ''
+    enabled = bool(data.get('enabled', False))
+
+    if not isinstance(host_ip, str):
+        return jsonify({'success': False, 'message': 'Host IP must be a string'}), 400
+
+    try:
+        Setting.set_many({
+            'local_host_ip': host_ip,
+            'local_enabled': str(enabled)
+        })
+        db.session.commit()
+        app.logger.info("Local discovery configuration saved successfully")
+        return jsonify({'success': True, 'message': 'Configuration saved successfully'})
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error saving local discovery configuration: {str(e)}")
+        return jsonify({'success': False, 'message': 'Error saving configuration'}), 500
+
+@local_bp.route('/discover_local_ports', methods=['POST'])
+def discover_local_ports_route():
+    """
+    Discover the ports listening on the Portall host.
+
+    This function reads the listening sockets from /proc/net and returns them in the
+    same shape as discovered Docker ports, with the owning process in place of the
+    container. The optional JSON body may set 'hostIP', the IP reported for ports
+    listening on every interface (see local_host_ip for the default), 'processes' to
+    attribute ports to processes and 'loopback' to include ports only reachable from
+    the host itself.
+
+    Returns:
+        JSON: A JSON response containing discovered ports or an error message.
+    """
+    data = request.get_json(silent=True) or {}
+    host_ip = local_host_ip(data.get('hostIP'))
+    if host_ip is None:
+        return jsonify({'success': False, 'message': 'Set the host IP, the primary address is unknown'}), 400
+    try:
+        ports = discover_local_ports(host_ip,
+                                     processes=bool(data.get('processes')),
+                                     loopback=bool(data.get('loopback')))
+        return jsonify({'success': True, 'ports': ports})
+    except Exception as e:
+        app.logger.error(f"Error discovering local ports: {str(e)}")
+        return jsonify({'success': False, 'message': f'Error discovering local ports: {str(e)}'}), 500
+
+@local_bp.route('/reconcile_local_ports', methods=['POST'])
+def reconcile_local_ports_route():
+    """
+    Add the ports listening on the Portall host that are missing from the database.
+
+    This function takes the same optional JSON body as discover_local_ports_route.
+    Recorded ports of the host that nothing listens on are reported, not removed.
+
+    Returns:
+        JSON: A JSON response with the added and existing counts and the stale ports.
+    """
+    data = request.get_json(silent=True) or {}
+    host_ip = local_host_ip(data.get('hostIP'))
+    if host_ip is None:
+        return jsonify({'success': False, 'message': 'Set the host IP, the primary address is unknown'}), 400
+    try:
+        result = reconcile_local_ports(host_ip, processes=bool(data.get('processes')))
+        stale = [{'port': number, 'protocol': protocol} for number, protocol in result['stale']]
+        return jsonify({
+            'success': True,
+            'message': f"Added {result['added']} listening ports, {result['existing']} already recorded",
+            'stale': stale
+        })
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error reconciling local ports: {str(e)}")
+        return jsonify({'success': False, 'message': f'Error reconciling local ports: {str(e)}'}), 500
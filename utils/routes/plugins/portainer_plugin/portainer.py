@@ -27,14 +27,10 @@ def get_portainer_config():
         JSON: A JSON response containing the Portainer configuration or an error message.
     """
     try:
-        url_setting = Setting.query.filter_by(key='portainer_url').first()
-        token_setting = Setting.query.filter_by(key='portainer_token').first()
-        enabled_setting = Setting.query.filter_by(key='portainer_enabled').first()
-
         config = {
-            'url': url_setting.value if url_setting else '',
-            'token': token_setting.value if token_setting else '',
-            'enabled': enabled_setting.value.lower() == 'true' if enabled_setting else False
+            'url': Setting.get('portainer_url', ''),
+            'token': Setting.get('portainer_token', ''),
+            'enabled': Setting.get_bool('portainer_enabled')
         }
 
         app.logger.debug(f"Retrieved Portainer config: {config}")
@@ -64,30 +60,12 @@ def save_portainer_config():
         return jsonify({'success': False, 'message': 'Missing URL or token'}), 400
 
     try:
-        # Save URL
-        url_setting = Setting.query.filter_by(key='portainer_url').first()
-        if url_setting:
-            url_setting.value = url
-        else:
-            url_setting = Setting(key='portainer_url', value=url)
-            db.session.add(url_setting)
-
-        # Save token
-        token_setting = Setting.query.filter_by(key='portainer_token').first()
-        if token_setting:
-            token_setting.value = token
-        else:
-            token_setting = Setting(key='portainer_token', value=token)
-            db.session.add(token_setting)
-
-        # Save enabled state
-        enabled_setting = Setting.query.filter_by(key='portainer_enabled').first()
-        if enabled_setting:
-            enabled_setting.value = str(enabled)
-        else:
-            enabled_setting = Setting(key='portainer_enabled', value=str(enabled))
-            db.session.add(enabled_setting)
-
+        # Save URL, token and enabled state
+        Setting.set_many({
+            'portainer_url': url,
+            'portainer_token': token,
+            'portainer_enabled': str(enabled)
+        })
         db.session.commit()
         app.logger.info("Portainer configuration saved successfully")
         return jsonify({'success': True, 'message': 'Configuration saved successfully'})
@@ -2,7 +2,8 @@
 
 # Standard Imports
 import json                                     # For parsing JSON data
-import random                                   # For generating random ports
+import time                                     # For timing bulk deletes
+import uuid                                     # For generating port block IDs
 
 # External Imports
 from flask import Blueprint                     # For creating a blueprint
@@ -12,14 +13,30 @@ from flask import render_template               # For rendering HTML templates
 from flask import request                       # For handling HTTP requests
 from flask import session                       # For storing session data
 from flask import url_for                       # For generating URLs
-from sqlalchemy import func                     # For using SQL functions
+from sqlalchemy import insert                   # For bulk inserts
+from sqlalchemy import update                   # For bulk updates
+from sqlalchemy.exc import IntegrityError       # For detecting duplicate ports
+from sqlalchemy.orm import aliased              # For comparing the ports of two hosts
+from sqlalchemy.orm import contains_eager       # For loading hosts with their ports
 
 # Local Imports
-from utils.database import db, Port, Setting    # For accessing the database models
+from utils.allocation import port_index, PortRange, POLICIES # For allocating free ports
+from utils.allocation import compile_exclusions # For the compiled port exclusions
+from utils.allocation import lease_expiry, reap_if_due # For port leases
+from utils.database import db, Host, HostSummary, Port, Setting # For accessing the database models
+from utils.database import host_summary         # For maintaining the per-host aggregates
+from utils.database import delete_in_chunks, reclaim_space # For bulk deletes
+from utils.ordering import next_order, reorder  # For sparse order keys
 
 # Create the blueprint
 ports_bp = Blueprint('ports', __name__)
 
+# Number of times ports are picked again after another worker saved the same ones first
+ALLOCATION_ATTEMPTS = 3
+
+# Largest number of ports a single generate_ports call may ask for
+MAX_GENERATE_BATCH = 1000
+
 ## Ports ##
 
 @ports_bp.route('/ports')
@@ -29,12 +46,14 @@ def ports():
 
     This function retrieves all ports from the database, organizes them by IP address,
     and renders the 'ports.html' template with the organized port data.
+    IP panels are shown in their saved panel order.
 
     Returns:
         str: Rendered HTML template for the ports page.
     """
-    # Retrieve all ports, ordered by order
-    ports = Port.query.order_by(Port.order).all()
+    # Retrieve all ports with their hosts, ordered by panel and then by port order
+    ports = (Port.query.join(Port.host).options(contains_eager(Port.host))
+             .order_by(Host.panel_order, Host.id, Port.order).all())
 
     # Organize ports by IP address
     ports_by_ip = {}
@@ -68,6 +87,8 @@ def add_port():
     Add a new port for a given IP address.
 
     This function creates a new port entry in the database with the provided details.
+    An optional 'lease_seconds' form field turns the entry into a lease that is removed
+    automatically once it expires.
 
     Returns:
         JSON: A JSON response indicating success or failure of the operation.
@@ -79,9 +100,15 @@ def add_port():
     protocol = request.form['protocol']
 
     try:
-        max_order = db.session.query(db.func.max(Port.order)).filter_by(ip_address=ip_address).scalar() or 0
-        port = Port(ip_address=ip_address, nickname=ip_nickname, port_number=port_number, description=description,
-                    port_protocol=protocol, order=max_order + 1)  # Updated
+        expires_at = lease_expiry(request.form.get('lease_seconds'))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid lease duration'}), 400
+
+    try:
+        host = Host.get_or_create(ip_address, ip_nickname)
+        max_order = HostSummary.highest_order(host.id)
+        port = Port(host=host, port_number=port_number, description=description,
+                    port_protocol=protocol, order=next_order(max_order), expires_at=expires_at)
         db.session.add(port)
         db.session.commit()
 
@@ -117,7 +144,7 @@ def edit_port():
             return jsonify({'success': False, 'message': 'Port entry not found'}), 404
 
         # Check if the new port number and protocol combination already exists for this IP
-        existing_port = Port.query.filter(Port.ip_address == ip_address,
+        existing_port = Port.query.filter(Port.host_id == port_entry.host_id,
                                           Port.port_number == new_port_number,
                                           Port.port_protocol == protocol,
                                           Port.id != port_id).first()
@@ -147,7 +174,7 @@ def delete_port():
     port_number = request.form['port_number']
 
     try:
-        port = Port.query.filter_by(ip_address=ip_address, port_number=port_number).first()
+        port = Port.for_ip(ip_address).filter(Port.port_number == port_number).first()
         if port:
             db.session.delete(port)
             db.session.commit()
@@ -167,6 +194,9 @@ def generate_port():
 
     This function receives IP address, nickname, and description from a POST request,
     generates a new unique port number within the configured range, and saves it to the database.
+    The port is taken from the in-memory free-port index using the allocation policy from the
+    optional 'policy' form field, falling back to the 'port_policy' setting ('random' by default).
+    An optional 'lease_seconds' form field makes the port expire automatically.
 
     Returns:
         tuple: A tuple containing a JSON response and an HTTP status code.
@@ -180,72 +210,433 @@ def generate_port():
     protocol = request.form['protocol']
     app.logger.debug(f"Received request to generate port for IP: {ip_address}, Nickname: {nickname}, Description: {description}, Protocol: {protocol}")
 
-    def get_setting(key, default):
-        """Helper function to retrieve settings from the database."""
-        setting = Setting.query.filter_by(key=key).first()
-        value = setting.value if setting else str(default)
-        return value if value != '' else str(default)
-
-    # Retrieve port generation settings
-    port_start = int(get_setting('port_start', 1024))
-    port_end = int(get_setting('port_end', 65535))
-    port_exclude = get_setting('port_exclude', '')
-    port_length = int(get_setting('port_length', 4))
-
-    # Get existing ports for this IP
-    existing_ports = set(p.port_number for p in Port.query.filter_by(ip_address=ip_address).all())
-
-    # Create set of excluded ports
-    excluded_ports = set()
-    if port_exclude:
-        excluded_ports.update(int(p.strip()) for p in port_exclude.split(',') if p.strip().isdigit())
-
-    # Generate list of available ports based on settings
-    available_ports = [p for p in range(port_start, port_end + 1)
-                       if p not in excluded_ports and
-                       (port_length == 0 or len(str(p)) == port_length)]
-
-    # Count ports in use within the current range
-    ports_in_use = sum(1 for p in existing_ports if p in available_ports)
-
-    # Check if there are any available ports
-    if not available_ports or all(p in existing_ports for p in available_ports):
-        total_ports = len(available_ports)
-        app.logger.error(f"No available ports for IP: {ip_address}. Used {ports_in_use} out of {total_ports} possible ports.")
-        settings_url = url_for('routes.settings.settings', _external=True) + '#ports'
-        error_message = (
-            f"No available ports.\n"
-            f"Used {ports_in_use} out of {total_ports} possible ports.\n"
-            f"Consider expanding your port range in the <a href='{settings_url}'>settings</a>."
-        )
-        return jsonify({'error': error_message, 'html': True}), 400
-
-    # Choose a new port randomly from available ports
-    new_port = random.choice([p for p in available_ports if p not in existing_ports])
-
-    # Create and save the new port
     try:
-        last_port_position = db.session.query(func.max(Port.order)).filter_by(ip_address=ip_address).scalar() or -1
-        port = Port(ip_address=ip_address, nickname=nickname, port_number=new_port, description=description, port_protocol=protocol, order=last_port_position + 1)
-        db.session.add(port)
-        db.session.commit()
-        app.logger.info(f"Generated new port {new_port} for IP: {ip_address}")
-    except Exception as e:
-        db.session.rollback()
-        app.logger.error(f"Error saving new port: {str(e)}")
+        expires_at = lease_expiry(request.form.get('lease_seconds'))
+    except ValueError:
+        return jsonify({'error': 'Invalid lease duration'}), 400
+
+    # Retrieve port generation settings and bring the free-port index up to date
+    policy = configure_port_index(request.form.get('policy'), ip_address)
+    if policy not in POLICIES:
+        return jsonify({'error': f"Unknown allocation policy: {policy}"}), 400
+
+    sync_port_index([ip_address])
+    for attempt in range(ALLOCATION_ATTEMPTS):
+        # Pick and reserve a free port from the index
+        new_port = port_index.allocate(ip_address, policy, protocol)
+
+        # Check if there are any available ports
+        if new_port is None:
+            return no_available_ports(ip_address)
+
+        # Create and save the new port
+        try:
+            host = Host.get_or_create(ip_address, nickname)
+            last_port_position = HostSummary.highest_order(host.id)
+            port = Port(host=host, port_number=new_port, description=description, port_protocol=protocol, order=next_order(last_port_position), expires_at=expires_at)
+            db.session.add(port)
+            db.session.commit()
+            app.logger.info(f"Generated new port {new_port} for IP: {ip_address} using {policy} policy")
+            break
+        except Exception as e:
+            db.session.rollback()
+            port_index.release(ip_address, new_port)
+            if not isinstance(e, IntegrityError):
+                app.logger.error(f"Error saving new port: {str(e)}")
+                return jsonify({'error': 'Error saving new port'}), 500
+            # Another worker took this port, reload the IP from the database and pick again
+            port_index.invalidate(ip_address)
+            app.logger.warning(f"Port {new_port} for IP: {ip_address} was taken by another worker: {str(e)}")
+    else:
+        app.logger.error(f"Error saving new port: no free port after {ALLOCATION_ATTEMPTS} attempts")
         return jsonify({'error': 'Error saving new port'}), 500
 
     # Return the new port and full URL
     full_url = f"http://{ip_address}:{new_port}"
-    return jsonify({'protocol': protocol, 'port': new_port, 'full_url': full_url})
+    response = {'protocol': protocol, 'port': new_port, 'full_url': full_url}
+    if expires_at:
+        response['expires_at'] = expires_at.isoformat()
+    return jsonify(response)
+
+@ports_bp.route('/generate_ports', methods=['POST'])
+def generate_ports():
+    """
+    Generate several new ports in a single transaction.
+
+    This function accepts a JSON body in one of two forms:
+    - {"requests": [{"ip_address", "nickname", "description", "protocol"}, ...]}
+      to generate one port per request, possibly across several IP addresses.
+    - {"ip_address", "nickname", "description", "protocol", "count"}
+      to generate 'count' ports with the same details on one IP address.
+    An optional "policy" overrides the 'port_policy' setting for the whole batch and an
+    optional "lease_seconds" makes every generated port expire automatically.
+    At most MAX_GENERATE_BATCH ports can be asked for at once.
+
+    Settings are read once, all ports are taken from the free-port index in one pass
+    per IP address and the new rows are written with a single bulk insert. Allocation
+    is all-or-nothing: if any IP address runs out of ports, nothing is saved.
+
+    Returns:
+        tuple: A tuple containing a JSON response and an HTTP status code.
+               The JSON response includes the list of generated ports on success,
+               or an error message on failure.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+
+    if 'requests' in data:
+        port_requests = data['requests']
+        if not isinstance(port_requests, list) or not all(isinstance(item, dict) for item in port_requests):
+            return jsonify({'error': 'requests must be a list of objects'}), 400
+        if len(port_requests) > MAX_GENERATE_BATCH:
+            return jsonify({'error': f'At most {MAX_GENERATE_BATCH} ports can be generated at once'}), 400
+    else:
+        try:
+            count = int(data.get('count', 0))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid count'}), 400
+        if count > MAX_GENERATE_BATCH:
+            return jsonify({'error': f'At most {MAX_GENERATE_BATCH} ports can be generated at once'}), 400
+        port_requests = [{
+            'ip_address': data.get('ip_address'),
+            'nickname': data.get('nickname'),
+            'description': data.get('description'),
+            'protocol': data.get('protocol', 'TCP')
+        } for _ in range(count)]
+
+    if not port_requests:
+        return jsonify({'error': 'No ports requested'}), 400
+    if not all(isinstance(item.get(field), str) and item[field]
+               for item in port_requests for field in ('ip_address', 'description')):
+        return jsonify({'error': 'Each request needs an ip_address and a description'}), 400
+    if not all(item.get(field) is None or isinstance(item[field], str)
+               for item in port_requests for field in ('nickname', 'protocol')):
+        return jsonify({'error': 'nickname and protocol must be strings'}), 400
+
+    try:
+        expires_at = lease_expiry(data.get('lease_seconds'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid lease duration'}), 400
+
+    app.logger.debug(f"Received request to generate {len(port_requests)} ports")
+
+    policy = configure_port_index(data.get('policy'))
+    if policy not in POLICIES:
+        return jsonify({'error': f"Unknown allocation policy: {policy}"}), 400
+
+    # Group the requests by IP address and protocol, keeping their original positions
+    requests_by_key = {}
+    nicknames = {}
+    for position, item in enumerate(port_requests):
+        protocol = (item.get('protocol') or 'TCP').upper()
+        requests_by_key.setdefault((item['ip_address'], protocol), []).append(position)
+        nicknames.setdefault(item['ip_address'], item.get('nickname'))
+
+    sync_port_index(nicknames)
+    for attempt in range(ALLOCATION_ATTEMPTS):
+        # Reserve all ports up front so the batch either fits completely or not at all
+        allocated = {}
+        new_ports = [None] * len(port_requests)
+        for (ip_address, protocol), positions in requests_by_key.items():
+            ports = port_index.allocate_many(ip_address, len(positions), policy, protocol)
+            if ports is None:
+                for (reserved_ip, _), reserved_ports in allocated.items():
+                    for port in reserved_ports:
+                        port_index.release(reserved_ip, port)
+                return no_available_ports(ip_address)
+            allocated[(ip_address, protocol)] = ports
+            for position, new_port in zip(positions, ports):
+                new_ports[position] = new_port
+
+        try:
+            # Get the host and current maximum order of every affected IP address at once
+            hosts = Host.get_or_create_many(nicknames)
+            max_orders = HostSummary.highest_orders(host.id for host in hosts.values())
+            last_positions = {ip_address: max_orders[host.id] for ip_address, host in hosts.items()}
+
+            rows = []
+            for item, new_port in zip(port_requests, new_ports):
+                ip_address = item['ip_address']
+                last_positions[ip_address] = next_order(last_positions[ip_address])
+                rows.append({
+                    'host_id': hosts[ip_address].id,
+                    'port_number': new_port,
+                    'description': item['description'],
+                    'port_protocol': (item.get('protocol') or 'TCP').upper(),
+                    'order': last_positions[ip_address],
+                    'expires_at': expires_at
+                })
+
+            # Save all new ports at once
+            db.session.execute(insert(Port), rows)
+            add_to_summaries(rows)
+            db.session.commit()
+            break
+        except Exception as e:
+            db.session.rollback()
+            for (ip_address, _), ports in allocated.items():
+                for port in ports:
+                    port_index.release(ip_address, port)
+            if not isinstance(e, IntegrityError):
+                app.logger.error(f"Error saving generated ports: {str(e)}")
+                return jsonify({'error': 'Error saving generated ports'}), 500
+            # Another worker took some of these ports, reload the IPs from the database and pick again
+            for ip_address, _ in allocated:
+                port_index.invalidate(ip_address)
+            app.logger.warning(f"Generated ports were taken by another worker: {str(e)}")
+    else:
+        app.logger.error(f"Error saving generated ports: no free ports after {ALLOCATION_ATTEMPTS} attempts")
+        return jsonify({'error': 'Error saving generated ports'}), 500
+
+    # The bulk insert bypasses the session, so confirm the reservations by hand
+    for item, row in zip(port_requests, rows):
+        port_index.add(item['ip_address'], row['port_number'])
+
+    app.logger.info(f"Generated {len(rows)} new ports across {len(hosts)} IP addresses")
+    return jsonify({
+        'ports': [{
+            'ip_address': item['ip_address'],
+            'description': row['description'],
+            'protocol': row['port_protocol'],
+            'port': row['port_number'],
+            'order': row['order'],
+            'full_url': f"http://{item['ip_address']}:{row['port_number']}"
+        } for item, row in zip(port_requests, rows)],
+        'expires_at': expires_at.isoformat() if expires_at else None
+    })
+
+@ports_bp.route('/generate_cluster_port', methods=['POST'])
+def generate_cluster_port():
+    """
+    Generate one port number that is free on several IP addresses at once.
+
+    This function receives a JSON body with "ip_addresses", "description", "protocol" and
+    optional "policy" and "lease_seconds" fields. It intersects the free ports of all given
+    IP addresses, picks one port that is free on every one of them and saves an entry for
+    each IP address in a single transaction.
+
+    Returns:
+        tuple: A tuple containing a JSON response and an HTTP status code.
+               The JSON response includes the shared port and one URL per IP address on
+               success, or an error message on failure.
+    """
+    data = request.get_json(silent=True) or {}
+    ip_addresses = list(dict.fromkeys(data.get('ip_addresses') or []))
+    description = data.get('description')
+    protocol = (data.get('protocol') or 'TCP').upper()
+
+    if not ip_addresses or not description:
+        return jsonify({'error': 'Missing IP addresses or description'}), 400
+
+    try:
+        expires_at = lease_expiry(data.get('lease_seconds'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid lease duration'}), 400
+
+    app.logger.debug(f"Received request to generate a shared port for IPs: {ip_addresses}")
+
+    policy = configure_port_index(data.get('policy'))
+    if policy not in POLICIES:
+        return jsonify({'error': f"Unknown allocation policy: {policy}"}), 400
+
+    sync_port_index(ip_addresses)
+    for attempt in range(ALLOCATION_ATTEMPTS):
+        # Pick and reserve a port that is free on every IP address
+        new_port = port_index.allocate_shared(ip_addresses, policy, protocol)
+        if new_port is None:
+            app.logger.error(f"No port is free on all of: {ip_addresses}")
+            settings_url = url_for('routes.settings.settings', _external=True) + '#ports'
+            error_message = (
+                f"No port is free on all {len(ip_addresses)} IP addresses.\n"
+                f"Consider expanding your port range in the <a href='{settings_url}'>settings</a>."
+            )
+            return jsonify({'error': error_message, 'html': True}), 400
+
+        try:
+            # Look up hosts and current orders for all IP addresses at once
+            hosts = Host.get_or_create_many(dict.fromkeys(ip_addresses))
+            max_orders = HostSummary.highest_orders(host.id for host in hosts.values())
+
+            rows = [{
+                'host_id': hosts[ip_address].id,
+                'port_number': new_port,
+                'description': description,
+                'port_protocol': protocol,
+                'order': next_order(max_orders[hosts[ip_address].id]),
+                'expires_at': expires_at
+            } for ip_address in ip_addresses]
+
+            # Save the port on all IP addresses at once
+            db.session.execute(insert(Port), rows)
+            add_to_summaries(rows)
+            db.session.commit()
+            break
+        except Exception as e:
+            db.session.rollback()
+            for ip_address in ip_addresses:
+                port_index.release(ip_address, new_port)
+            if not isinstance(e, IntegrityError):
+                app.logger.error(f"Error saving shared port: {str(e)}")
+                return jsonify({'error': 'Error saving shared port'}), 500
+            # Another worker took this port on one of the IPs, reload them from the database and pick again
+            for ip_address in ip_addresses:
+                port_index.invalidate(ip_address)
+            app.logger.warning(f"Shared port {new_port} was taken by another worker: {str(e)}")
+    else:
+        app.logger.error(f"Error saving shared port: no free port after {ALLOCATION_ATTEMPTS} attempts")
+        return jsonify({'error': 'Error saving shared port'}), 500
+
+    # The bulk insert bypasses the session, so confirm the reservations by hand
+    for ip_address in ip_addresses:
+        port_index.add(ip_address, new_port)
+
+    app.logger.info(f"Generated shared port {new_port} for IPs: {ip_addresses}")
+    return jsonify({
+        'protocol': protocol,
+        'port': new_port,
+        'hosts': [{
+            'ip_address': ip_address,
+            'order': row['order'],
+            'full_url': f"http://{ip_address}:{new_port}"
+        } for ip_address, row in zip(ip_addresses, rows)],
+        'expires_at': expires_at.isoformat() if expires_at else None
+    })
+
+@ports_bp.route('/generate_port_block', methods=['POST'])
+def generate_port_block():
+    """
+    Generate a block of consecutive ports for a given IP address.
+
+    This function receives IP address, nickname, description, protocol and block size from a
+    POST request, finds a run of 'block_size' consecutive free ports within the configured range
+    and saves one entry per port. The entries share a block ID so they can be managed together.
+    An optional 'lease_seconds' form field makes the whole block expire automatically.
+
+    Returns:
+        tuple: A tuple containing a JSON response and an HTTP status code.
+               The JSON response includes the block ID and its ports on success,
+               or an error message on failure.
+    """
+    ip_address = request.form['ip_address']
+    nickname = request.form.get('nickname') or None
+    description = request.form['description']
+    protocol = request.form['protocol']
+
+    try:
+        block_size = int(request.form['block_size'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Invalid block size'}), 400
+    if block_size < 1:
+        return jsonify({'error': 'Block size must be at least 1'}), 400
+
+    try:
+        expires_at = lease_expiry(request.form.get('lease_seconds'))
+    except ValueError:
+        return jsonify({'error': 'Invalid lease duration'}), 400
+
+    app.logger.debug(f"Received request to generate a block of {block_size} ports for IP: {ip_address}")
+
+    policy = configure_port_index(request.form.get('policy'), ip_address)
+    if policy not in POLICIES:
+        return jsonify({'error': f"Unknown allocation policy: {policy}"}), 400
+
+    sync_port_index([ip_address])
+    block_id = uuid.uuid4().hex
+    for attempt in range(ALLOCATION_ATTEMPTS):
+        # Find and reserve a run of consecutive free ports
+        block_ports = port_index.allocate_block(ip_address, block_size, policy, protocol)
+        if block_ports is None:
+            ports_in_use, total_ports = port_index.stats(ip_address)
+            app.logger.error(f"No block of {block_size} ports available for IP: {ip_address}")
+            settings_url = url_for('routes.settings.settings', _external=True) + '#ports'
+            error_message = (
+                f"No block of {block_size} consecutive ports available.\n"
+                f"Used {ports_in_use} out of {total_ports} possible ports.\n"
+                f"Consider expanding your port range in the <a href='{settings_url}'>settings</a>."
+            )
+            return jsonify({'error': error_message, 'html': True}), 400
+
+        # Create and save one entry per port of the block
+        try:
+            host = Host.get_or_create(ip_address, nickname)
+            last_port_position = HostSummary.highest_order(host.id)
+            for port_number in block_ports:
+                last_port_position = next_order(last_port_position)
+                db.session.add(Port(host=host, port_number=port_number, description=description,
+                                    port_protocol=protocol, order=last_port_position, block_id=block_id,
+                                    expires_at=expires_at))
+            db.session.commit()
+            app.logger.info(f"Generated port block {block_ports[0]}-{block_ports[-1]} for IP: {ip_address}")
+            break
+        except Exception as e:
+            db.session.rollback()
+            for port_number in block_ports:
+                port_index.release(ip_address, port_number)
+            if not isinstance(e, IntegrityError):
+                app.logger.error(f"Error saving port block: {str(e)}")
+                return jsonify({'error': 'Error saving port block'}), 500
+            # Another worker took some of these ports, reload the IP from the database and pick again
+            port_index.invalidate(ip_address)
+            app.logger.warning(f"Port block for IP: {ip_address} was taken by another worker: {str(e)}")
+    else:
+        app.logger.error(f"Error saving port block: no free block after {ALLOCATION_ATTEMPTS} attempts")
+        return jsonify({'error': 'Error saving port block'}), 500
+
+    return jsonify({
+        'protocol': protocol,
+        'block_id': block_id,
+        'port_start': block_ports[0],
+        'port_end': block_ports[-1],
+        'ports': block_ports,
+        'expires_at': expires_at.isoformat() if expires_at else None
+    })
+
+@ports_bp.route('/delete_port_block', methods=['POST'])
+def delete_port_block():
+    """
+    Delete every port of a block created by generate_port_block.
+
+    Ports are deleted in bounded-size chunks, like in delete_ip, and the summaries of
+    the block's hosts are recomputed afterwards.
+
+    Returns:
+        JSON: A JSON response indicating success or failure of the operation,
+              with the number of deleted ports.
+    """
+    block_id = request.form['block_id']
+    hosts = []
+
+    try:
+        hosts = (db.session.query(Host.id, Host.ip_address).join(Port, Port.host_id == Host.id)
+                 .filter(Port.block_id == block_id).distinct().all())
+        if not hosts:
+            return jsonify({'success': False, 'message': 'Port block not found'}), 404
+
+        deleted = delete_in_chunks(Port, Port.block_id == block_id)
+
+        # Bulk deletes bypass the session tracking of the host summaries
+        host_summary.refresh(host_id for host_id, _ in hosts)
+        db.session.commit()
+
+        app.logger.info(f"Deleted port block {block_id} ({deleted} ports)")
+        return jsonify({'success': True, 'message': 'Port block deleted successfully', 'deleted': deleted})
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error deleting port block: {str(e)}")
+        return jsonify({'success': False, 'message': 'Error deleting port block'}), 500
+    finally:
+        # And the free-port index
+        for _, ip_address in hosts:
+            port_index.invalidate(ip_address)
 
 @ports_bp.route('/move_port', methods=['POST'])
 def move_port():
     """
     Move a port from one IP address to another.
 
-    This function updates the IP address and order of a port based on the target IP.
-    It also updates the nickname of the port to match the target IP's nickname.
+    This function moves a port to the host of the target IP and appends it to that host's ports.
+    The port picks up the target IP's nickname through its host.
 
     Returns:
         JSON: A JSON response indicating success or failure of the operation.
@@ -264,30 +655,22 @@ def move_port():
 
     try:
         # Check if the port already exists in the target IP with the same protocol
-        existing_port = Port.query.filter_by(port_number=port_number, ip_address=target_ip, port_protocol=protocol).first()
+        existing_port = Port.for_ip(target_ip).filter(Port.port_number == port_number, Port.port_protocol == protocol).first()
         if existing_port:
             app.logger.info(f"Port {port_number} ({protocol}) already exists in target IP {target_ip}")
             return jsonify({'success': False, 'message': 'Port number and protocol combination already exists in the target IP group'}), 400
 
-        # Log all ports for the source IP to check if the port exists
-        all_source_ports = Port.query.filter_by(ip_address=source_ip).all()
-        app.logger.info(f"All ports for source IP {source_ip}: {[(p.port_number, p.port_protocol) for p in all_source_ports]}")
-
-        port = Port.query.filter_by(port_number=port_number, ip_address=source_ip, port_protocol=protocol).first()
+        port = Port.for_ip(source_ip).filter(Port.port_number == port_number, Port.port_protocol == protocol).first()
         if port:
             app.logger.info(f"Found port to move: {port.id}, {port.port_number}, {port.ip_address}, {port.port_protocol}")
 
-            # Get the nickname of the target IP
-            target_port = Port.query.filter_by(ip_address=target_ip).first()
-            target_nickname = target_port.nickname if target_port else None
-
-            # Update IP address and nickname
-            port.ip_address = target_ip
-            port.nickname = target_nickname
-
             # Update order
-            max_order = db.session.query(db.func.max(Port.order)).filter_by(ip_address=target_ip).scalar() or 0
-            port.order = max_order + 1
+            target_host = Host.get_or_create(target_ip)
+            max_order = HostSummary.highest_order(target_host.id)
+            port.order = next_order(max_order)
+
+            # Attach the port to the target host, which carries the target nickname
+            port.host_id = target_host.id
 
             db.session.commit()
             app.logger.info(f"Port moved successfully: {port.id}, {port.port_number}, {port.ip_address}, {port.port_protocol}, {port.nickname}")
@@ -318,27 +701,65 @@ def update_port_order():
     Update the order of ports for a specific IP address.
 
     This function receives a new order for ports of a given IP and updates the database accordingly.
+    Port orders are sparse keys, so only the ports that actually moved get a new key; dragging
+    a single port updates a single row. The ports of the IP are loaded with one query and the
+    changed keys are written with a single bulk UPDATE.
+
+    The list may name only some of the ports. Those are reordered among the positions they
+    already hold, and the ports that weren't submitted stay where they are.
 
     Returns:
         JSON: A JSON response indicating success or failure of the operation.
     """
-    data = request.json
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Missing IP or port order data'}), 400
     ip = data.get('ip')
     port_order = data.get('port_order')
 
     if not ip or not port_order:
         return jsonify({'success': False, 'message': 'Missing IP or port order data'}), 400
-
+    if not isinstance(port_order, list):
+        return jsonify({'success': False, 'message': 'Port order must be a list of port numbers'}), 400
     try:
-        # Get the base order for this IP
-        base_order = Port.query.filter_by(ip_address=ip).order_by(Port.order).first().order
+        port_order = [int(port_number) for port_number in port_order]
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Port order must be a list of port numbers'}), 400
 
-        # Update the order for each port
-        for index, port_number in enumerate(port_order):
-            port = Port.query.filter_by(ip_address=ip, port_number=port_number).first()
-            if port:
-                port.order = base_order + index
+    try:
+        # Load all ports of this IP at once, grouped by port number
+        rows = (db.session.query(Port.id, Port.host_id, Port.port_number, Port.order)
+                .join(Port.host).filter(Host.ip_address == ip)
+                .order_by(Port.order).all())
+        if not rows:
+            return jsonify({'success': False, 'message': 'No ports found for the given IP'}), 404
 
+        # The same number can be registered once per protocol, so keep a queue per number
+        rows_by_number = {}
+        for row in rows:
+            rows_by_number.setdefault(row.port_number, []).append(row)
+
+        # Map the submitted port numbers to row IDs in their new order
+        submitted = []
+        for port_number in port_order:
+            candidates = rows_by_number.get(port_number)
+            if candidates:
+                submitted.append(candidates.pop(0).id)
+
+        # Submitted ports take over the positions the submitted ports held, in their new order,
+        # so keys are worked out over every port of the IP and can't collide with the others
+        moved = iter(submitted)
+        submitted = set(submitted)
+        desired = [next(moved) if row.id in submitted else row.id for row in rows]
+
+        # Only the ports that moved get a new order key
+        changes = reorder({row.id: row.order for row in rows}, desired)
+        if changes:
+            db.session.execute(update(Port), [{'id': port_id, 'order': order} for port_id, order in changes.items()])
+
+            # The bulk update bypasses the session, so bring the highest order up to date by hand
+            max_order = max(changes.get(row.id, row.order) for row in rows)
+            HostSummary.query.filter_by(host_id=rows[0].host_id).update({'max_order': max_order})
         db.session.commit()
         return jsonify({'success': True, 'message': 'Port order updated successfully'})
     except Exception as e:
@@ -361,7 +782,7 @@ def change_port_number():
     new_port_number = request.form['new_port_number']
 
     try:
-        port = Port.query.filter_by(ip_address=ip, port_number=old_port_number).first()
+        port = Port.for_ip(ip).filter(Port.port_number == old_port_number).first()
         if port:
             port.port_number = new_port_number
             db.session.commit()
@@ -379,7 +800,11 @@ def edit_ip():
     """
     Edit an IP address and its associated nickname.
 
-    This function updates the IP address and nickname for all ports associated with the old IP.
+    This function updates the host of the old IP. Ports reference their host, so renaming or
+    re-addressing an IP is a single-row update. If the new IP already has a host, the ports
+    are moved over to it instead, unless both hosts have a port with the same number and
+    protocol. An optional 'port_policy' form field stores a per-host allocation policy that
+    overrides the global 'port_policy' setting.
 
     Returns:
         JSON: A JSON response indicating success or failure of the operation.
@@ -387,22 +812,52 @@ def edit_ip():
     old_ip = request.form['old_ip']
     new_ip = request.form['new_ip']
     new_nickname = request.form['new_nickname']
+    port_policy = request.form.get('port_policy')
+
+    if port_policy and port_policy not in POLICIES:
+        return jsonify({'success': False, 'message': f'Unknown allocation policy: {port_policy}'}), 400
 
     try:
-        # Find all ports associated with the old IP
-        ports = Port.query.filter_by(ip_address=old_ip).all()
+        host = Host.query.filter_by(ip_address=old_ip).first()
 
-        if not ports:
+        if not host:
             return jsonify({'success': False, 'message': 'No ports found for the given IP'}), 404
 
-        # Update IP and nickname for all associated ports
-        for port in ports:
-            port.ip_address = new_ip
-            port.nickname = new_nickname
+        # Merge into the existing host of the new IP, or re-address this one
+        target_host = Host.query.filter_by(ip_address=new_ip).first() if new_ip != old_ip else None
+        if target_host:
+            # Ports of both hosts with the same number and protocol can't be merged
+            target_port = aliased(Port)
+            clashes = (db.session.query(Port.port_number, Port.port_protocol)
+                       .join(target_port, (target_port.host_id == target_host.id)
+                             & (target_port.port_number == Port.port_number)
+                             & (target_port.port_protocol == Port.port_protocol))
+                       .filter(Port.host_id == host.id)
+                       .order_by(Port.port_number, Port.port_protocol).all())
+            if clashes:
+                listed = ', '.join(f'{number}/{protocol}' for number, protocol in clashes)
+                return jsonify({'success': False,
+                                'message': f'{new_ip} already has ports {listed}, move or delete them first'}), 400
+
+            Port.query.filter_by(host_id=host.id).update({'host_id': target_host.id}, synchronize_session=False)
+            host_summary.remove([host.id])
+            host_summary.refresh([target_host.id])
+            db.session.delete(host)
+            host = target_host
+        else:
+            host.ip_address = new_ip
+
+        host.nickname = new_nickname
+        if port_policy is not None:
+            host.set_setting('port_policy', port_policy)
 
         # Commit changes to the database
         db.session.commit()
 
+        # The free-port index is keyed by IP address
+        port_index.invalidate(old_ip)
+        port_index.invalidate(new_ip)
+
         return jsonify({'success': True, 'message': 'IP updated successfully'})
     except Exception as e:
         db.session.rollback()
@@ -414,25 +869,42 @@ def delete_ip():
     Delete an IP address and all its associated ports.
 
     This function removes an IP address and all ports assigned to it from the database.
+    Ports are deleted in bounded-size chunks, each in its own transaction, so deleting a
+    large host doesn't block other requests. An optional 'vacuum' form field reclaims the
+    freed space on SQLite afterwards.
 
     Returns:
-        JSON: A JSON response indicating success or failure of the operation.
+        JSON: A JSON response indicating success or failure of the operation,
+              with the number of deleted ports and the time taken.
     """
     ip = request.form['ip']
+    vacuum = request.form.get('vacuum', '').lower() == 'true'
+    start_time = time.perf_counter()
 
     try:
-        # Delete all ports associated with the IP
-        ports = Port.query.filter_by(ip_address=ip).all()
-        for port in ports:
-            db.session.delete(port)
+        deleted = 0
+        host = Host.query.filter_by(ip_address=ip).first()
+        if host:
+            # Delete all ports associated with the IP, then the host itself
+            deleted = delete_in_chunks(Port, Port.host_id == host.id)
+            host_summary.remove([host.id])
+            Host.query.filter_by(id=host.id).delete(synchronize_session=False)
 
         # Commit changes to the database
         db.session.commit()
+        if vacuum:
+            reclaim_space(full=True)
 
-        return jsonify({'success': True, 'message': 'IP and all assigned ports deleted successfully'})
+        elapsed_ms = round((time.perf_counter() - start_time) * 1000, 1)
+        app.logger.info(f"Deleted IP {ip} with {deleted} ports in {elapsed_ms} ms")
+        return jsonify({'success': True, 'message': 'IP and all assigned ports deleted successfully',
+                        'deleted': deleted, 'elapsed_ms': elapsed_ms})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Error deleting IP: {str(e)}'}), 500
+    finally:
+        # Bulk deletes bypass the session tracking of the free-port index
+        port_index.invalidate(ip)
 
 @ports_bp.route('/update_ip_order', methods=['POST'])
 def update_ip_order():
@@ -440,7 +912,8 @@ def update_ip_order():
     Update the order of IP address panels.
 
     This function receives a new order for IP addresses and updates the database accordingly.
-    It uses a large step between IP orders to allow for many ports per IP.
+    Panel orders are stored as sparse keys on the Host table, separate from the port orders,
+    so moving one panel updates a single row and never touches the ports.
 
     Returns:
         JSON: A JSON response indicating success or failure of the operation.
@@ -449,16 +922,119 @@ def update_ip_order():
     ip_order = data.get('ip_order', [])
 
     try:
-        # Update the order for each IP
-        for index, ip in enumerate(ip_order):
-            base_order = index * 1000  # Use a large step to allow for many ports per IP
-            ports = Port.query.filter_by(ip_address=ip).order_by(Port.order).all()
-            for i, port in enumerate(ports):
-                port.order = base_order + i
+        # Load the current panel order of every IP at once
+        hosts = {host.ip_address: host for host in Host.query.filter(Host.ip_address.in_(ip_order))}
+
+        # IPs without a host have no panel, e.g. one deleted by another client, so skip them
+        ip_order = [ip for ip in dict.fromkeys(ip_order) if ip in hosts]
+
+        # Only the panels that moved get a new order key
+        changes = reorder({ip: host.panel_order for ip, host in hosts.items()}, ip_order)
+        for ip, panel_order in changes.items():
+            hosts[ip].panel_order = panel_order
 
         db.session.commit()
         return jsonify({'success': True, 'message': 'IP panel order updated successfully'})
     except Exception as e:
         db.session.rollback()
         app.logger.error(f"Error updating IP panel order: {str(e)}")
-        return jsonify({'success': False, 'message': f'Error updating IP panel order: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'message': f'Error updating IP panel order: {str(e)}'}), 500
+
+## Helpers ##
+
+def get_port_setting(key, default):
+    """
+    Retrieve a port generation setting from the database.
+
+    Args:
+        key (str): The setting key
+        default: Value to use when the setting is missing or empty
+
+    Returns:
+        str: The setting value
+    """
+    value = Setting.get(key, '')
+    return value if value != '' else str(default)
+
+def configure_port_index(policy=None, ip_address=None):
+    """
+    Bring the free-port index in line with the current port generation settings.
+
+    Expired leases are reaped first so their ports are available to this allocation.
+
+    Args:
+        policy (str): Allocation policy requested by the caller, if any
+        ip_address (str): IP address being allocated on, whose host may set its own policy
+
+    Returns:
+        str: The allocation policy to use, from the caller, the host or the 'port_policy' setting
+    """
+    reap_if_due()
+    port_range = port_index.configure(PortRange.from_settings(
+        get_port_setting('port_start', 1024),
+        get_port_setting('port_end', 65535),
+        compile_exclusions(Setting.get('port_exclude', '')),
+        get_port_setting('port_length', 4)
+    ))
+    host_summary.use_range(port_range)
+    if not policy and ip_address:
+        host = Host.query.filter_by(ip_address=ip_address).first()
+        policy = host.get_setting('port_policy') if host else None
+    return policy or get_port_setting('port_policy', 'random')
+
+def sync_port_index(ip_addresses):
+    """
+    Reload the IP addresses whose ports other workers changed since they were indexed.
+
+    The host summaries are kept in the database, so their port counts include the
+    ports committed by every worker. IPs whose indexed rows don't match are reloaded
+    before ports are picked for them.
+
+    Args:
+        ip_addresses (iterable): The IP addresses about to be allocated on
+    """
+    ip_addresses = list(ip_addresses)
+    port_counts = dict.fromkeys(ip_addresses, 0)
+    port_counts.update(db.session.query(Host.ip_address, HostSummary.port_count)
+                       .join(HostSummary, HostSummary.host_id == Host.id)
+                       .filter(Host.ip_address.in_(ip_addresses)))
+    port_index.sync(port_counts)
+
+def add_to_summaries(rows):
+    """
+    Count ports saved with a bulk insert in the summaries of their hosts.
+
+    Bulk inserts bypass the session hook that maintains the summaries, so this must be
+    called in the same transaction, after the insert.
+
+    Args:
+        rows (list): The inserted rows as dictionaries of Port columns
+    """
+    host_summary.apply_port_changes(db.session, [
+        (1, row['host_id'], row['port_number'], row['port_protocol'], row['order']) for row in rows
+    ])
+
+def no_available_ports(ip_address):
+    """
+    Build the error response for an IP address that has run out of ports.
+
+    The usage figure comes from the host summary, so it counts the ports committed by
+    every worker rather than this worker's view of them.
+
+    Args:
+        ip_address (str): The IP address that could not be allocated on
+
+    Returns:
+        tuple: A JSON error response and HTTP status code 400
+    """
+    host = Host.query.filter_by(ip_address=ip_address).first()
+    ports_in_use = HostSummary.used_in_range(host.id, port_index.range) if host else 0
+    total_ports = port_index.range.total
+    app.logger.error(f"No available ports for IP: {ip_address}. Used {ports_in_use} out of {total_ports} possible ports.")
+    settings_url = url_for('routes.settings.settings', _external=True) + '#ports'
+    error_message = (
+        f"No available ports.\n"
+        f"Used {ports_in_use} out of {total_ports} possible ports.\n"
+        f"Consider expanding your port range in the <a href='{settings_url}'>settings</a>."
+    )
+    return jsonify({'error': error_message, 'html': True}), 400
@@ -1,25 +1,35 @@
 # utils/routes/settings.py
 
 # Standard Imports
-import json                                     # For JSON operations
 import os                                       # For file operations
 import re                                       # For regular expressions
+import time                                     # For timing bulk deletes
 
 # External Imports
 from datetime import datetime
-from io import BytesIO
 from flask import Blueprint                     # For creating a blueprint
 from flask import current_app as app            # For accessing the Flask app
 from flask import jsonify                       # For returning JSON responses
+from flask import make_response                 # For serving stylesheets
+from flask import redirect                      # For redirecting outdated stylesheet URLs
 from flask import render_template               # For rendering HTML templates
 from flask import request                       # For handling HTTP requests
-from flask import send_file                     # For serving files
+from flask import Response                      # For streaming exports
+from flask import stream_with_context           # For database access while streaming
 from flask import send_from_directory           # For serving static files
 from flask import session                       # For storing session data
+from flask import url_for                       # For generating URLs
 import markdown                                 # For rendering Markdown text
 
 # Local Imports
-from utils.database import db, Port, Setting, Sockets # For accessing the database models
+from utils.content import cached_from_files, content_etag # For caching file-derived page content
+from utils.allocation import port_index, POLICIES # For the free-port index
+from utils.allocation import ExclusionSpec       # For validating port exclusions
+from utils.database import db, Host, Port, Setting, Sockets # For accessing the database models
+from utils.database import check_summaries       # For checking the per-host aggregates
+from utils.database import delete_in_chunks, reclaim_space # For bulk deletes
+from utils.database import host_summary         # For maintaining the per-host aggregates
+from utils.export import stream_export, EXPORT_FORMATS # For streaming exports
 
 # Create the blueprint
 settings_bp = Blueprint('settings', __name__)
@@ -31,6 +41,7 @@ def settings():
     This function manages both GET and POST requests for the settings page.
     For GET requests, it retrieves and displays current settings.
     For POST requests, it updates the settings based on form data.
+    Saving custom CSS also stores its hash, which changes the URL it is served from.
 
     Returns:
     For GET: Rendered settings.html template
@@ -50,16 +61,10 @@ def settings():
             settings_to_update['theme'] = theme
         if custom_css is not None:
             settings_to_update['custom_css'] = custom_css
-
-        for key, value in settings_to_update.items():
-            setting = Setting.query.filter_by(key=key).first()
-            if setting:
-                setting.value = value
-            else:
-                setting = Setting(key=key, value=value)
-            db.session.add(setting)
+            settings_to_update['custom_css_hash'] = content_etag(custom_css)
 
         try:
+            Setting.set_many(settings_to_update)
             db.session.commit()
             if 'theme' in settings_to_update:
                 session['theme'] = theme
@@ -70,60 +75,80 @@ def settings():
             return jsonify({'success': False, 'error': 'Error saving settings'}), 500
 
     # Retrieve unique IP addresses from the database
-    ip_addresses = [ip[0] for ip in db.session.query(Port.ip_address).distinct()]
+    ip_addresses = [ip[0] for ip in db.session.query(Host.ip_address).order_by(Host.panel_order, Host.id)]
 
     # Get List of sockets from database
     sockets = [socket for socket in db.session.query(Sockets)]
 
     # Get the default IP address from settings
-    default_ip = Setting.query.filter_by(key='default_ip').first()
-    default_ip = default_ip.value if default_ip else ''
+    default_ip = Setting.get('default_ip', '')
 
     # Retrieve theme from session or database
     if 'theme' not in session:
-        theme_setting = Setting.query.filter_by(key='theme').first()
-        theme = theme_setting.value if theme_setting else 'light'
+        theme = Setting.get('theme', 'light')
         session['theme'] = theme
     else:
         theme = session['theme']
 
-    # Get available themes from the themes directory
-    theme_dir = os.path.join(app.static_folder, 'css', 'themes')
-    themes = [f.split('.')[0] for f in os.listdir(theme_dir) if f.endswith('.css') and not f.startswith('global-')]
+    # Get available themes and the app version, cached until the files change
+    themes = get_themes()
 
     # Retrieve custom CSS from settings
-    custom_css = Setting.query.filter_by(key='custom_css').first()
-    custom_css = custom_css.value if custom_css else ''
-
-    # Get version from README
-    def get_version_from_readme():
-        try:
-            readme_path = os.path.join(os.path.dirname(__file__), '..', '..', 'README.md')
-            if not os.path.exists(readme_path):
-                app.logger.error(f"README.md not found at {readme_path}")
-                return "Unknown (File Not Found)"
-            with open(readme_path, 'r') as file:
-                content = file.read()
-            match = re.search(r'version-(\d+\.\d+\.\d+)-blue\.svg', content)
-            if match:
-                version = match.group(1)
-                app.logger.info(f"version: {version}")
-                return version
-            else:
-                app.logger.warning("Version pattern not found in README")
-                return "Unknown (Pattern Not Found)"
-        except Exception as e:
-            app.logger.error(f"Error reading version from README: {str(e)}")
-            return f"Unknown (Error: {str(e)})"
+    custom_css = Setting.get('custom_css', '')
 
     # Get app version from README
-    version = get_version_from_readme()
+    version = get_version()
 
     # Render the settings template with all necessary data
     return render_template('settings.html', ip_addresses=ip_addresses, default_ip=default_ip,
                            current_theme=theme, themes=themes, theme=theme, custom_css=custom_css,
                            version=version, sockets=sockets)
 
+@settings_bp.route('/custom_css/<digest>.css')
+def custom_css(digest):
+    """
+    Serve the custom CSS setting as a stylesheet.
+
+    The URL contains the hash of the CSS, so the response never changes and may be
+    cached indefinitely by browsers and proxies. Requests for an outdated hash are
+    redirected to the current URL.
+
+    Args:
+        digest (str): The hash in the requested URL
+
+    Returns:
+        Response: The stylesheet, a 304 Not Modified, or a redirect to the current URL
+    """
+    current_url = custom_css_url()
+    if current_url is None:
+        return '', 404
+    if url_for('routes.settings.custom_css', digest=digest) != current_url:
+        return redirect(current_url)
+
+    response = make_response(Setting.get('custom_css', ''))
+    response.mimetype = 'text/css'
+    response.set_etag(Setting.get('custom_css_hash') or content_etag(Setting.get('custom_css', '')))
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response.make_conditional(request)
+
+@settings_bp.app_context_processor
+def inject_custom_css_url():
+    """Make the URL of the custom CSS stylesheet available to every template."""
+    return {'custom_css_url': custom_css_url()}
+
+def custom_css_url():
+    """
+    Get the fingerprinted URL of the custom CSS.
+
+    Returns:
+        str: The URL, or None if no custom CSS is set
+    """
+    if not Setting.get('custom_css'):
+        return None
+    # Settings saved before the hash was stored are hashed on the fly
+    digest = Setting.get('custom_css_hash') or content_etag(Setting.get('custom_css'))
+    return url_for('routes.settings.custom_css', digest=digest[:16])
+
 @settings_bp.route('/docker_settings', methods=['POST'])
 def docker_settings():
     """
@@ -176,9 +201,11 @@ def port_settings():
     Port settings include:
     - port_start: Starting port number
     - port_end: Ending port number
-    - port_exclude: Comma-separated list of ports to exclude
+    - port_exclude: Comma-separated ports, ranges and presets to exclude, optionally per protocol
+      (e.g. '8080, 9000-9100, udp:5353, ephemeral'), stored in normalized form
     - port_length: Number of digits in port number (default: '4')
     - copy_format: Format for copying port info (default: 'port_only')
+    - port_policy: How generated ports are picked: 'random', 'lowest' or 'next_fit' (default: 'random')
 
     Returns:
     - For GET: JSON object containing current port settings
@@ -189,17 +216,14 @@ def port_settings():
     """
     if request.method == 'GET':
         try:
-            port_settings = {}
-            for key in ['port_start', 'port_end', 'port_exclude', 'port_length', 'copy_format']:
-                setting = Setting.query.filter_by(key=key).first()
-                if setting:
-                    port_settings[key] = setting.value
-                elif key == 'copy_format':
-                    port_settings[key] = 'port_only'
-                elif key == 'port_length':
-                    port_settings[key] = '4'  # Set default to '4'
-                else:
-                    port_settings[key] = ''
+            port_settings = Setting.get_many({
+                'port_start': '',
+                'port_end': '',
+                'port_exclude': '',
+                'port_length': '4',  # Set default to '4'
+                'copy_format': 'port_only',
+                'port_policy': 'random'
+            })
 
             app.logger.debug(f"Retrieved port settings: {port_settings}")
             return jsonify(port_settings)
@@ -215,20 +239,23 @@ def port_settings():
                 'port_end': request.form.get('port_end', ''),
                 'port_exclude': request.form.get('port_exclude', ''),
                 'port_length': request.form.get('port_length', '4'),  # Default to '4' if not provided
-                'copy_format': request.form.get('copy_format', 'port_only')
+                'copy_format': request.form.get('copy_format', 'port_only'),
+                'port_policy': request.form.get('port_policy', 'random')
             }
 
+            if port_settings['port_policy'] not in POLICIES:
+                return jsonify({'success': False, 'error': f"Unknown allocation policy: {port_settings['port_policy']}"}), 400
+
+            # Validate the exclusions once here and store them normalized
+            try:
+                port_settings['port_exclude'] = ExclusionSpec.parse(port_settings['port_exclude']).normalized()
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+
             app.logger.debug(f"Received port settings: {port_settings}")
 
             # Update or create port settings in the database
-            for key, value in port_settings.items():
-                setting = Setting.query.filter_by(key=key).first()
-                if setting:
-                    setting.value = value
-                else:
-                    new_setting = Setting(key=key, value=value)
-                    db.session.add(new_setting)
-
+            Setting.set_many(port_settings)
             db.session.commit()
             app.logger.info("Port settings updated successfully")
             return jsonify({'success': True, 'message': 'Port settings updated successfully'})
@@ -255,91 +282,193 @@ def serve_theme(filename):
 @settings_bp.route('/export_entries', methods=['GET'])
 def export_entries():
     """
-    Export all port entries from the database as a JSON file.
+    Export all port entries from the database as a downloadable file.
 
-    This function fetches all ports from the database, formats them into a list of dictionaries,
-    converts the list to a JSON string, and returns the JSON data as a downloadable file. The
-    filename includes the current date.
+    This function streams the ports to the client while reading them from the database
+    in batches, so memory use stays the same however many ports there are. The optional
+    'format' query parameter selects 'json' (the default), 'ndjson' or 'csv', and
+    'gzip=true' compresses the file. The filename includes the current date.
 
     Returns:
-        Response: A Flask response object containing the JSON file for download.
+        Response: A streamed response containing the export file for download,
+                  or a JSON error for an unsupported format.
     """
-    try:
-        # Fetch all ports from the database
-        ports = Port.query.all()
-
-        # Create a list of dictionaries containing port data
-        port_data = [
-            {
-                'ip_address': port.ip_address,
-                'nickname': port.nickname,
-                'port_number': port.port_number,
-                'description': port.description,
-                'port_protocol': port.port_protocol,
-                'order': port.order
-            } for port in ports
-        ]
-
-        # Convert data to JSON
-        json_data = json.dumps(port_data, indent=2)
-
-        # Create a BytesIO object
-        buffer = BytesIO()
-        buffer.write(json_data.encode())
-        buffer.seek(0)
-
-        # Generate filename with current date
-        current_date = datetime.now().strftime("%Y-%m-%d")
-        filename = f"portall_export_{current_date}.json"
-
-        # Log the export
-        app.logger.info(f"Exporting Data to: {filename}")
-
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/json'
-        )
-    except Exception as e:
-        app.logger.error(f"Error in export_entries: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+    export_format = request.args.get('format', 'json').lower()
+    compress = request.args.get('gzip', 'false').lower() in ('true', '1', 'yes')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported export format: {export_format}"}), 400
+
+    mimetype, extension = EXPORT_FORMATS[export_format]
+
+    # Generate filename with current date
+    current_date = datetime.now().strftime("%Y-%m-%d")
+    filename = f"portall_export_{current_date}.{extension}"
+    if compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    # Log the export
+    app.logger.info(f"Exporting Data to: {filename}")
+
+    def generate():
+        try:
+            yield from stream_export(export_format, compress)
+        except Exception as e:
+            # The response has started, so the error can only be logged
+            app.logger.error(f"Error in export_entries: {str(e)}")
+            raise
+
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
 
 @settings_bp.route('/purge_entries', methods=['POST'])
 def purge_entries():
     """
     Purge all entries from the Port table in the database.
 
-    This function handles POST requests to delete all records from the Port table.
-    It's typically used for maintenance or reset purposes.
+    This function handles POST requests to delete all records from the Port and Host tables.
+    It's typically used for maintenance or reset purposes. Rows are deleted in bounded-size
+    chunks, each in its own transaction, so the purge doesn't block other requests. An
+    optional 'vacuum' form field reclaims the freed space on SQLite afterwards.
 
     Returns:
-        JSON response indicating success or failure, along with the number of deleted entries.
+        JSON response indicating success or failure, along with the number of deleted entries
+        and the time taken.
     """
+    vacuum = request.form.get('vacuum', '').lower() == 'true'
+    start_time = time.perf_counter()
+
     try:
-        num_deleted = Port.query.delete()
+        num_deleted = delete_in_chunks(Port)
+        host_summary.remove(None)
         db.session.commit()
-        app.logger.info(f"Purged {num_deleted} entries from the database")
-        return jsonify({'success': True, 'message': f'All entries have been purged. {num_deleted} entries deleted.'})
+        delete_in_chunks(Host)
+        vacuumed = reclaim_space(full=True) if vacuum else None
+
+        elapsed_ms = round((time.perf_counter() - start_time) * 1000, 1)
+        app.logger.info(f"Purged {num_deleted} entries from the database in {elapsed_ms} ms")
+        return jsonify({'success': True,
+                        'message': f'All entries have been purged. {num_deleted} entries deleted in {elapsed_ms} ms.',
+                        'deleted': num_deleted, 'elapsed_ms': elapsed_ms, 'vacuum': vacuumed})
     except Exception as e:
         db.session.rollback()
         app.logger.error(f"Error purging entries: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        # Bulk deletes bypass the session tracking of the free-port index
+        port_index.invalidate()
+
+@settings_bp.route('/check_summaries', methods=['POST'])
+def check_host_summaries():
+    """
+    Check the per-host port summaries against the Port table.
+
+    This function compares the maintained port counts and highest orders of every host
+    with the actual ports. Unless the 'repair' form field is 'false', summaries that
+    don't match are rebuilt.
+
+    Returns:
+        JSON response indicating success or failure, along with the number of mismatched summaries.
+    """
+    repair = request.form.get('repair', 'true').lower() != 'false'
+
+    try:
+        mismatched = check_summaries(repair=repair)
+        if mismatched:
+            app.logger.warning(f"Found {len(mismatched)} out of date host summaries")
+        return jsonify({'success': True, 'mismatched': len(mismatched), 'repaired': repair})
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error checking host summaries: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @settings_bp.route('/get_about_content')
 def get_about_content():
-    def read_md_file(filename):
-        filepath = os.path.join(app.root_path, filename)
+    """
+    Return the rendered planned features and changelog.
+
+    The Markdown is rendered once per file version. The response carries an ETag,
+    so clients that already have the current content get an empty 304 response.
+
+    Returns:
+        JSON: The rendered 'planned_features' and 'changelog' HTML, or 304 Not Modified
+    """
+    paths = [os.path.join(app.root_path, filename) for filename in ('planned_features.md', 'changelog.md')]
+    content, etag = cached_from_files('about_content', paths, lambda: render_about_content(paths))
+
+    response = jsonify(content)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# Cached Page Content
+
+def get_themes():
+    """
+    List the available themes.
+
+    Returns:
+        list: The theme names, from the CSS files in static/css/themes
+    """
+    theme_dir = os.path.join(app.static_folder, 'css', 'themes')
+
+    def list_themes():
+        if not os.path.isdir(theme_dir):
+            return []
+        return [f.split('.')[0] for f in os.listdir(theme_dir) if f.endswith('.css') and not f.startswith('global-')]
+
+    return cached_from_files('themes', [theme_dir], list_themes)
+
+def get_version():
+    """
+    Get the app version from the badge in README.md.
+
+    Returns:
+        str: The version, or a description of why it is unknown
+    """
+    readme_path = os.path.join(os.path.dirname(__file__), '..', '..', 'README.md')
+
+    def read_version():
+        try:
+            if not os.path.exists(readme_path):
+                app.logger.error(f"README.md not found at {readme_path}")
+                return "Unknown (File Not Found)"
+            with open(readme_path, 'r') as file:
+                content = file.read()
+            match = re.search(r'version-(\d+\.\d+\.\d+)-blue\.svg', content)
+            if match:
+                version = match.group(1)
+                app.logger.info(f"version: {version}")
+                return version
+            else:
+                app.logger.warning("Version pattern not found in README")
+                return "Unknown (Pattern Not Found)"
+        except Exception as e:
+            app.logger.error(f"Error reading version from README: {str(e)}")
+            return f"Unknown (Error: {str(e)})"
+
+    return cached_from_files('version', [readme_path], read_version)
+
+def render_about_content(paths):
+    """
+    Render the about page Markdown files.
+
+    Args:
+        paths (list): The planned features and changelog files
+
+    Returns:
+        tuple: (content dict, ETag of the content)
+    """
+    def read_md_file(filepath):
         if os.path.exists(filepath):
             with open(filepath, 'r') as file:
-                content = file.read()
-                return markdown.markdown(content)
+                return markdown.markdown(file.read())
         return ""
 
-    planned_features = read_md_file('planned_features.md')
-    changelog = read_md_file('changelog.md')
-
-    return jsonify({
+    planned_features, changelog = (read_md_file(path) for path in paths)
+    content = {
         'planned_features': planned_features,
         'changelog': changelog
-    })
\ No newline at end of file
+    }
+    return content, content_etag(planned_features, changelog)
@@ -0,0 +1,103 @@
+# utils/scheduler.py
+
+# Standard Imports
+import logging                                  # For logging the runner election
+import os                                       # For locating the runner lock
+import tempfile                                 # For the default runner lock location
+import threading                                # For guarding the runner lock
+
+# External Imports
+from flask_apscheduler import APScheduler       # For running jobs in the background
+
+try:
+    import fcntl                                # For electing the process that runs the jobs
+except ImportError:
+    fcntl = None
+
+# Scheduler running the background jobs of this process
+scheduler = APScheduler()
+
+# Lock file held by the one process that runs the jobs
+SCHEDULER_LOCK_FILE = os.environ.get('SCHEDULER_LOCK_FILE',
+                                     os.path.join(tempfile.gettempdir(), 'portall-scheduler.lock'))
+
+# Open lock file while this process is the runner
+_runner_lock = None
+_runner_guard = threading.Lock()
+
+def is_job_runner():
+    """
+    Return whether this process runs the background jobs, taking over if no process does.
+
+    With several worker processes, every one of them schedules the jobs, but only the
+    process holding an exclusive lock on SCHEDULER_LOCK_FILE runs them. The lock is
+    released by the operating system when that process exits, and the next worker
+    whose job comes up takes over.
+
+    Returns:
+        bool: True if this process holds the lock
+    """
+    global _runner_lock
+    with _runner_guard:
+        if _runner_lock is not None:
+            return True
+        if fcntl is None:
+            # Without advisory locks every process runs the jobs
+            return True
+
+        lock_file = open(SCHEDULER_LOCK_FILE, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        _runner_lock = lock_file
+        logging.info(f"Process {os.getpid()} runs the background jobs")
+        return True
+
+def read_interval(name, default=0):
+    """
+    Read a job interval in seconds from an environment variable.
+
+    A value that isn't a whole number of seconds is logged and disables the job instead
+    of stopping the app from starting.
+
+    Args:
+        name (str): The environment variable
+        default (int): The interval if the variable is unset or empty
+
+    Returns:
+        int: The interval, 0 if the job is disabled
+    """
+    value = os.environ.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        logging.error(f"{name} must be a whole number of seconds, not {value!r}; the job is disabled")
+        return 0
+
+def schedule_job(app, job_id, func, seconds):
+    """
+    Run a function in an app context every few seconds, in one process only.
+
+    The scheduler is started on first use. Scheduling a job again replaces it, so the
+    app factory can be called more than once.
+
+    Args:
+        app (Flask): The Flask application instance
+        job_id (str): Name of the job
+        func (callable): The job, called without arguments inside an app context
+        seconds (int): Interval between runs
+    """
+    def run():
+        if not is_job_runner():
+            return
+        with app.app_context():
+            func()
+
+    if not scheduler.running:
+        scheduler.init_app(app)
+        scheduler.start()
+    scheduler.add_job(id=job_id, func=run, trigger='interval', seconds=seconds, replace_existing=True)
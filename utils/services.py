@@ -0,0 +1,250 @@
+# utils/services.py
+
+# Standard Imports
+import csv                                      # For reading the IANA registry export
+import mmap                                     # For sharing the index pages between workers
+import os                                       # For locating the bundled index
+import re                                       # For parsing services(5) files
+import struct                                   # For the index header
+import sys                                      # For the byte order of the host
+import shutil                                   # For saving a downloaded registry
+import threading                                # For loading the index once
+import urllib.request                           # For downloading the IANA registry
+from array import array                         # For the lookup tables
+from itertools import compress                  # For listing the registered ports
+
+# Bundled index of the IANA service name and port number registry
+INDEX_PATH = os.path.join(os.path.dirname(__file__), 'data', 'services.idx')
+
+# CSV export of the registry the bundled index is built from
+IANA_REGISTRY_URL = 'https://www.iana.org/assignments/service-names-port-numbers/service-names-port-numbers.csv'
+
+# Index layout (little endian):
+#   header   magic, name count, size of the name blob
+#   tables   one uint16 per port number and protocol, holding name number + 1 (0 = unregistered)
+#   offsets  uint32 start of every name in the blob, plus the end of the last one
+#   blob     the ASCII service names, back to back
+_MAGIC = b'PSI1'
+_HEADER = struct.Struct('<4sII')
+_PORTS = 65536
+_PROTOCOLS = ('TCP', 'UDP')
+
+class ServiceIndex:
+    """
+    Array-backed lookup of registered service names by port number.
+
+    The index file is memory-mapped and read in place, so looking up a port is two
+    array reads and every worker shares the same pages instead of holding a copy.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self._tables = {}
+        self._offsets = ()
+        self._blob = b''
+        self._registered = None
+
+        try:
+            with open(path, 'rb') as index_file:
+                data = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Missing or empty index, every lookup misses
+            return
+
+        magic, name_count, blob_size = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a service index")
+
+        position = _HEADER.size
+        for protocol in _PROTOCOLS:
+            self._tables[protocol] = _view(data, position, _PORTS, 'H')
+            position += _PORTS * 2
+        self._offsets = _view(data, position, name_count + 1, 'I')
+        position += (name_count + 1) * 4
+        self._blob = memoryview(data)[position:position + blob_size]
+
+    def name(self, port, protocol=None):
+        """
+        Look up the service registered on a port.
+
+        Args:
+            port (int): The port number
+            protocol (str): 'TCP' or 'UDP', or None to try TCP before UDP
+
+        Returns:
+            str: The service name, or None if the port is not registered
+        """
+        if not self._tables or not 0 <= port < _PORTS:
+            return None
+        protocol = (protocol or '').upper()
+        for table_protocol in ((protocol,) if protocol in _PROTOCOLS else _PROTOCOLS):
+            number = self._tables[table_protocol][port]
+            if number:
+                return bytes(self._blob[self._offsets[number - 1]:self._offsets[number]]).decode('ascii')
+        return None
+
+    def is_registered(self, port, protocol=None):
+        """Return whether a service is registered on a port."""
+        return self.name(port, protocol) is not None
+
+    def registered_intervals(self):
+        """
+        Return the registered port numbers of any protocol as merged ``(low, high)`` intervals.
+
+        The intervals are computed on first use and kept for the lifetime of the index.
+        """
+        if self._registered is None:
+            registered = set()
+            for table in self._tables.values():
+                registered.update(compress(range(_PORTS), table))
+            intervals = []
+            for port in sorted(registered):
+                if intervals and port == intervals[-1][1] + 1:
+                    intervals[-1] = (intervals[-1][0], port)
+                else:
+                    intervals.append((port, port))
+            self._registered = tuple(intervals)
+        return self._registered
+
+def _view(data, offset, count, typecode):
+    """Return ``count`` little-endian integers of the mapped index, without copying where possible."""
+    size = count * array(typecode).itemsize
+    if sys.byteorder == 'little':
+        return memoryview(data)[offset:offset + size].cast(typecode)
+    values = array(typecode, data[offset:offset + size])
+    values.byteswap()
+    return values
+
+_index = None
+_index_lock = threading.Lock()
+
+def service_index():
+    """Return the bundled service index, loading it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ServiceIndex()
+    return _index
+
+def service_name(port, protocol=None):
+    """
+    Look up the registered service name of a port in the bundled index.
+
+    Args:
+        port (int): The port number
+        protocol (str): 'TCP' or 'UDP', or None to accept either
+
+    Returns:
+        str: The service name, or None if the port is not registered
+    """
+    try:
+        return service_index().name(int(port), protocol)
+    except (TypeError, ValueError):
+        return None
+
+def describe_port(description, port, protocol=None):
+    """
+    Fill in a missing description from the service registered on a port.
+
+    Args:
+        description (str): The description given for the port, possibly empty
+        port (int): The port number
+        protocol (str): The port protocol
+
+    Returns:
+        str: The given description, the service name, or an empty string
+    """
+    if description and str(description).strip():
+        return description
+    return service_name(port, protocol) or ''
+
+# Index Building
+
+def build_index(entries, path=INDEX_PATH):
+    """
+    Write a service index file.
+
+    Args:
+        entries (iterable): (name, low_port, high_port, protocol) tuples; the first
+                            name given for a port and protocol wins
+        path (str): The file to write
+
+    Returns:
+        int: The number of registered port and protocol pairs
+    """
+    tables = {protocol: array('H', bytes(_PORTS * 2)) for protocol in _PROTOCOLS}
+    numbers = {}
+    names = []
+    registered = 0
+
+    for name, low, high, protocol in entries:
+        protocol = protocol.upper()
+        if protocol not in tables or not name or not 0 <= low <= high < _PORTS:
+            continue
+        name = name.encode('ascii', 'ignore')
+        if name not in numbers:
+            names.append(name)
+            numbers[name] = len(names)
+        table = tables[protocol]
+        for port in range(low, high + 1):
+            if not table[port]:
+                table[port] = numbers[name]
+                registered += 1
+
+    offsets = array('I', [0])
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+    blob = b''.join(names)
+
+    if sys.byteorder != 'little':
+        for values in (*tables.values(), offsets):
+            values.byteswap()
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as index_file:
+        index_file.write(_HEADER.pack(_MAGIC, len(names), len(blob)))
+        for protocol in _PROTOCOLS:
+            index_file.write(tables[protocol].tobytes())
+        index_file.write(offsets.tobytes())
+        index_file.write(blob)
+    return registered
+
+def read_registry(path):
+    """
+    Read the entries of a service registry for ``build_index``.
+
+    Accepts the IANA ``service-names-port-numbers.csv`` export as well as a
+    services(5) file such as /etc/services.
+
+    Args:
+        path (str): The registry file
+
+    Yields:
+        tuple: (name, low_port, high_port, protocol)
+    """
+    # The export may start with a byte order mark and quotes descriptions spanning several lines
+    with open(path, newline='', encoding='utf-8-sig', errors='replace') as registry:
+        first_line = registry.readline()
+        registry.seek(0)
+        if first_line.startswith('Service Name,'):
+            for row in csv.DictReader(registry):
+                low, _, high = (row.get('Port Number') or '').partition('-')
+                if row.get('Service Name') and low.isdigit() and (high or low).isdigit():
+                    yield row['Service Name'], int(low), int(high or low), row.get('Transport Protocol') or ''
+        else:
+            for line in registry:
+                match = re.match(r'^\s*([^\s#]+)\s+(\d+)/(\w+)', line)
+                if match:
+                    port = int(match.group(2))
+                    yield match.group(1), port, port, match.group(3)
+
+def download_registry(url, path):
+    """
+    Download a service registry export, such as the IANA CSV, to a file.
+
+    Args:
+        url (str): Where to download the registry from
+        path (str): The file to write
+    """
+    with urllib.request.urlopen(url, timeout=60) as response, open(path, 'wb') as target:
+        shutil.copyfileobj(response, target)